@@ -12,7 +12,6 @@ import json
 import csv
 import io
 import difflib
-import hashlib
 import smtplib
 import time
 import secrets
@@ -21,7 +20,6 @@ import shutil
 import tempfile
 import qrcode
 from pathlib import Path
-from urllib.parse import urlparse
 import email.utils
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -40,6 +38,10 @@ from wallet_pass import (
 )
 from google_wallet import GoogleWalletConfigError, build_google_wallet_save_url, google_wallet_configured, patch_google_wallet_object
 import db
+from scanner_routes import (
+    ADMIN_USERNAME, MEMBERSHIP_SHOP_URL, headcount_refresh_seconds, register_scanner_routes,
+    require_password,
+)
 # Notifications feature removed
 
 load_dotenv()
@@ -53,8 +55,6 @@ app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', 'false'
 
 # Auth: stored hash file (gitignored); fallback to env
 HASH_FILE = os.path.join(os.path.dirname(__file__), '.admin_hash')
-ADMIN_USERNAME = (os.getenv('ADMIN_USERNAME') or '').strip()
-MEMBERSHIP_SHOP_URL = "https://olscbrooklyn.com/shop/p/lfc-brooklyn-2627-membership"
 LOGIN_RATE_LIMIT_WINDOW = 900   # 15 minutes
 LOGIN_RATE_LIMIT_MAX = 5
 _login_attempts = {}  # ip -> [timestamp, ...]
@@ -145,13 +145,6 @@ def _record_login_attempt(ip, success):
 def _env(key, default=""):
     v = os.getenv(key, default)
     return v.strip() if isinstance(v, str) else (v.decode("utf-8").strip() if isinstance(v, bytes) else str(v))
-def _headcount_refresh_seconds():
-    """Headcount refresh interval in seconds (10–300). Set HEADCOUNT_REFRESH_SECONDS in env to override default 60."""
-    try:
-        s = _env("HEADCOUNT_REFRESH_SECONDS", "60")
-        return max(10, min(300, int(s)))
-    except ValueError:
-        return 60
 
 
 def _public_base_url():
@@ -172,7 +165,7 @@ config = {
 @app.context_processor
 def inject_headcount_refresh():
     """Make headcount refresh interval (seconds) available in all templates."""
-    return {"headcount_refresh_seconds": _headcount_refresh_seconds()}
+    return {"headcount_refresh_seconds": headcount_refresh_seconds()}
 
 
 RESEND_USAGE_BADGE_ENDPOINTS = {'admin_members', 'admin_pass_remediation', 'admin_issue_passes'}
@@ -184,8 +177,8 @@ def inject_resend_usage():
     page that can send a batch of pass emails -- so an admin can see
     how much headroom is left *before* firing off a big batch, not just
     find out from a wall of "quota hit" failures after the fact. Scoping
-    this avoids adding a DB query (a real ~1.3s cost with no connection
-    pooling) to every page load app-wide."""
+    this avoids adding a DB query to every page load app-wide -- cheap now
+    that db.cursor() is pooled, but still not free."""
     if request.endpoint not in RESEND_USAGE_BADGE_ENDPOINTS:
         return {}
     try:
@@ -193,6 +186,40 @@ def inject_resend_usage():
     except Exception:
         return {}
 
+@app.before_request
+def _begin_db_session():
+    """One pooled connection and one transaction per request, shared by
+    every db.* call the handler makes (see db.begin_session) -- instead of
+    a separate connection + commit for each helper."""
+    db.begin_session()
+
+
+@app.after_request
+def _commit_db_session(response):
+    """Commit here rather than in teardown: a failed commit still becomes
+    a 500 the client actually sees, instead of a success response for a
+    write that never landed. 5xx responses roll back.
+
+    Also reports the request's database time as a Server-Timing header
+    (visible in the browser devtools' Timing tab), so a slow admin page or
+    scan can be pinned on the DB -- or ruled out -- without a profiler."""
+    db.end_session(commit=response.status_code < 500)
+    timing = db.request_timing()
+    if timing["queries"]:
+        response.headers['Server-Timing'] = (
+            f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries", '
+            f'db-acquire;dur={timing["acquire_ms"]:.1f}'
+        )
+    return response
+
+
+@app.teardown_request
+def _end_db_session(exc):
+    """Safety net for paths that skip after_request (an unhandled
+    exception). No-op if after_request already ended the session."""
+    db.end_session(commit=False)
+
+
 def _clean_header_value(v):
     """Ensure header value is a clean string (no newlines, no bytes)."""
     if v is None:
@@ -333,33 +360,6 @@ def create_member(first_name, last_name, email, phone=""):
             "email": email
         }
 
-def require_password():
-    """Check if user is authenticated (password or Google OAuth)."""
-    return bool(session.get('authenticated'))
-
-
-def _door_pass_is_valid(pass_id):
-    """Re-checked against the DB on every request, not just once at
-    redemption time -- so revoking a door pass takes effect immediately,
-    even for someone already mid-shift with it open."""
-    row = db.get_door_pass(pass_id)
-    if not row or row['revoked_at']:
-        return False
-    if row['expires_at'] and row['expires_at'] <= datetime.now(timezone.utc):
-        return False
-    return True
-
-
-def require_scanner_access():
-    """Full admin session, OR a still-valid door pass -- the scoped,
-    revocable link volunteer door staff use to reach only the scanner,
-    never the rest of admin."""
-    if require_password():
-        return True
-    door_pass_id = session.get('door_pass_id')
-    return bool(door_pass_id and _door_pass_is_valid(door_pass_id))
-
-
 def _passkit_legacy_enabled():
     """Mothball switch for everything that still talks to PassKit's own
     API (not the PassKit *web service protocol* Apple defines for Wallet
@@ -386,7 +386,11 @@ def index():
 @app.route('/admin')
 def admin_index():
     """Admin page with headcount display and checkout button."""
-    return render_template('index.html', wordmark_data_uri=_current_theme_wordmark_data_uri())
+    return render_template(
+        'index.html',
+        wordmark_data_uri=_current_theme_wordmark_data_uri(),
+        live_headcount=require_password(),
+    )
 
 @app.route('/add-member')
 def add_member_page():
@@ -550,18 +554,6 @@ def logout():
     return redirect(url_for('index'))
 
 
-@app.route('/door/<token>')
-def door_access(token):
-    """Redeem a volunteer door-staff link: scoped to the scanner only,
-    revocable/expirable independently of the real admin password. Doesn't
-    touch any existing admin session -- an admin opening this link to
-    test it stays logged in as admin too, the two are independent flags."""
-    row = db.find_door_pass_by_token(token)
-    if not row or row['revoked_at'] or (row['expires_at'] and row['expires_at'] <= datetime.now(timezone.utc)):
-        return render_template('door_invalid.html', wordmark_data_uri=_current_theme_wordmark_data_uri()), 404
-    session['door_pass_id'] = row['id']
-    return redirect(url_for('scanner'))
-
 # Notifications page removed
 
 @app.route('/api/headcount')
@@ -1303,53 +1295,6 @@ def _localize_kickoff(value):
     return tz.localize(naive)
 
 
-def _extract_scan_token(raw_value):
-    """Accept a raw wallet token, a full /checkin/t/<token> URL (what's
-    actually embedded in the QR), or a /pass/<token> URL (the mobile pass
-    page / the link that's actually in the resend/recovery emails — this is
-    the one realistic thing a person might have as copyable text, so it
-    needs to work here too, not just the QR-only URL shape).
-    """
-    value = (raw_value or "").strip()
-    if not value:
-        return ""
-    try:
-        parsed = urlparse(value)
-        if parsed.scheme and parsed.netloc:
-            parts = [part for part in parsed.path.split("/") if part]
-            if len(parts) >= 3 and parts[-3:-1] == ["checkin", "t"]:
-                return parts[-1].strip()
-            if len(parts) >= 2 and parts[-2] in ("t", "pass"):
-                return parts[-1].strip()
-    except Exception:
-        pass
-    if "/checkin/t/" in value:
-        return value.rsplit("/checkin/t/", 1)[-1].split("?", 1)[0].split("#", 1)[0].strip()
-    if "/pass/" in value:
-        return value.rsplit("/pass/", 1)[-1].split("?", 1)[0].split("#", 1)[0].strip()
-    return value
-
-
-def _format_match_for_scan(match):
-    if not match:
-        return None
-    kickoff = match.get('kickoff_at')
-    if kickoff:
-        try:
-            tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
-            kickoff = kickoff.astimezone(tz).strftime('%a %b %-d, %-I:%M %p')
-        except Exception:
-            kickoff = str(kickoff)
-    return {
-        "id": match.get("id"),
-        "opponent": match.get("opponent"),
-        "is_home": bool(match.get("is_home")),
-        "competition": match.get("competition") or "",
-        "kickoff": kickoff or "",
-        "label": f"{'vs' if match.get('is_home') else '@'} {match.get('opponent')}",
-    }
-
-
 COMMON_EMAIL_DOMAINS = [
     "gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "aol.com",
     "icloud.com", "live.com", "msn.com", "comcast.net", "me.com",
@@ -1448,6 +1393,7 @@ def admin_members():
     # import that produced them — not on every later visit to this page.
     already_existed = session.pop('import_already_existed', None)
     possible_typos = session.pop('import_possible_typos', None)
+    import_rejected = session.pop('import_rejected', None)
 
     resent = request.args.get('resent')
     resend_error = request.args.get('resend_error')
@@ -1456,42 +1402,67 @@ def admin_members():
     if resend_error:
         error = resend_error
 
-    with db.cursor() as cur:
-        cur.execute(
-            """
-            SELECT m.id, m.first_name, m.last_name, m.email, m.phone, m.created_at,
-                   (SELECT COUNT(*) FROM checkins c
-                    JOIN matches mt ON mt.id = c.match_id
-                    WHERE c.member_id = m.id AND mt.season_id = %s) AS checkins_this_season,
-                   EXISTS (
-                    SELECT 1 FROM wallet_passes wp
-                    WHERE wp.member_id = m.id
-                      AND wp.season_id = %s
-                      AND wp.platform = 'apple'
-                      AND wp.revoked_at IS NULL
-                   ) AS has_active_pass
-            FROM members m
-            JOIN member_seasons ms ON ms.member_id = m.id
-            WHERE ms.season_id = %s
-            ORDER BY m.last_name, m.first_name
-            """,
-            (season['id'], season['id'], season['id']),
-        )
-        members = cur.fetchall()
+    # First page only; the rest, and every search or sort, comes from
+    # /admin/members/search.json as the admin scrolls and types.
+    page = db.search_season_roster(season['id'])
 
     return render_template(
         'admin_members.html',
         season=season,
-        members=members,
+        members=page['members'],
+        next_cursor=page['next'],
+        member_total=db.count_season_members(season['id']),
         error=error,
         added=added,
         info=info,
         already_existed=already_existed,
         possible_typos=possible_typos,
+        import_rejected=import_rejected,
         wordmark_data_uri=_current_theme_wordmark_data_uri(),
     )
 
 
+@app.route('/admin/members/search.json')
+def admin_members_search():
+    """Server-side roster search/sort/paging for /admin/members: `q` (name,
+    email or phone, typo-tolerant), `sort` (name|email|phone|checkins, or
+    relevance while searching), `dir` (asc|desc), `after` (the previous
+    page's `next`)."""
+    if not require_password():
+        return jsonify({"status": "error", "code": "unauthorized"}), 401
+    season = db.get_current_season()
+    if not season:
+        return jsonify({"status": "error", "error": "No current season set"}), 400
+
+    q = request.args.get('q', '')
+    page = db.search_season_roster(
+        season['id'],
+        q=q,
+        sort=request.args.get('sort', 'relevance' if q.strip() else 'name'),
+        direction=request.args.get('dir', 'asc'),
+        after=request.args.get('after') or None,
+        limit=request.args.get('limit', default=db.ROSTER_PAGE_SIZE, type=int),
+    )
+    return jsonify({
+        "status": "ok",
+        "next": page['next'],
+        "members": [
+            {
+                "id": m['id'],
+                "name": f"{m['first_name']} {m['last_name']}",
+                "email": m['email'],
+                "phone": m['phone'],
+                "checkins": m['checkins_this_season'],
+                "has_active_pass": m['has_active_pass'],
+                "edit_url": url_for('admin_member_edit', member_id=m['id']),
+                "download_url": url_for('admin_member_download_pass', member_id=m['id']),
+                "resend_url": url_for('admin_member_resend_pass', member_id=m['id']),
+            }
+            for m in page['members']
+        ],
+    })
+
+
 @app.route('/admin/members/<int:member_id>/edit', methods=['GET', 'POST'])
 def admin_member_edit(member_id):
     if not require_password():
@@ -1633,9 +1604,18 @@ def _member_pass_data(member, serial_number, raw_token, season_name, auth_token=
     return pass_data, next_match_text, is_home
 
 
-def _issue_member_pkpass(member, season):
-    """Issue/rotate a wallet token and return signed pass bytes plus web URLs."""
-    raw_token, serial_number, auth_token = db.issue_wallet_token(member['id'], season['id'], platform='apple')
+def _issue_member_pkpass(member, season, issued=None, google_objects=None):
+    """Issue/rotate a wallet token and return signed pass bytes plus web URLs.
+
+    Bulk callers pass `issued` -- the (raw_token, serial, auth_token) they
+    already minted with db.issue_wallet_tokens -- and a `google_objects`
+    list to collect the Google Wallet object ids into, written afterwards
+    in one go with db.set_google_wallet_objects. Everyone else gets the
+    new token committed before this returns.
+    """
+    if issued is None:
+        issued = db.issue_wallet_token(member['id'], season['id'], platform='apple')
+    raw_token, serial_number, auth_token = issued
     pass_data, next_match_text, is_home = _member_pass_data(
         member, serial_number, raw_token, season['name'], auth_token=auth_token,
     )
@@ -1645,7 +1625,18 @@ def _issue_member_pkpass(member, season):
         member, season, raw_token, serial_number, next_match_text, is_home,
     )
     if google_object_id:
-        db.set_google_wallet_object(member['id'], season['id'], google_object_id, google_class_id)
+        if google_objects is None:
+            db.set_google_wallet_object(member['id'], season['id'], google_object_id, google_class_id)
+        else:
+            google_objects.append((member['id'], season['id'], google_object_id, google_class_id))
+    if google_objects is None:
+        # Single-member path (resend, signup, self-service lookup,
+        # download): the new token has to be committed before the pass
+        # carrying it is emailed or handed over -- a later failure in the
+        # request mustn't roll it back under a pass already out there --
+        # and the wallet_passes row lock shouldn't be held across the
+        # email send. The bulk path commits per chunk itself.
+        db.commit()
     return pkpass_bytes, mobile_pass_url, google_wallet_url
 
 
@@ -1656,6 +1647,10 @@ def _notify_apple_pass_updates():
     admin action like adding a match. Returns (pushed_count, total_count).
     """
     db.bump_passes_updated_tag()
+    # Devices re-fetch as soon as the push lands, from a different request
+    # -- the new tag (and whatever changed with it) has to be committed
+    # before anything goes out, not at the end of this one.
+    db.commit()
     materialize_dir = Path(tempfile.mkdtemp(prefix="olsc-push-certs-"))
     try:
         try:
@@ -1782,7 +1777,7 @@ def _sync_finished_match_results():
     finished = get_finished_liverpool_matches()
     finished_by_date = {f["date"]: f for f in finished}
 
-    updated = 0
+    results = []
     for match in pending:
         kickoff_date = match['kickoff_at'].date()
         finished_match = finished_by_date.get(kickoff_date)
@@ -1801,9 +1796,9 @@ def _sync_finished_match_results():
         home_goals = lfc_goals if match['is_home'] else opp_goals
         away_goals = opp_goals if match['is_home'] else lfc_goals
         final_score = f"{home_label} {home_goals}-{away_goals} {away_label}"
-        db.set_match_result(match['id'], result, final_score)
-        updated += 1
-    return updated
+        results.append((match['id'], result, final_score))
+    db.set_match_results(results)
+    return len(results)
 
 
 @app.route('/internal/sync-match-results', methods=['POST'])
@@ -1940,10 +1935,13 @@ def passkit_device_log():
     return ('', 200)
 
 
-def _issue_and_email_pass(member, season):
-    """Issue a wallet token, build a signed pass, and email it to a member."""
+def _issue_and_email_pass(member, season, issued=None, google_objects=None):
+    """Issue a wallet token, build a signed pass, and email it to a member.
+    `issued`/`google_objects` are passed through to _issue_member_pkpass."""
     try:
-        pkpass_bytes, mobile_pass_url, google_wallet_url = _issue_member_pkpass(member, season)
+        pkpass_bytes, mobile_pass_url, google_wallet_url = _issue_member_pkpass(
+            member, season, issued=issued, google_objects=google_objects,
+        )
     except AppleWalletConfigError as e:
         return False, f"Wallet not configured: {e}"
     except Exception as e:
@@ -2093,11 +2091,18 @@ def admin_members_import():
     if not file or not file.filename:
         return redirect(url_for('admin_members'))
 
-    text = file.read().decode('utf-8-sig', errors='ignore')
-    rows = list(enumerate(csv.DictReader(io.StringIO(text)), start=2))  # header is line 1
+    # Parsed straight off the upload stream, one row at a time, into just
+    # the normalized fields -- then handed to db.bulk_import_members, which
+    # COPYs them into a staging table and merges with a single set-based
+    # statement. A 5,000-row Squarespace export is one transaction of a few
+    # round-trips. Rows it can't import (bad email, oversized field) are
+    # weeded out in staging and handed back, so one bad line is skipped
+    # and reported instead of failing the file; re-running is harmless,
+    # upserts are idempotent.
+    reader = csv.DictReader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', errors='ignore', newline=''))
 
-    imported = 0
     skipped = 0
+    normalized = []
     already_existed = []  # rows whose email already had a members row —
                            # could be a returning member, or an accidental
                            # second purchase (e.g. meant for a spouse but
@@ -2106,74 +2111,77 @@ def admin_members_import():
                            # of a major provider (gmial.com, gmail.con) —
                            # still imported as-is, just flagged for a human
                            # to double-check and correct if needed
-    BATCH_SIZE = 25
-
-    # Committed in batches rather than one transaction for the whole file:
-    # each DB round-trip costs real time with no connection pooling, and a
-    # multi-hundred-row import can run for minutes. If the request got cut
-    # off partway through a single giant transaction, NOTHING would be
-    # saved — not even rows already processed. Committing every 25 rows
-    # means a cut-off import keeps whatever it already finished, and
-    # re-running the same file is harmless (upserts are idempotent).
-    for batch_start in range(0, len(rows), BATCH_SIZE):
-        batch = rows[batch_start:batch_start + BATCH_SIZE]
-        with db.cursor() as cur:
-            for line_num, row in batch:
-                row_ci = {(k or '').strip().lower(): v for k, v in row.items()}
-
-                def field(*names):
-                    for name in names:
-                        val = row_ci.get(name.lower())
-                        if val:
-                            return val
-                    return None
-
-                email = (field('email', 'person.emailaddress', 'product form: email') or '').strip().lower()
-                if not email:
-                    skipped += 1
-                    continue
-
-                first_name = (field('first_name') or '').strip()
-                last_name = (field('last_name') or '').strip()
-                if not first_name and not last_name:
-                    full_name = field('person.displayname', 'product form: name')
-                    first_name, last_name = _split_name(full_name)
-
-                if not first_name and not last_name:
-                    skipped += 1
-                    continue
-
-                suggested_email = _likely_email_typo(email)
-                if suggested_email:
-                    possible_typos.append({
-                        "line": line_num,
-                        "name": f"{first_name} {last_name}".strip(),
-                        "email": email,
-                        "suggested": suggested_email,
-                    })
-
-                phone = (field('phone', 'person.mobilenumber') or '').strip()
 
-                try:
-                    cur.execute("SAVEPOINT row_import")
-                    _, was_new = _upsert_member_in_season(cur, first_name, last_name, email, phone, season['id'])
-                    cur.execute("RELEASE SAVEPOINT row_import")
-                    imported += 1
-                    if not was_new:
-                        already_existed.append({
-                            "line": line_num,
-                            "name": f"{first_name} {last_name}".strip(),
-                            "email": email,
-                        })
-                except Exception as e:
-                    cur.execute("ROLLBACK TO SAVEPOINT row_import")
-                    skipped += 1
-                    print(f"CSV import: skipped line {line_num} ({email}): {e}")
+    for line_num, row in enumerate(reader, start=2):  # header is line 1
+        row_ci = {(k or '').strip().lower(): v for k, v in row.items()}
+
+        def field(*names):
+            for name in names:
+                val = row_ci.get(name.lower())
+                if val:
+                    return val
+            return None
+
+        email = (field('email', 'person.emailaddress', 'product form: email') or '').strip().lower()
+        if not email:
+            skipped += 1
+            continue
+
+        first_name = (field('first_name') or '').strip()
+        last_name = (field('last_name') or '').strip()
+        if not first_name and not last_name:
+            full_name = field('person.displayname', 'product form: name')
+            first_name, last_name = _split_name(full_name)
+
+        if not first_name and not last_name:
+            skipped += 1
+            continue
+
+        suggested_email = _likely_email_typo(email)
+        if suggested_email:
+            possible_typos.append({
+                "line": line_num,
+                "name": f"{first_name} {last_name}".strip(),
+                "email": email,
+                "suggested": suggested_email,
+            })
+
+        phone = (field('phone', 'person.mobilenumber') or '').strip()
+        normalized.append((line_num, first_name, last_name, email, phone))
+
+    try:
+        existing_emails, rejected = db.bulk_import_members(normalized, season['id'])
+    except Exception as e:
+        print(f"CSV import failed: {e}")
+        return redirect(url_for('admin_members', resend_error=f"Import failed, nothing was saved: {e}"))
+
+    for r in rejected:
+        print(f"CSV import: skipped line {r['line']} ({r['email']}): {r['reason']}")
+    skipped += len(rejected)
+    rejected_lines = {r['line'] for r in rejected}
+    normalized = [row for row in normalized if row[0] not in rejected_lines]
+    possible_typos = [t for t in possible_typos if t['line'] not in rejected_lines]
+
+    # Same rule the row-by-row import had: a row "already existed" if its
+    # email had a members row before this import, or appeared on an
+    # earlier line of this same file.
+    seen = set()
+    for line_num, first_name, last_name, email, _phone in normalized:
+        if email in existing_emails or email in seen:
+            already_existed.append({
+                "line": line_num,
+                "name": f"{first_name} {last_name}".strip(),
+                "email": email,
+            })
+        seen.add(email)
+    imported = len(normalized)
 
     if already_existed:
         session['import_already_existed'] = already_existed
     if possible_typos:
         session['import_possible_typos'] = possible_typos
+    if rejected:
+        session['import_rejected'] = rejected
     return redirect(url_for('admin_members', imported=imported, skipped=skipped))
 
 
@@ -2183,7 +2191,7 @@ def admin_matches():
         return redirect(url_for('login'))
 
     season = db.get_current_season()
-    error = None
+    error = request.args.get('rollover_error')
 
     if request.method == 'POST':
         opponent = request.form.get('opponent', '').strip()
@@ -2231,9 +2239,47 @@ def admin_matches():
         wordmark_data_uri=_current_theme_wordmark_data_uri(),
         pushed=pushed,
         push_total=push_total,
+        carry_over_choices=sorted(db.ROLLOVER_CARRY_OVER),
     )
 
 
+@app.route('/admin/seasons/rollover', methods=['POST'])
+def admin_season_rollover():
+    """Start the next season in one go (db.rollover_season): new current
+    season, members carried over, last season's wallet passes and every
+    door link revoked. Then lands on Issue First Passes, where the
+    carried-over members are waiting for their new pass -- sending stays
+    a separate, explicit click, same as always."""
+    if not require_password():
+        return redirect(url_for('login'))
+
+    name = request.form.get('name', '').strip()
+    if not name:
+        return redirect(url_for('admin_matches', rollover_error="New season name is required."))
+    try:
+        result = db.rollover_season(
+            name,
+            starts_on=request.form.get('starts_on') or None,
+            ends_on=request.form.get('ends_on') or None,
+            carry_over=request.form.get('carry_over', 'all'),
+        )
+    except db.SeasonRolloverError as e:
+        return redirect(url_for('admin_matches', rollover_error=f"Rollover not done: {e}"))
+    # Every worker has to see the new season before anyone acts on it.
+    db.commit()
+    db.invalidate_current_context()
+
+    previous = result['previous_season']
+    session['rollover_result'] = {
+        "season": result['season']['name'],
+        "previous_season": previous['name'] if previous else None,
+        "members_carried": result['members_carried'],
+        "wallet_passes_revoked": result['wallet_passes_revoked'],
+        "door_passes_revoked": result['door_passes_revoked'],
+    }
+    return redirect(url_for('admin_issue_passes'))
+
+
 @app.route('/admin/leaderboard')
 def admin_leaderboard():
     """Season check-in leaderboard: 3 points for a win, 1 for a draw, 0
@@ -2276,6 +2322,13 @@ def _looks_like_test_account(first_name, last_name, email):
 # never trips the rate limiter and turns real sends into avoidable 429s.
 RESEND_SAFE_INTERVAL_SECONDS = 0.3
 
+# How many members' tokens _bulk_issue_and_email mints per round-trip. At
+# RESEND_SAFE_INTERVAL_SECONDS that's ~15s of sending per chunk -- big
+# enough that issuance stops being a connection-per-member cost, small
+# enough that a batch abandoned midway (worker killed, admin closes the
+# tab) has only rotated a handful of tokens nobody got emailed yet.
+BULK_ISSUE_CHUNK_SIZE = 50
+
 
 def _bulk_issue_and_email(candidates, selected_ids, season):
     """Shared by pass-remediation and issue-passes: sends to each selected
@@ -2284,14 +2337,27 @@ def _bulk_issue_and_email(candidates, selected_ids, season):
     if not season:
         return [], []
     sent, failed = [], []
-    ids = [mid for mid in selected_ids if mid in candidates]
-    for i, member_id in enumerate(ids):
-        row = candidates[member_id]
-        member = {"id": member_id, "first_name": row['first_name'], "last_name": row['last_name'], "email": row['email']}
-        ok, message = _issue_and_email_pass(member, season)
-        (sent if ok else failed).append({"name": f"{row['first_name']} {row['last_name']}", "email": row['email'], "message": message})
-        if i < len(ids) - 1:
-            time.sleep(RESEND_SAFE_INTERVAL_SECONDS)
+    ids = list(dict.fromkeys(mid for mid in selected_ids if mid in candidates))
+    for start in range(0, len(ids), BULK_ISSUE_CHUNK_SIZE):
+        chunk = ids[start:start + BULK_ISSUE_CHUNK_SIZE]
+        # One multi-row upsert for the whole chunk's tokens, committed
+        # before any of them is emailed -- every token has to be live the
+        # moment its email lands, and a later failure in the batch mustn't
+        # roll back passes already sent.
+        issued = db.issue_wallet_tokens(chunk, season['id'], platform='apple')
+        db.commit()
+        google_objects = []
+        for member_id in chunk:
+            row = candidates[member_id]
+            member = {"id": member_id, "first_name": row['first_name'], "last_name": row['last_name'], "email": row['email']}
+            ok, message = _issue_and_email_pass(
+                member, season, issued=issued[member_id], google_objects=google_objects,
+            )
+            (sent if ok else failed).append({"name": f"{row['first_name']} {row['last_name']}", "email": row['email'], "message": message})
+            if member_id != ids[-1]:
+                time.sleep(RESEND_SAFE_INTERVAL_SECONDS)
+        db.set_google_wallet_objects(google_objects)
+        db.commit()
     return sent, failed
 
 
@@ -2377,6 +2443,7 @@ def admin_issue_passes():
         'admin_issue_passes.html',
         rows=rows,
         result=result,
+        rollover=session.pop('rollover_result', None),
         wordmark_data_uri=_current_theme_wordmark_data_uri(),
     )
 
@@ -2423,44 +2490,128 @@ def admin_issue_passes_send():
     return redirect(url_for('admin_issue_passes'))
 
 
+# Exports stream: rows come off a server-side cursor (db.stream_rows) and
+# go out as CSV in chunks of about this size, so memory and time-to-first-
+# byte stay flat no matter how big the roster or how many seasons.
+CSV_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _stream_csv(header, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CSV_STREAM_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue()
+
+
+def _csv_download(filename, header, rows):
+    return Response(
+        _stream_csv(header, rows),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+def _local_checkin_time(checked_in_at, tz):
+    return checked_in_at.astimezone(tz).strftime('%Y-%m-%d %H:%M:%S %Z') if checked_in_at else ""
+
+
 @app.route('/admin/matches/<int:match_id>/export-checkins.csv')
 def admin_export_match_checkins(match_id):
-    """CSV of everyone checked in to a specific match."""
+    """CSV of everyone checked in to a specific match (archived seasons'
+    matches included, via checkins_all)."""
     if not require_password():
         return redirect(url_for('login'))
 
     with db.cursor() as cur:
         cur.execute("SELECT * FROM matches WHERE id = %s", (match_id,))
         match = cur.fetchone()
-        if not match:
-            return jsonify({"status": "error", "error": "Match not found"}), 404
-
-        cur.execute(
-            """
-            SELECT m.first_name, m.last_name, m.email, m.phone,
-                   c.checked_in_at, c.source
-            FROM checkins c
-            JOIN members m ON m.id = c.member_id
-            WHERE c.match_id = %s
-            ORDER BY c.checked_in_at
-            """,
-            (match_id,),
-        )
-        rows = cur.fetchall()
+    if not match:
+        return jsonify({"status": "error", "error": "Match not found"}), 404
 
+    rows = db.stream_rows(
+        """
+        SELECT m.first_name, m.last_name, m.email, m.phone,
+               c.checked_in_at, c.source
+        FROM checkins_all c
+        JOIN members m ON m.id = c.member_id
+        WHERE c.match_id = %s
+        ORDER BY c.checked_in_at
+        """,
+        (match_id,),
+        read_only=True,
+    )
     tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["first_name", "last_name", "email", "phone", "checked_in_at", "source"])
-    for r in rows:
-        checked_in_local = r['checked_in_at'].astimezone(tz).strftime('%Y-%m-%d %H:%M:%S %Z') if r['checked_in_at'] else ""
-        writer.writerow([r['first_name'], r['last_name'], r['email'], r['phone'] or '', checked_in_local, r['source']])
+    return _csv_download(
+        f"checkins_{match['opponent'].replace(' ', '_')}_{match_id}.csv",
+        ["first_name", "last_name", "email", "phone", "checked_in_at", "source"],
+        (
+            [r['first_name'], r['last_name'], r['email'], r['phone'] or '',
+             _local_checkin_time(r['checked_in_at'], tz), r['source']]
+            for r in rows
+        ),
+    )
 
-    filename = f"checkins_{match['opponent'].replace(' ', '_')}_{match_id}.csv"
-    return Response(
-        buf.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+
+@app.route('/admin/checkins/export.csv')
+def admin_export_season_checkins():
+    """CSV of every check-in for a whole season (current by default;
+    ?season_id=N for another, ?season_id=all for every season) -- one row
+    per member per match, for analysis outside the app. Reads checkins_all,
+    so archived seasons export the same as live ones."""
+    if not require_password():
+        return redirect(url_for('login'))
+
+    season_arg = (request.args.get('season_id') or '').strip()
+    if season_arg == 'all':
+        season_filter, params, label = "", (), "all-seasons"
+    else:
+        if season_arg:
+            try:
+                season_id = int(season_arg)
+            except ValueError:
+                return jsonify({"status": "error", "error": "Invalid season_id"}), 400
+            with db.cursor() as cur:
+                cur.execute("SELECT id, name FROM seasons WHERE id = %s", (season_id,))
+                season = cur.fetchone()
+        else:
+            season = db.get_current_season()
+        if not season:
+            return jsonify({"status": "error", "error": "Season not found"}), 404
+        season_filter, params, label = "WHERE mt.season_id = %s", (season['id'],), season['name'].replace('/', '-')
+
+    rows = db.stream_rows(
+        f"""
+        SELECT s.name AS season_name, mt.kickoff_at, mt.opponent, mt.is_home,
+               m.first_name, m.last_name, m.email, m.phone,
+               c.checked_in_at, c.source
+        FROM checkins_all c
+        JOIN matches mt ON mt.id = c.match_id
+        JOIN seasons s ON s.id = mt.season_id
+        JOIN members m ON m.id = c.member_id
+        {season_filter}
+        ORDER BY mt.kickoff_at, c.checked_in_at
+        """,
+        params,
+        read_only=True,
+    )
+    tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
+    return _csv_download(
+        f"checkins_{label}.csv",
+        ["season", "match_date", "match", "first_name", "last_name", "email", "phone", "checked_in_at", "source"],
+        (
+            [r['season_name'],
+             r['kickoff_at'].astimezone(tz).strftime('%Y-%m-%d') if r['kickoff_at'] else '',
+             f"{'vs' if r['is_home'] else '@'} {r['opponent']}",
+             r['first_name'], r['last_name'], r['email'], r['phone'] or '',
+             _local_checkin_time(r['checked_in_at'], tz), r['source']]
+            for r in rows
+        ),
     )
 
 
@@ -2474,36 +2625,15 @@ def admin_export_members():
     if not season:
         return jsonify({"status": "error", "error": "No current season set"}), 400
 
-    with db.cursor() as cur:
-        cur.execute(
-            """
-            SELECT m.first_name, m.last_name, m.email, m.phone, m.created_at,
-                   (SELECT COUNT(*) FROM checkins c
-                    JOIN matches mt ON mt.id = c.match_id
-                    WHERE c.member_id = m.id AND mt.season_id = %s) AS checkins_this_season
-            FROM members m
-            JOIN member_seasons ms ON ms.member_id = m.id
-            WHERE ms.season_id = %s
-            ORDER BY m.last_name, m.first_name
-            """,
-            (season['id'], season['id']),
-        )
-        rows = cur.fetchall()
-
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["first_name", "last_name", "email", "phone", "checkins_this_season", "member_since"])
-    for r in rows:
-        writer.writerow([
-            r['first_name'], r['last_name'], r['email'], r['phone'] or '',
-            r['checkins_this_season'], r['created_at'].strftime('%Y-%m-%d') if r['created_at'] else '',
-        ])
-
-    filename = f"members_{season['name'].replace('/', '-')}.csv"
-    return Response(
-        buf.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    rows = db.stream_season_roster(season['id'])
+    return _csv_download(
+        f"members_{season['name'].replace('/', '-')}.csv",
+        ["first_name", "last_name", "email", "phone", "checkins_this_season", "member_since"],
+        (
+            [r['first_name'], r['last_name'], r['email'], r['phone'] or '',
+             r['checkins_this_season'], r['created_at'].strftime('%Y-%m-%d') if r['created_at'] else '']
+            for r in rows
+        ),
     )
 
 
@@ -2515,11 +2645,36 @@ def admin_match_set_current(match_id):
     with db.cursor() as cur:
         cur.execute("UPDATE matches SET is_current = FALSE WHERE is_current")
         cur.execute("UPDATE matches SET is_current = TRUE WHERE id = %s", (match_id,))
+    db.commit()
+    db.invalidate_current_context()
+    # Load the new match's door (every live pass, who's already in) now,
+    # rather than on the first scan of the night.
+    db.warm_door_index()
 
     _notify_wallet_pass_updates()
     return redirect(url_for('admin_matches'))
 
 
+@app.route('/admin/matches/<int:match_id>/capacity', methods=['POST'])
+def admin_match_set_capacity(match_id):
+    """Set (or clear, with a blank value) the fire-marshal capacity the
+    scan path enforces for a match."""
+    if not require_password():
+        return redirect(url_for('login'))
+
+    raw = request.form.get('capacity', '').strip()
+    try:
+        capacity = int(raw) if raw else None
+    except ValueError:
+        capacity = None
+    if capacity is not None and capacity <= 0:
+        capacity = None
+    db.set_match_capacity(match_id, capacity)
+    db.commit()
+    db.invalidate_current_context()
+    return redirect(url_for('admin_matches'))
+
+
 @app.route('/admin/passes/push-updates', methods=['POST'])
 def admin_push_pass_updates():
     """Manually force every installed Apple + Google Wallet pass to refresh
@@ -2745,6 +2900,71 @@ DOOR_PASS_EXPIRY_OPTIONS = {
 }
 
 
+@app.route('/admin/db-pool.json')
+def admin_db_pool_stats():
+    """This worker's connection-pool metrics (wait times, connection ages,
+    health-check failures) -- per process, so under a multi-worker server
+    hitting it repeatedly may land on different workers."""
+    if not require_password():
+        return jsonify({"status": "error", "code": "unauthorized"}), 401
+    return jsonify({"status": "ok", "pool": db.pool_stats(), "door_index": db.door_index_stats()})
+
+
+@app.route('/admin/db-queries.json')
+def admin_db_recent_queries():
+    """This worker's recent statements (newest first) with wall time, rows,
+    calling function, and connection-acquire time. `?min_ms=` to see only
+    the slow ones, `?limit=` to cap the list. Per process, like
+    /admin/db-pool.json."""
+    if not require_password():
+        return jsonify({"status": "error", "code": "unauthorized"}), 401
+    min_ms = request.args.get('min_ms', default=0, type=float)
+    limit = request.args.get('limit', default=100, type=int)
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "slow_query_ms": db.SLOW_QUERY_MS,
+        "queries": db.recent_queries(limit=limit, min_ms=min_ms),
+    })
+
+
+@app.route('/admin/db-performance')
+def admin_db_performance():
+    """Which statements dominate database time across every worker and
+    scheduled job, from pg_stat_statements, each mapped back to the
+    db.py/app.py function that issues it. Reset it right before something
+    worth measuring (doors opening, a bulk pass send) and come back after:
+    the numbers then cover exactly that window."""
+    if not require_password():
+        return redirect(url_for('login'))
+
+    order = request.args.get('order', 'total')
+    if order not in db.STATEMENT_STATS_ORDERS:
+        order = 'total'
+    stats = db.statement_stats(order=order, limit=request.args.get('limit', default=50, type=int))
+    return render_template(
+        'admin_db_performance.html',
+        stats=stats,
+        order=order,
+        orders=list(db.STATEMENT_STATS_ORDERS),
+        reset_message=request.args.get('reset_message'),
+        reset_error=request.args.get('reset_error'),
+        wordmark_data_uri=_current_theme_wordmark_data_uri(),
+    )
+
+
+@app.route('/admin/db-performance/reset', methods=['POST'])
+def admin_db_performance_reset():
+    """Start a fresh measuring window: zeroes pg_stat_statements for the
+    whole database (every worker's numbers, not just this one's)."""
+    if not require_password():
+        return redirect(url_for('login'))
+    ok, error = db.reset_statement_stats()
+    if not ok:
+        return redirect(url_for('admin_db_performance', reset_error=f"Couldn't reset: {error}"))
+    return redirect(url_for('admin_db_performance', reset_message="Statistics reset — measuring from now."))
+
+
 @app.route('/admin/door-access', methods=['GET', 'POST'])
 def admin_door_access():
     """Create/list/revoke scanner-only links for volunteer door staff --
@@ -2787,281 +3007,9 @@ def admin_door_access_revoke(pass_id):
     return redirect(url_for('admin_door_access'))
 
 
-@app.route('/scanner')
-def scanner():
-    if not require_scanner_access():
-        return redirect(url_for('login'))
-
-    season = db.get_current_season()
-    match = db.get_current_match()
-    is_home, wordmark_data_uri = _current_theme()
-    checked_in_count = db.count_checkins_for_match(match['id']) if match else 0
-
-    return render_template(
-        'scanner.html',
-        season=season,
-        match=_format_match_for_scan(match),
-        is_home=is_home,
-        wordmark_data_uri=wordmark_data_uri,
-        shop_qr_data_uri=_qr_data_uri(MEMBERSHIP_SHOP_URL),
-        shop_url=MEMBERSHIP_SHOP_URL,
-        checked_in_count=checked_in_count,
-        door_only=not require_password(),
-    )
-
-
-@app.route('/api/checkins/count')
-def api_checkins_count():
-    """Running check-in count for the current match — lets door staff watch
-    for fire-marshal capacity on early-entry nights. Grows only; there's no
-    "check out" in this system, checkins are a permanent per-match record."""
-    if not require_scanner_access():
-        return jsonify({"status": "error", "code": "unauthorized"}), 401
-    match = db.get_current_match()
-    if not match:
-        return jsonify({"status": "ok", "count": 0, "match_id": None})
-    return jsonify({"status": "ok", "count": db.count_checkins_for_match(match['id']), "match_id": match['id']})
-
-
-@app.route('/api/checkins/scan', methods=['POST'])
-def api_checkins_scan():
-    if not require_scanner_access():
-        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
-
-    payload = request.get_json(silent=True) or {}
-    token = _extract_scan_token(payload.get('token') or payload.get('barcode') or payload.get('value'))
-    if not token:
-        return jsonify({
-            "status": "error",
-            "code": "missing_token",
-            "message": "No wallet token found in the scan.",
-        }), 400
-
-    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
-
-    try:
-        with db.cursor() as cur:
-            cur.execute("SELECT id, name FROM seasons WHERE is_current")
-            season = cur.fetchone()
-            if not season:
-                return jsonify({
-                    "status": "error",
-                    "code": "no_current_season",
-                    "message": "No current season is configured.",
-                }), 400
-
-            cur.execute("SELECT * FROM matches WHERE is_current")
-            match = cur.fetchone()
-            if not match:
-                return jsonify({
-                    "status": "error",
-                    "code": "no_current_match",
-                    "message": "No current match is configured. Set one in Matches before scanning.",
-                }), 400
-
-            cur.execute(
-                """
-                SELECT wp.id AS wallet_pass_id, wp.member_id, wp.season_id, wp.revoked_at,
-                       m.first_name, m.last_name, m.email
-                FROM wallet_passes wp
-                JOIN members m ON m.id = wp.member_id
-                WHERE wp.token_hash = %s
-                """,
-                (token_hash,),
-            )
-            wallet_pass = cur.fetchone()
-
-            if not wallet_pass or wallet_pass['revoked_at'] or wallet_pass['season_id'] != season['id']:
-                return jsonify({
-                    "status": "error",
-                    "code": "invalid_or_expired",
-                    "message": "Invalid, expired, or revoked pass.",
-                    "match": _format_match_for_scan(match),
-                }), 404
-
-            scanner_admin_id = session.get('username') or ADMIN_USERNAME or "admin"
-            cur.execute(
-                """
-                INSERT INTO checkins (member_id, match_id, scanner_admin_id, source)
-                VALUES (%s, %s, %s, 'scanner')
-                ON CONFLICT (member_id, match_id) DO NOTHING
-                RETURNING id, checked_in_at
-                """,
-                (wallet_pass['member_id'], match['id'], scanner_admin_id),
-            )
-            inserted = cur.fetchone()
-
-            if inserted:
-                result = "checked_in"
-                checked_in_at = inserted['checked_in_at']
-                message = "Checked in."
-            else:
-                cur.execute(
-                    """
-                    SELECT id, checked_in_at
-                    FROM checkins
-                    WHERE member_id = %s AND match_id = %s
-                    """,
-                    (wallet_pass['member_id'], match['id']),
-                )
-                existing = cur.fetchone()
-                result = "already_checked_in"
-                checked_in_at = existing['checked_in_at'] if existing else None
-                message = "Already used for this match."
-
-        checked_in_display = ""
-        if checked_in_at:
-            try:
-                tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
-                checked_in_display = checked_in_at.astimezone(tz).strftime('%-I:%M:%S %p')
-            except Exception:
-                checked_in_display = str(checked_in_at)
-
-        return jsonify({
-            "status": "success",
-            "result": result,
-            "message": message,
-            "checked_in_at": checked_in_display,
-            "member": {
-                "id": wallet_pass['member_id'],
-                "name": f"{wallet_pass['first_name']} {wallet_pass['last_name']}".strip(),
-                "email": wallet_pass['email'],
-            },
-            "match": _format_match_for_scan(match),
-        })
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "code": "server_error",
-            "message": f"Scanner failed: {e}",
-        }), 500
-
-
-def _format_checkin_time(checked_in_at):
-    if not checked_in_at:
-        return ""
-    try:
-        tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
-        return checked_in_at.astimezone(tz).strftime('%-I:%M:%S %p')
-    except Exception:
-        return str(checked_in_at)
-
-
-@app.route('/api/checkins/manual', methods=['POST'])
-def api_checkins_manual():
-    """Check in a member found via the roster-search fallback, bypassing
-    the wallet token entirely — the admin has already identified who this
-    is by name, so there's no QR/token to look up. Same idempotency and
-    response shape as /api/checkins/scan, but source='manual' so the two
-    paths stay distinguishable in exports later."""
-    if not require_scanner_access():
-        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
-
-    payload = request.get_json(silent=True) or {}
-    try:
-        member_id = int(payload.get('member_id'))
-    except (TypeError, ValueError):
-        return jsonify({"status": "error", "code": "missing_member_id", "message": "No member selected."}), 400
-
-    try:
-        with db.cursor() as cur:
-            cur.execute("SELECT id, name FROM seasons WHERE is_current")
-            season = cur.fetchone()
-            if not season:
-                return jsonify({"status": "error", "code": "no_current_season", "message": "No current season is configured."}), 400
-
-            cur.execute("SELECT * FROM matches WHERE is_current")
-            match = cur.fetchone()
-            if not match:
-                return jsonify({"status": "error", "code": "no_current_match", "message": "No current match is configured. Set one in Matches before scanning."}), 400
-
-            cur.execute(
-                """
-                SELECT m.id, m.first_name, m.last_name, m.email
-                FROM members m
-                JOIN member_seasons ms ON ms.member_id = m.id
-                WHERE m.id = %s AND ms.season_id = %s
-                """,
-                (member_id, season['id']),
-            )
-            member = cur.fetchone()
-            if not member:
-                return jsonify({
-                    "status": "error",
-                    "code": "not_in_current_season",
-                    "message": "That member isn't in the current season.",
-                    "match": _format_match_for_scan(match),
-                }), 404
-
-            scanner_admin_id = session.get('username') or ADMIN_USERNAME or "admin"
-            cur.execute(
-                """
-                INSERT INTO checkins (member_id, match_id, scanner_admin_id, source)
-                VALUES (%s, %s, %s, 'manual')
-                ON CONFLICT (member_id, match_id) DO NOTHING
-                RETURNING id, checked_in_at
-                """,
-                (member['id'], match['id'], scanner_admin_id),
-            )
-            inserted = cur.fetchone()
-
-            if inserted:
-                result = "checked_in"
-                checked_in_at = inserted['checked_in_at']
-                message = "Checked in."
-            else:
-                cur.execute(
-                    "SELECT id, checked_in_at FROM checkins WHERE member_id = %s AND match_id = %s",
-                    (member['id'], match['id']),
-                )
-                existing = cur.fetchone()
-                result = "already_checked_in"
-                checked_in_at = existing['checked_in_at'] if existing else None
-                message = "Already used for this match."
-
-        return jsonify({
-            "status": "success",
-            "result": result,
-            "message": message,
-            "checked_in_at": _format_checkin_time(checked_in_at),
-            "member": {
-                "id": member['id'],
-                "name": f"{member['first_name']} {member['last_name']}".strip(),
-                "email": member['email'],
-            },
-            "match": _format_match_for_scan(match),
-        })
-    except Exception as e:
-        return jsonify({"status": "error", "code": "server_error", "message": f"Manual check-in failed: {e}"}), 500
-
-
-@app.route('/api/members/roster.json')
-def api_members_roster():
-    """Name + ID only for the current season, for the scanner's client-side
-    search fallback. Deliberately excludes email/phone — if this ends up on
-    a lost/borrowed phone, it should only ever leak names, not contact info.
-    """
-    if not require_scanner_access():
-        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
-
-    season = db.get_current_season()
-    if not season:
-        return jsonify([])
-
-    with db.cursor() as cur:
-        cur.execute(
-            """
-            SELECT m.id, m.first_name, m.last_name
-            FROM members m
-            JOIN member_seasons ms ON ms.member_id = m.id
-            WHERE ms.season_id = %s
-            ORDER BY m.last_name, m.first_name
-            """,
-            (season['id'],),
-        )
-        rows = cur.fetchall()
-
-    return jsonify([{"id": r['id'], "name": f"{r['first_name']} {r['last_name']}".strip()} for r in rows])
+# The door scanner's page and APIs (and /door/<token>) live in
+# scanner_routes.py, shared with the scanner-only scanner_app.py.
+register_scanner_routes(app, page_theme=_current_theme)
 
 
 if __name__ == '__main__':
@@ -3078,4 +3026,4 @@ if __name__ == '__main__':
     print(f"   Access from your phone using your computer's IP address")
     print()
     
-    app.run(host='0.0.0.0', port=port, debug=False)
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -7,18 +7,31 @@ No migration framework: schema.sql is applied idempotently
 needs to change, add to schema.sql and re-run `python3 db.py`.
 
 Requires DATABASE_URL in the environment (see .env), e.g. a Supabase
-connection string.
+connection string. Connections (psycopg 3) are pooled per process behind
+cursor(); see the DB_POOL_* settings below.
 """
 import base64
+import collections
+import csv
 import hashlib
+import json
 import os
+import queue
+import re
 import secrets
+import sys
+import threading
 import time
+import weakref
 from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 
-import psycopg2
-import psycopg2.extras
+import psycopg
+import psycopg.sql
+import psycopg_pool
+from psycopg.pq import PipelineStatus, TransactionStatus
+from psycopg.rows import dict_row
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
@@ -28,25 +41,1034 @@ SCHEMA_PATH = Path(__file__).parent / "schema.sql"
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 
-def get_conn():
-    if not DATABASE_URL:
+def _env_int(key, default):
+    try:
+        return int(os.getenv(key, default))
+    except ValueError:
+        return default
+
+
+# Pool sizing is per process -- the one `python3 app.py` process render.yaml
+# runs, or each worker if it's ever run under gunicorn. The
+# Supabase transaction pooler (port 6543) already multiplexes server-side,
+# so a handful per worker is plenty -- the point is to stop paying a fresh
+# TCP+TLS+auth handshake (~1.3s from Render) on every single query, not to
+# hold lots of connections open.
+POOL_MIN_SIZE = _env_int("DB_POOL_MIN_SIZE", 1)
+POOL_MAX_SIZE = _env_int("DB_POOL_MAX_SIZE", 5)
+# How long cursor() waits for a free connection before giving up.
+POOL_TIMEOUT_SECONDS = _env_int("DB_POOL_TIMEOUT_SECONDS", 10)
+# A connection idle longer than this gets a cheap empty query before being
+# handed out -- Supabase/pgbouncer and NAT boxes quietly drop idle sockets.
+POOL_IDLE_CHECK_SECONDS = _env_int("DB_POOL_IDLE_CHECK_SECONDS", 30)
+# Recycle connections older than this, so a long-lived worker doesn't keep
+# one server backend (and its memory) forever.
+POOL_MAX_AGE_SECONDS = _env_int("DB_POOL_MAX_AGE_SECONDS", 1800)
+
+
+class PoolTimeout(RuntimeError):
+    """No pooled connection became free within POOL_TIMEOUT_SECONDS."""
+
+
+def _connect_kwargs():
+    # prepare_threshold=None: the Supabase transaction pooler hands each
+    # transaction whatever server backend is free, so a statement psycopg
+    # prepared on one isn't there on the next.
+    return {
+        "application_name": os.getenv("DB_APPLICATION_NAME", "olsc-web-app"),
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 3,
+        "prepare_threshold": None,
+    }
+
+
+def get_conn(dsn=None):
+    """A brand-new, unpooled connection (to DATABASE_URL unless `dsn` says
+    otherwise). cursor() goes through the pool instead; this stays for
+    one-off scripts and anything that needs a connection all to itself."""
+    dsn = dsn or DATABASE_URL
+    if not dsn:
         raise RuntimeError("DATABASE_URL is not set (see .env)")
-    return psycopg2.connect(DATABASE_URL)
+    return psycopg.connect(dsn, **_connect_kwargs())
+
+
+class _ConnectionPool:
+    """Bounded, thread-safe pool of psycopg connections: a
+    psycopg_pool.ConnectionPool, plus the acquire/release bookkeeping
+    pool_stats() reports.
+
+    Connections come out with dict rows and _TimedCursor cursors. One
+    that's sat idle past `idle_check` is pinged before it's handed out --
+    Supabase/pgbouncer and NAT boxes quietly drop idle sockets, and on
+    match night a burst of door scans lands on a worker whose connections
+    have sat idle all week. A recently used one isn't, so the door's
+    back-to-back scans don't pay a round-trip for it.
+    """
+
+    def __init__(self, min_size, max_size, timeout, idle_check, max_age, dsn=None, read_only=False):
+        dsn = dsn or DATABASE_URL
+        if not dsn:
+            raise RuntimeError("DATABASE_URL is not set (see .env)")
+        self.read_only = read_only
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._lock = threading.Lock()
+        self._created_at = weakref.WeakKeyDictionary()  # conn -> created_at
+        self._last_used = weakref.WeakKeyDictionary()   # conn -> last released
+        self._stats = {
+            "acquired": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+        self._pool = psycopg_pool.ConnectionPool(
+            dsn,
+            kwargs=dict(_connect_kwargs(), row_factory=dict_row, cursor_factory=_TimedCursor),
+            min_size=min(max(0, min_size), self.max_size),
+            max_size=self.max_size,
+            timeout=timeout,
+            max_lifetime=max_age,
+            configure=self._configure,
+            check=self._check,
+            name="olsc-replica" if read_only else "olsc",
+            open=True,
+        )
+
+    def _configure(self, conn):
+        if self.read_only:
+            conn.read_only = True
+        with self._lock:
+            self._created_at[conn] = self._last_used[conn] = time.monotonic()
+
+    def _check(self, conn):
+        with self._lock:
+            last_used = self._last_used.get(conn, 0.0)
+        if time.monotonic() - last_used < self.idle_check:
+            return
+        try:
+            psycopg_pool.ConnectionPool.check_connection(conn)
+        except Exception:
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            raise
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        try:
+            conn = self._pool.getconn(timeout)
+        except psycopg_pool.PoolTimeout:
+            raise PoolTimeout(
+                f"No database connection free after {timeout}s (pool max {self.max_size})"
+            ) from None
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != TransactionStatus.IDLE:
+                    conn.rollback()
+            except psycopg.Error:
+                discard = True
+        if discard:
+            # A closed connection is dropped (and replaced) by the pool.
+            conn.close()
+        else:
+            with self._lock:
+                self._last_used[conn] = time.monotonic()
+        self._pool.putconn(conn)
+
+    def warm(self):
+        """Open up to min_size connections ahead of the first request."""
+        try:
+            self._pool.wait(self.timeout)
+        except psycopg_pool.PoolTimeout:
+            raise PoolTimeout(f"Pool didn't reach its minimum size within {self.timeout}s") from None
+
+    def close_all(self):
+        self._pool.close()
+
+    def stats(self):
+        now = time.monotonic()
+        pool = self._pool.get_stats()
+        with self._lock:
+            ages = [now - created for conn, created in self._created_at.items() if not conn.closed]
+            stats = dict(self._stats)
+        size = pool.get("pool_size", 0)
+        idle = pool.get("pool_available", 0)
+        stats.update({
+            "created": pool.get("connections_num", 0),
+            "discarded": pool.get("returns_bad", 0) + pool.get("connections_lost", 0),
+            "timeouts": pool.get("requests_errors", 0),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "max_size": self.max_size,
+            "wait_seconds_avg": (
+                stats["wait_seconds_total"] / stats["acquired"] if stats["acquired"] else 0.0
+            ),
+            "connection_age_seconds_max": max(ages) if ages else 0.0,
+            "connection_age_seconds_avg": sum(ages) / len(ages) if ages else 0.0,
+        })
+        return stats
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """This process's connection pool, created on first use. Re-created
+    after a fork (a pre-forking server such as gunicorn --preload), since
+    sharing a libpq socket between parent and child processes corrupts
+    both."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = _ConnectionPool(
+                    POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT_SECONDS,
+                    POOL_IDLE_CHECK_SECONDS, POOL_MAX_AGE_SECONDS,
+                )
+                _pool_pid = pid
+    return _pool
+
+
+# Optional read replica for the heavy read-only pages (leaderboard,
+# roster, exports) -- see cursor(read_only=True). Unset means everything
+# reads from the primary, as before.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# A replica further behind than this is skipped in favour of the primary.
+READ_MAX_LAG_SECONDS = _env_int("DB_READ_MAX_LAG_SECONDS", 30)
+# How often each process re-checks the replica's lag (and whether it's up).
+READ_CHECK_SECONDS = _env_int("DB_READ_CHECK_SECONDS", 15)
+# How long a read waits for a replica connection before going to the
+# primary instead. The pool reconnects a replica that's gone down in the
+# background, and until then it just has nothing to hand out -- better a
+# quick fallback than a report that sits out the whole pool timeout.
+READ_ACQUIRE_TIMEOUT_SECONDS = _env_int("DB_READ_ACQUIRE_TIMEOUT_SECONDS", 2)
+
+_read_pool = None
+_read_pool_pid = None
+_replica_lock = threading.Lock()
+_replica_state = {"checked_at": None, "usable": False, "lag_seconds": None, "error": None}
+
+
+def get_read_pool():
+    """This process's pool of read-only connections to DATABASE_READ_URL,
+    or None when no replica is configured. Same fork rule as get_pool()."""
+    global _read_pool, _read_pool_pid
+    if not DATABASE_READ_URL:
+        return None
+    pid = os.getpid()
+    if _read_pool is None or _read_pool_pid != pid:
+        with _pool_lock:
+            if _read_pool is None or _read_pool_pid != pid:
+                _read_pool = _ConnectionPool(
+                    POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT_SECONDS,
+                    POOL_IDLE_CHECK_SECONDS, POOL_MAX_AGE_SECONDS,
+                    dsn=DATABASE_READ_URL, read_only=True,
+                )
+                _read_pool_pid = pid
+    return _read_pool
+
+
+def _set_replica_state(usable, lag_seconds=None, error=None):
+    with _replica_lock:
+        was_usable = _replica_state["usable"]
+        _replica_state.update(usable=usable, lag_seconds=lag_seconds, error=error)
+    if usable != was_usable:
+        if usable:
+            print(f"[db replica] reads going to the replica (lag {lag_seconds:.1f}s)")
+        else:
+            reason = error or f"lag {lag_seconds:.1f}s > {READ_MAX_LAG_SECONDS}s"
+            print(f"[db replica] reads falling back to the primary: {reason}")
+
+
+def _replica_pool():
+    """The read pool, if read_only blocks should use it right now: one is
+    configured, reachable, and no more than READ_MAX_LAG_SECONDS behind.
+    Checked at most every READ_CHECK_SECONDS per process; while one thread
+    checks, the others go by the last verdict."""
+    pool = get_read_pool()
+    if pool is None:
+        return None
+    now = time.monotonic()
+    with _replica_lock:
+        checked_at = _replica_state["checked_at"]
+        if checked_at is not None and now - checked_at < READ_CHECK_SECONDS:
+            return pool if _replica_state["usable"] else None
+        _replica_state["checked_at"] = now
+
+    try:
+        conn = pool.acquire(READ_ACQUIRE_TIMEOUT_SECONDS)
+    except (psycopg.Error, PoolTimeout) as e:
+        _set_replica_state(False, error=str(e).strip())
+        return None
+    discard = False
+    try:
+        with conn.cursor() as cur:
+            # Caught up with everything received counts as no lag, however
+            # old the last replayed transaction is -- an idle primary sends
+            # nothing to replay. Not a standby at all (e.g. a second local
+            # Postgres in tests) is no lag either.
+            cur.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END AS lag
+                """
+            )
+            lag = float(cur.fetchone()["lag"])
+        conn.rollback()
+    except psycopg.Error as e:
+        discard = True
+        _set_replica_state(False, error=str(e).strip())
+        return None
+    finally:
+        pool.release(conn, discard=discard)
+
+    usable = lag <= READ_MAX_LAG_SECONDS
+    _set_replica_state(usable, lag_seconds=lag)
+    return pool if usable else None
+
+
+def _acquire_replica():
+    """(pool, conn, acquire_seconds) on the replica, or None to use the
+    primary. A replica that can't hand out a connection is marked down
+    until the next check."""
+    pool = _replica_pool()
+    if pool is None:
+        return None
+    started = time.perf_counter()
+    try:
+        conn = pool.acquire(READ_ACQUIRE_TIMEOUT_SECONDS)
+    except (psycopg.Error, PoolTimeout) as e:
+        _set_replica_state(False, error=str(e).strip())
+        return None
+    return pool, conn, time.perf_counter() - started
+
+
+def pool_stats():
+    """Pool-wait and connection-age metrics for this process (and for its
+    replica pool, when DATABASE_READ_URL is set)."""
+    stats = get_pool().stats()
+    stats["pid"] = os.getpid()
+    read_pool = get_read_pool()
+    if read_pool is not None:
+        stats["replica"] = read_pool.stats()
+        with _replica_lock:
+            stats["replica"].update(
+                usable=_replica_state["usable"],
+                lag_seconds=_replica_state["lag_seconds"],
+                error=_replica_state["error"],
+            )
+    return stats
+
+
+# Statements slower than this are printed as a slow-query log line (the
+# statement only, never its parameters -- those include raw pass tokens).
+SLOW_QUERY_MS = _env_int("DB_SLOW_QUERY_MS", 250)
+# How many recent statements each worker remembers for recent_queries().
+QUERY_LOG_SIZE = _env_int("DB_QUERY_LOG_SIZE", 500)
+
+_query_log = collections.deque(maxlen=QUERY_LOG_SIZE)
+# cursor()'s own frames, which are never "the caller" of a statement.
+_TIMING_INTERNALS = {"execute", "executemany", "copy", "_send_prelude", "cursor", "stream_rows"}
+# The modules whose functions are views -- "the app" half of a statement's
+# label -- matched on full path, since Flask has an app.py of its own.
+_HERE = Path(__file__).resolve().parent
+_APP_MODULES = {str(_HERE / f"{name}.py"): name for name in ("app", "scanner_routes", "scanner_app")}
+_DB_FILE = str(_HERE / "db.py")
+_frame_modules = {}  # co_filename -> "app" / "scanner_routes" / ... / "db" / ""
+
+
+def _frame_module(co_filename):
+    module = _frame_modules.get(co_filename)
+    if module is None:
+        path = os.path.abspath(co_filename)
+        module = _APP_MODULES.get(path) or ("db" if path == _DB_FILE else "")
+        _frame_modules[co_filename] = module
+    return module
+
+
+class _TimedCursor(psycopg.ClientCursor):
+    """Dict-row cursor (the pool hands connections out with dict_row) that
+    times every statement it runs (see _record_query) and tags it with the
+    function that issued it (see _tag_sql). `acquire_seconds` is how long
+    cursor() waited for the connection this block runs on; it's charged to
+    the block's first statement only.
+
+    Parameters are bound client-side, as psycopg2 always did, so every
+    statement here keeps its `%s` placeholders as they are -- and a single
+    execute() can still carry more than one statement, which the savepoint
+    prelude relies on. executemany() runs in pipeline mode: every row's
+    statement goes out before any result comes back, one round-trip for
+    the lot rather than one each."""
+
+    acquire_seconds = 0.0
+    # Set on read_only blocks that went to the replica; shown in the query log.
+    replica = False
+    # A session block's savepoint bookkeeping (see _Session.cursor): the
+    # statements sent ahead of this cursor's first one, in the same
+    # round-trip; None once they've gone out.
+    prelude = None
+
+    def execute(self, query, params=None, **kwargs):
+        if isinstance(query, psycopg.sql.Composable):
+            query = query.as_string(self)
+        if isinstance(query, bytes):
+            query = query.decode()
+        caller, owner = _query_caller()
+        sent = _tag_sql(query, owner)
+        joined = bool(self.prelude) and not self._pipelined()
+        if joined:
+            prelude, self.prelude = self.prelude, None
+            sent = ";\n".join(prelude + [sent])
+        else:
+            self._send_prelude()
+        started = time.perf_counter()
+        try:
+            super().execute(sent, params, **kwargs)
+            if joined:
+                # Each statement sent gets a result; fetch*() wants the
+                # caller's, the last one.
+                while self.nextset():
+                    pass
+            return self
+        finally:
+            self._record(query, started, caller)
+
+    def executemany(self, query, params_seq, **kwargs):
+        caller, owner = _query_caller()
+        started = time.perf_counter()
+        try:
+            with self.connection.pipeline():
+                self._send_prelude()
+                return super().executemany(_tag_sql(query, owner), params_seq, **kwargs)
+        finally:
+            self._record(query, started, caller)
+
+    @contextmanager
+    def copy(self, statement, params=None, **kwargs):
+        # COPY can't share a round-trip with anything else.
+        self._send_prelude()
+        caller, owner = _query_caller()
+        started = time.perf_counter()
+        try:
+            with super().copy(_tag_sql(statement, owner), params, **kwargs) as copy:
+                yield copy
+        finally:
+            self._record(statement, started, caller)
+
+    def _pipelined(self):
+        return self.connection.pgconn.pipeline_status != PipelineStatus.OFF
+
+    def _send_prelude(self):
+        """The prelude on its own -- queued, when in a pipeline (where
+        it's one statement per query, but still the same round-trip)."""
+        prelude, self.prelude = self.prelude, None
+        if not prelude:
+            return
+        if self._pipelined():
+            for statement in prelude:
+                super().execute(statement)
+        else:
+            super().execute(";\n".join(prelude))
+
+    def _record(self, query, started, caller):
+        acquire_seconds, self.acquire_seconds = self.acquire_seconds, 0.0
+        _record_query(
+            query, time.perf_counter() - started, self.rowcount, caller, acquire_seconds, self.replica,
+        )
+
+
+def _query_caller():
+    """("app.<view> > db.<helper>", owner) for the statement about to run.
+    The label pairs the outermost db.py function on the stack (the helper
+    the view actually called, not an internal like _checkin) with the view
+    that called it -- in app.py, scanner_routes.py or scanner_app.py,
+    e.g. "scanner_routes.api_checkins_scan"; either half is left off when
+    it isn't on the stack -- e.g. a script calling db.* directly. `owner`
+    is whichever of the two wrote the SQL: the db.py helper, or the view
+    for the few queries that still live in app.py."""
+    db_fn = app_fn = None
+    frame = sys._getframe(1)
+    depth = 0
+    while frame is not None and depth < 40:
+        module = _frame_module(frame.f_code.co_filename)
+        name = frame.f_code.co_name
+        if module == "db":
+            if name not in _TIMING_INTERNALS:
+                db_fn = f"db.{name}"
+        elif module:
+            app_fn = f"{module}.{name}"
+            break
+        frame = frame.f_back
+        depth += 1
+    label = " > ".join(part for part in (app_fn, db_fn) if part) or "?"
+    return label, db_fn or app_fn
+
+
+# Leading comment naming the function that issued a statement. Postgres
+# ignores it when fingerprinting (so pg_stat_statements still folds every
+# call into one row) but keeps it in the stored query text, which is how
+# statement_stats() maps a normalized statement back to its function --
+# across every worker and scheduled job, not just this process.
+_SQL_TAG_PREFIX = "/* olsc:"
+_SQL_TAG_RE = re.compile(r"^\s*/\* olsc:([\w.]+) \*/\s*")
+
+
+def _tag_sql(query, owner):
+    if not owner:
+        return query
+    tag = f"{_SQL_TAG_PREFIX}{owner} */ "
+    if isinstance(query, bytes):
+        return tag.encode() + query
+    return tag + query
+
+
+def _request_timing():
+    timing = getattr(_local, "timing", None)
+    if timing is None:
+        timing = _local.timing = {"queries": 0, "db_ms": 0.0, "acquire_ms": 0.0}
+    return timing
+
+
+def _record_query(query, seconds, rows, caller, acquire_seconds=0.0, replica=False):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    sql = " ".join(_SQL_TAG_RE.sub("", str(query)).split())
+    ms = seconds * 1000
+    entry = {
+        "at": time.time(),
+        "ms": round(ms, 2),
+        "acquire_ms": round(acquire_seconds * 1000, 2),
+        "rows": rows if rows is not None and rows >= 0 else None,
+        "caller": caller,
+        "replica": replica,
+        "sql": sql[:500],
+    }
+    _query_log.append(entry)
+    timing = _request_timing()
+    timing["queries"] += 1
+    timing["db_ms"] += ms
+    timing["acquire_ms"] += acquire_seconds * 1000
+    if ms >= SLOW_QUERY_MS:
+        where = " (replica)" if replica else ""
+        print(f"[slow query]{where} {ms:.0f}ms rows={entry['rows']} {entry['caller']}: {sql[:300]}")
+
+
+def recent_queries(limit=None, min_ms=0):
+    """This worker's most recent statements, newest first: wall time, rows,
+    calling function, and connection-acquire time for each."""
+    entries = [e for e in reversed(list(_query_log)) if e["ms"] >= min_ms]
+    return entries[:limit] if limit else entries
+
+
+def request_timing():
+    """Totals for the current request/session on this thread so far:
+    {"queries", "db_ms", "acquire_ms"}. Reset by begin_session()."""
+    return dict(_request_timing())
+
+
+# Sort keys statement_stats() accepts -> the column it orders by.
+STATEMENT_STATS_ORDERS = {"total": "total_ms", "mean": "mean_ms", "calls": "calls", "rows": "rows"}
+
+
+def _pg_stat_statements_schema(cur):
+    cur.execute(
+        """
+        SELECT n.nspname AS schema
+        FROM pg_extension e
+        JOIN pg_namespace n ON n.oid = e.extnamespace
+        WHERE e.extname = 'pg_stat_statements'
+        """
+    )
+    row = cur.fetchone()
+    return row["schema"] if row else None
+
+
+def statement_stats(order="total", limit=50):
+    """Server-side view of which statements dominate database time, from
+    pg_stat_statements -- across every worker and job, unlike
+    recent_queries(). Each row carries `function`, the db.py/app.py
+    function that issued it (from the tag _tag_sql puts on every
+    statement; None for SQL from elsewhere, e.g. the Supabase dashboard).
+
+    Returns {"available": False, "reason": ...} rather than raising when
+    the extension isn't installed or loaded, so the admin page can say so.
+    """
+    order_column = STATEMENT_STATS_ORDERS.get(order, "total_ms")
+    try:
+        with cursor() as cur:
+            schema = _pg_stat_statements_schema(cur)
+            if schema is None:
+                return {
+                    "available": False,
+                    "reason": "The pg_stat_statements extension isn't installed "
+                              "(CREATE EXTENSION pg_stat_statements).",
+                }
+            view = psycopg.sql.Identifier(schema, "pg_stat_statements")
+            # Renamed *_exec_time in Postgres 13 (Supabase is 15).
+            if cur.connection.info.server_version >= 130000:
+                total_col, mean_col = "total_exec_time", "mean_exec_time"
+            else:
+                total_col, mean_col = "total_time", "mean_time"
+            cur.execute(
+                psycopg.sql.SQL(
+                    """
+                    SELECT s.queryid, s.query, s.calls, s.rows,
+                           s.{total} AS total_ms,
+                           s.{mean} AS mean_ms,
+                           s.shared_blks_hit, s.shared_blks_read,
+                           CASE WHEN s.shared_blks_hit + s.shared_blks_read > 0
+                                THEN s.shared_blks_hit::float
+                                     / (s.shared_blks_hit + s.shared_blks_read)
+                           END AS cache_hit_ratio
+                    FROM {view} s
+                    WHERE s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                      AND s.query NOT LIKE '%%pg_stat_statements%%'
+                    ORDER BY {order} DESC NULLS LAST
+                    LIMIT %s
+                    """
+                ).format(
+                    total=psycopg.sql.Identifier(total_col),
+                    mean=psycopg.sql.Identifier(mean_col),
+                    view=view,
+                    order=psycopg.sql.Identifier(order_column),
+                ),
+                (limit,),
+            )
+            rows = cur.fetchall()
+            cur.execute(
+                psycopg.sql.SQL(
+                    """
+                    SELECT sum({total}) AS total_ms FROM {view}
+                    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                    """
+                ).format(total=psycopg.sql.Identifier(total_col), view=view)
+            )
+            grand_total_ms = cur.fetchone()["total_ms"] or 0
+            stats_reset = None
+            if cur.connection.info.server_version >= 140000:
+                cur.execute(
+                    psycopg.sql.SQL("SELECT stats_reset FROM {}").format(
+                        psycopg.sql.Identifier(schema, "pg_stat_statements_info")
+                    )
+                )
+                stats_reset = cur.fetchone()["stats_reset"]
+    except psycopg.Error as e:
+        # Installed but not in shared_preload_libraries, or no permission.
+        return {"available": False, "reason": str(e).strip()}
+
+    for row in rows:
+        match = _SQL_TAG_RE.match(row["query"])
+        row["function"] = match.group(1) if match else None
+        row["query"] = _SQL_TAG_RE.sub("", row["query"])
+        row["share"] = (row["total_ms"] / grand_total_ms) if grand_total_ms else None
+    return {
+        "available": True,
+        "rows": rows,
+        "total_ms": grand_total_ms,
+        "stats_reset": stats_reset,
+    }
+
+
+def reset_statement_stats():
+    """Zero pg_stat_statements, to start a measuring window (e.g. right
+    before doors open). Returns (ok, error_message)."""
+    try:
+        with cursor() as cur:
+            schema = _pg_stat_statements_schema(cur)
+            if schema is None:
+                return False, "pg_stat_statements isn't installed."
+            cur.execute(
+                psycopg.sql.SQL("SELECT {}()").format(
+                    psycopg.sql.Identifier(schema, "pg_stat_statements_reset")
+                )
+            )
+    except psycopg.Error as e:
+        return False, str(e).strip()
+    return True, None
+
+
+class _Session:
+    """One connection lent to every cursor() block for the length of a
+    unit of work (a Flask request). Borrowed lazily on the first query, so requests that never touch
+    the DB never touch the pool either."""
+
+    def __init__(self):
+        self.conn = None
+        self.broken = False
+        self._in_transaction = False
+        self._savepoints = 0
+        self._open_savepoint = None
+        self._after_commit = []
+
+    @contextmanager
+    def cursor(self):
+        # Each block after the first gets its own savepoint, so an exception
+        # inside one block still only undoes that block -- the same contract
+        # cursor() always had -- and a handler that catches it (e.g. "Could
+        # not add member") can carry on querying on the same transaction.
+        # The first block in a transaction needs no savepoint: rolling back
+        # the whole transaction undoes exactly that block.
+        #
+        # None of it costs a round-trip of its own: SAVEPOINT goes out in
+        # front of the block's first statement, and a block that succeeded
+        # has its savepoint RELEASEd in front of the next block's SAVEPOINT
+        # (or simply by the COMMIT). So at most one is ever open, instead
+        # of one per block piling up for the length of the request.
+        acquire_seconds = 0.0
+        if self.conn is None:
+            started = time.perf_counter()
+            self.conn = get_pool().acquire()
+            acquire_seconds = time.perf_counter() - started
+        name = None
+        if self._in_transaction:
+            self._savepoints += 1
+            name = f"db_block_{self._savepoints}"
+        with self.conn.cursor() as cur:
+            cur.acquire_seconds = acquire_seconds
+            if name:
+                cur.prelude = [f"SAVEPOINT {name}"]
+                if self._open_savepoint:
+                    cur.prelude.insert(0, f"RELEASE SAVEPOINT {self._open_savepoint}")
+            self._in_transaction = True
+            try:
+                yield cur
+            except Exception as e:
+                if isinstance(e, (psycopg.OperationalError, psycopg.InterfaceError)):
+                    self.broken = True
+                    raise
+                try:
+                    if name and cur.prelude is None:
+                        cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                        self._open_savepoint = name
+                    elif not name:
+                        self.conn.rollback()
+                        self._in_transaction = False
+                        self._open_savepoint = None
+                        self._after_commit.clear()
+                    # (else the block failed before sending anything: there
+                    # is nothing of it to undo.)
+                except psycopg.Error:
+                    self.broken = True
+                raise
+            if name and cur.prelude is None:
+                self._open_savepoint = name
+
+    def commit(self):
+        if self.conn is not None and not self.broken:
+            started = time.perf_counter()
+            self.conn.commit()
+            _request_timing()["db_ms"] += (time.perf_counter() - started) * 1000
+            self._in_transaction = False
+            self._savepoints = 0
+            self._open_savepoint = None
+            self._run_after_commit()
+
+    def _run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def close(self, commit):
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        try:
+            if commit and not self.broken:
+                started = time.perf_counter()
+                conn.commit()
+                _request_timing()["db_ms"] += (time.perf_counter() - started) * 1000
+            else:
+                self._after_commit.clear()
+                conn.rollback()
+        except psycopg.Error:
+            self.broken = True
+            raise
+        finally:
+            get_pool().release(conn, discard=self.broken)
+        self._run_after_commit()
+
+
+_local = threading.local()
+
+
+def begin_session():
+    """Start a request-scoped unit of work on this thread: every cursor()
+    block until end_session() shares one pooled connection and one
+    transaction. Sessions don't nest -- starting one while another is open
+    would silently throw the outer one's work away, so it raises instead."""
+    if getattr(_local, "session", None) is not None:
+        raise RuntimeError("begin_session() called while a session is already open on this thread")
+    _local.session = _Session()
+    _local.timing = None
+
+
+def end_session(commit=True):
+    """Commit (or roll back) and return the session's connection to the
+    pool. No-op when no session is active, so it's safe to call twice."""
+    sess = getattr(_local, "session", None)
+    if sess is None:
+        return
+    _local.session = None
+    sess.close(commit)
+
+
+def _after_commit(callback):
+    """Call `callback()` once the current session's transaction commits
+    (never, if it rolls back) -- for dropping in-process caches of what it
+    changed, so a concurrent request can't refill them from the
+    pre-commit state. Outside a session, cursor() blocks have already
+    committed by the time their helper returns, so it runs right away."""
+    sess = getattr(_local, "session", None)
+    if sess is None:
+        callback()
+    else:
+        sess._after_commit.append(callback)
+
+
+def commit():
+    """Commit the current session's work so far, keeping the session open.
+    For handlers that need something durable (or visible to other
+    workers/devices) before they carry on -- e.g. a bulk send committing
+    each member as it goes. No-op outside a session, where every cursor()
+    block already commits on its own."""
+    sess = getattr(_local, "session", None)
+    if sess is not None:
+        sess.commit()
 
 
 @contextmanager
-def cursor():
-    """Dict-row cursor. Commits on success, rolls back on exception."""
-    conn = get_conn()
+def cursor(read_only=False):
+    """Dict-row cursor. Commits on success, rolls back on exception.
+
+    Inside a session (see begin_session) the block runs on the session's
+    shared connection instead, and is only committed when the session
+    ends. Otherwise it borrows a pooled connection just for this block; a
+    connection that errors at the network level is dropped from the pool
+    rather than handed to the next caller.
+
+    read_only=True is for the heavy report reads (leaderboard, roster,
+    exports): with a replica configured (DATABASE_READ_URL) and keeping
+    up, the block runs there on a connection of its own -- session or
+    not -- so those queries never hold, or queue for, the primary
+    connections the door scanner needs. Otherwise it's an ordinary block.
+    On the replica it can't write, and won't see anything this request
+    hasn't committed yet."""
+    replica = _acquire_replica() if read_only else None
+    sess = getattr(_local, "session", None)
+    if sess is not None and replica is None:
+        with sess.cursor() as cur:
+            yield cur
+        return
+
+    if replica is not None:
+        pool, conn, acquire_seconds = replica
+    else:
+        pool = get_pool()
+        started = time.perf_counter()
+        conn = pool.acquire()
+        acquire_seconds = time.perf_counter() - started
+    discard = False
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        with conn.cursor() as cur:
+            cur.acquire_seconds = acquire_seconds
+            cur.replica = replica is not None
             yield cur
         conn.commit()
-    except Exception:
-        conn.rollback()
+    except Exception as e:
+        discard = isinstance(e, (psycopg.OperationalError, psycopg.InterfaceError))
+        try:
+            conn.rollback()
+        except psycopg.Error:
+            discard = True
+        raise
+    finally:
+        pool.release(conn, discard=discard)
+
+
+STREAM_ITERSIZE = _env_int("DB_STREAM_ITERSIZE", 2000)
+
+
+def stream_rows(sql, params=None, itersize=None, read_only=False):
+    """Yield dict rows from a named (server-side) cursor, `itersize` rows
+    per round-trip, so a big export runs in constant memory instead of
+    fetchall()-ing the lot.
+
+    Deliberately NOT on the request session: a streamed Response body is
+    iterated after the request's after_request/teardown have already run,
+    so this borrows its own pooled connection for as long as the generator
+    is alive, and hands it back when it finishes or is closed (e.g. the
+    client disconnects mid-download). Read-only -- always rolled back.
+    read_only=True streams from the replica when there's a usable one, as
+    cursor(read_only=True) does."""
+    # Who's asking has to be worked out now: by the time the generator
+    # body runs, the view that built this query is long gone from the
+    # stack.
+    caller, owner = _query_caller()
+    return _stream_rows(_tag_sql(sql, owner), params, itersize or STREAM_ITERSIZE, caller, read_only)
+
+
+def _stream_rows(sql, params, itersize, caller, read_only):
+    replica = _acquire_replica() if read_only else None
+    if replica is not None:
+        pool, conn, acquire_seconds = replica
+    else:
+        pool = get_pool()
+        started = time.perf_counter()
+        conn = pool.acquire()
+        acquire_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    rows = 0
+    discard = False
+    try:
+        name = f"olsc_stream_{secrets.token_hex(6)}"
+        with conn.cursor(name=name) as cur:
+            cur.itersize = itersize
+            cur.execute(sql, params)
+            for row in cur:
+                rows += 1
+                yield row
+    except (psycopg.OperationalError, psycopg.InterfaceError):
+        discard = True
         raise
     finally:
-        conn.close()
+        try:
+            conn.rollback()
+        except psycopg.Error:
+            discard = True
+        pool.release(conn, discard=discard)
+        # Logged once for the whole stream (every fetch round-trip plus the
+        # time spent writing rows to the client in between), not per fetch.
+        _record_query(sql, time.perf_counter() - started, rows, caller, acquire_seconds, replica is not None)
+
+
+# LISTEN needs a session-level connection: Supabase's transaction pooler
+# (port 6543) silently drops LISTEN, so point this at the direct/session
+# connection string if DATABASE_URL is the pooler. Falls back to
+# DATABASE_URL, and everything that listens also has a TTL fallback, so a
+# listener that can't connect only costs freshness, never correctness.
+DATABASE_LISTEN_URL = os.getenv("DATABASE_LISTEN_URL") or DATABASE_URL
+LISTEN_ENABLED = os.getenv("DB_LISTEN_ENABLED", "true").strip().lower() == "true"
+
+
+class _Listener:
+    """One background LISTEN connection per process, fanning Postgres
+    NOTIFYs out to in-process callbacks (cache invalidation, mostly).
+    After any reconnect every callback is called with payload None, since
+    notifications sent while disconnected are lost for good."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}  # channel -> [callback(payload)]
+        self._listening = frozenset()  # channels LISTENed on the live connection
+        self._thread = None
+        self.connected = False
+
+    def is_listening(self, channel):
+        """Whether a NOTIFY on `channel` would reach us right now -- not
+        just connected, but this channel's LISTEN already issued (one
+        subscribed after startup waits up to a second for it)."""
+        return self.connected and channel in self._listening
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+            start = self._thread is None and LISTEN_ENABLED and bool(DATABASE_LISTEN_URL)
+            if start:
+                self._thread = threading.Thread(target=self._run, name="db-listener", daemon=True)
+        if start:
+            self._thread.start()
+
+    def _dispatch(self, channel, payload):
+        with self._lock:
+            callbacks = list(self._callbacks.get(channel, []))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"db listener callback for {channel} failed: {e}")
+
+    def _run(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg.connect(
+                    DATABASE_LISTEN_URL, autocommit=True, application_name="olsc-db-listener",
+                )
+                listening = set()
+                first_pass = True
+                while True:
+                    with self._lock:
+                        pending = [ch for ch in self._callbacks if ch not in listening]
+                    for channel in pending:
+                        conn.execute(f'LISTEN "{channel}"')
+                        listening.add(channel)
+                        self._listening = frozenset(listening)
+                    if first_pass:
+                        self.connected = True
+                        backoff = 1
+                        for channel in listening:
+                            self._dispatch(channel, None)
+                        first_pass = False
+                    # Short timeout so a channel subscribed after startup
+                    # gets its LISTEN within about a second. Anything that
+                    # arrives in between is kept for the next round.
+                    for note in conn.notifies(timeout=1.0):
+                        self._dispatch(note.channel, note.payload)
+            except Exception as e:
+                print(f"db listener disconnected ({e}); retrying in {backoff}s")
+            finally:
+                self.connected = False
+                self._listening = frozenset()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+_listener = None
+_listener_pid = None
+
+
+def get_listener():
+    """This process's NOTIFY listener (re-created after a fork, like the
+    pool -- a thread started in a pre-forking server's master doesn't
+    survive it)."""
+    global _listener, _listener_pid
+    pid = os.getpid()
+    if _listener is None or _listener_pid != pid:
+        with _pool_lock:
+            if _listener is None or _listener_pid != pid:
+                _listener = _Listener()
+                _listener_pid = pid
+    return _listener
+
+
+def listen(channel, callback):
+    """Call `callback(payload)` whenever `NOTIFY channel` is committed by
+    any process (payload None means "assume anything changed")."""
+    get_listener().subscribe(channel, callback)
 
 
 def init_schema():
@@ -71,25 +1093,996 @@ def ensure_default_season(name, starts_on=None, ends_on=None):
             """,
             (name, starts_on, ends_on),
         )
-        return cur.fetchone()
+        season = cur.fetchone()
+    _after_commit(invalidate_current_context)
+    return season
 
 
-def get_current_season():
+def _find_season(cur, season):
+    """Season row by id or name (as typed on the command line)."""
+    cur.execute(
+        "SELECT id, name, is_current FROM seasons WHERE id::text = %s OR name = %s",
+        (str(season), str(season)),
+    )
+    return cur.fetchone()
+
+
+class SeasonArchiveError(RuntimeError):
+    """archive_season refused: unknown season, or it's still current."""
+
+
+def archive_season(season):
+    """Move a closed season's check-ins and wallet passes out of the hot
+    tables into checkins_archive / wallet_passes_archive (see schema.sql),
+    in one transaction. `season` is a season id or name. Passes still live
+    are revoked on the way out, and their device registrations dropped --
+    a closed season's pass has nothing left to do. Per-match check-in
+    counts are kept. Safe to re-run: a season already archived just moves
+    nothing.
+
+    Returns {"season": ..., "checkins": n, "wallet_passes": n}."""
     with cursor() as cur:
-        cur.execute("SELECT id, name FROM seasons WHERE is_current")
-        return cur.fetchone()
+        row = _find_season(cur, season)
+        if row is None:
+            raise SeasonArchiveError(f"No season {season!r}")
+        if row["is_current"]:
+            raise SeasonArchiveError(f"{row['name']} is the current season -- roll over first")
+
+        # Tells maintain_match_checkin_count to leave the counts alone for
+        # these deletes; transaction-local, so it ends with this block.
+        cur.execute("SELECT set_config('olsc.archiving', 'on', true)")
+        cur.execute(
+            """
+            WITH moved AS (
+                DELETE FROM checkins c
+                USING matches mt
+                WHERE mt.id = c.match_id AND mt.season_id = %(season_id)s
+                RETURNING c.*
+            )
+            INSERT INTO checkins_archive
+                (id, season_id, member_id, match_id, checked_in_at, scanner_admin_id, source, notes)
+            SELECT id, %(season_id)s, member_id, match_id, checked_in_at, scanner_admin_id, source, notes
+            FROM moved
+            ON CONFLICT (id) DO NOTHING
+            """,
+            {"season_id": row["id"]},
+        )
+        checkins_moved = cur.rowcount
+        cur.execute(
+            """
+            WITH moved AS (
+                DELETE FROM wallet_passes
+                WHERE season_id = %(season_id)s
+                RETURNING *
+            )
+            INSERT INTO wallet_passes_archive
+                (id, member_id, season_id, token_hash, serial_number, platform, revoked_at,
+                 created_at, auth_token, token_encrypted, google_object_id, google_class_id)
+            SELECT id, member_id, season_id, token_hash, serial_number, platform,
+                   COALESCE(revoked_at, now()), created_at, auth_token, token_encrypted,
+                   google_object_id, google_class_id
+            FROM moved
+            ON CONFLICT (id) DO NOTHING
+            """,
+            {"season_id": row["id"]},
+        )
+        passes_moved = cur.rowcount
+        cur.execute(
+            "UPDATE seasons SET archived_at = COALESCE(archived_at, now()) WHERE id = %s",
+            (row["id"],),
+        )
+    return {"season": row["name"], "checkins": checkins_moved, "wallet_passes": passes_moved}
+
+
+class SeasonRolloverError(RuntimeError):
+    """rollover_season refused: bad carry-over choice or the name is taken."""
+
+
+# carry_over choices for rollover_season, besides an explicit list of ids.
+ROLLOVER_CARRY_OVER = {
+    "all": "TRUE",
+    # Came to at least one match last season (hot or archived check-ins).
+    "attended": """EXISTS (
+        SELECT 1 FROM checkins_all c
+        JOIN matches mt ON mt.id = c.match_id
+        WHERE c.member_id = ms.member_id AND mt.season_id = ms.season_id
+    )""",
+    "none": "FALSE",
+}
+
+
+def rollover_season(name, starts_on=None, ends_on=None, carry_over="all"):
+    """Start a new season in one transaction of set-based statements
+    (instead of ensure_default_season plus re-adding and re-issuing member
+    by member): create `name` as the current season, clear the current
+    match, carry members of the previous season over, and revoke every
+    previous-season wallet pass and every door pass (volunteer links are
+    per-shift; new ones get handed out for the new season).
+
+    `carry_over` is "all", "attended" (checked in at least once last
+    season), "none", or an explicit list of member ids.
+
+    Returns {"season", "previous_season", "members_carried",
+    "wallet_passes_revoked", "door_passes_revoked", "to_issue"} --
+    `to_issue` being the carried-over members, who all need a new pass
+    (the same list /admin/issue-passes now shows)."""
+    if isinstance(carry_over, str):
+        if carry_over not in ROLLOVER_CARRY_OVER:
+            raise SeasonRolloverError(f"Unknown carry_over {carry_over!r}")
+        carry_filter, carry_params = ROLLOVER_CARRY_OVER[carry_over], {}
+    else:
+        carry_filter = "ms.member_id = ANY(%(member_ids)s)"
+        carry_params = {"member_ids": [int(m) for m in carry_over]}
+
+    with cursor() as cur:
+        cur.execute("SELECT id, name FROM seasons WHERE is_current FOR UPDATE")
+        previous = cur.fetchone()
+        cur.execute("SELECT 1 FROM seasons WHERE name = %s", (name,))
+        if cur.fetchone():
+            raise SeasonRolloverError(f"A season named {name!r} already exists")
+
+        # Old current flags off first, then the new season on: the
+        # one_current_season unique index is checked row by row.
+        cur.execute("UPDATE matches SET is_current = FALSE WHERE is_current")
+        cur.execute("UPDATE seasons SET is_current = FALSE WHERE is_current")
+        cur.execute(
+            """
+            INSERT INTO seasons (name, starts_on, ends_on, is_current)
+            VALUES (%s, %s, %s, TRUE)
+            RETURNING id, name
+            """,
+            (name, starts_on, ends_on),
+        )
+        season = cur.fetchone()
+
+        carried = wallet_revoked = 0
+        if previous:
+            cur.execute(
+                f"""
+                INSERT INTO member_seasons (member_id, season_id)
+                SELECT ms.member_id, %(new_season_id)s
+                FROM member_seasons ms
+                WHERE ms.season_id = %(previous_season_id)s AND {carry_filter}
+                ON CONFLICT (member_id, season_id) DO NOTHING
+                """,
+                {"new_season_id": season["id"], "previous_season_id": previous["id"], **carry_params},
+            )
+            carried = cur.rowcount
+            cur.execute(
+                "UPDATE wallet_passes SET revoked_at = now() WHERE season_id = %s AND revoked_at IS NULL",
+                (previous["id"],),
+            )
+            wallet_revoked = cur.rowcount
+        cur.execute("UPDATE door_passes SET revoked_at = now() WHERE revoked_at IS NULL")
+        door_revoked = cur.rowcount
+
+        cur.execute(
+            """
+            SELECT m.id AS member_id, m.first_name, m.last_name, m.email
+            FROM member_seasons ms
+            JOIN members m ON m.id = ms.member_id
+            WHERE ms.season_id = %s
+            ORDER BY m.last_name, m.first_name
+            """,
+            (season["id"],),
+        )
+        to_issue = cur.fetchall()
+    _after_commit(invalidate_current_context)
+    _after_commit(_door_pass_cache.invalidate)
+    return {
+        "season": season,
+        "previous_season": previous,
+        "members_carried": carried,
+        "wallet_passes_revoked": wallet_revoked,
+        "door_passes_revoked": door_revoked,
+        "to_issue": to_issue,
+    }
+
+
+# How long the cached current season/match may be served without a
+# NOTIFY confirming it's still right: short while the listener is down
+# (or disabled), long while it's connected and would have told us.
+CURRENT_CONTEXT_TTL_SECONDS = _env_int("CURRENT_CONTEXT_TTL_SECONDS", 15)
+CURRENT_CONTEXT_LISTENING_TTL_SECONDS = _env_int("CURRENT_CONTEXT_LISTENING_TTL_SECONDS", 300)
+CURRENT_CONTEXT_CHANNEL = "olsc_current_context"
+
+
+class _CurrentContext:
+    """In-process cache of the current season and current match, which
+    almost every request reads and which only change when an admin sets a
+    new current match or rolls a season. Invalidated by the
+    notify_current_context trigger (schema.sql) via the shared listener."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loaded = None  # (generation, loaded_at, season, match)
+        self._subscribed = False
+
+    def invalidate(self, _payload=None):
+        with self._lock:
+            self._generation += 1
+            self._loaded = None
+
+    def get(self):
+        if not self._subscribed:
+            self._subscribed = True
+            listen(CURRENT_CONTEXT_CHANNEL, self.invalidate)
+        listening = get_listener().is_listening(CURRENT_CONTEXT_CHANNEL)
+        ttl = CURRENT_CONTEXT_LISTENING_TTL_SECONDS if listening else CURRENT_CONTEXT_TTL_SECONDS
+        with self._lock:
+            loaded, generation = self._loaded, self._generation
+        if loaded and loaded[0] == generation and time.monotonic() - loaded[1] < ttl:
+            return loaded[2], loaded[3]
+
+        with cursor() as cur:
+            cur.execute("SELECT id, name FROM seasons WHERE is_current")
+            season = cur.fetchone()
+            cur.execute("SELECT * FROM matches WHERE is_current")
+            match = cur.fetchone()
+        season = dict(season) if season else None
+        match = dict(match) if match else None
+        with self._lock:
+            # An invalidation that landed mid-load means what we just read
+            # may already be stale -- serve it this once, don't cache it.
+            if self._generation == generation:
+                self._loaded = (generation, time.monotonic(), season, match)
+        return season, match
+
+
+_current_context = _CurrentContext()
+
+
+def invalidate_current_context():
+    """Drop this process's cached season/match (and the door index built
+    on them) right away -- call it once the change has committed (see
+    _after_commit). Other workers hear about it from the trigger's NOTIFY."""
+    _current_context.invalidate()
+    _door_index.invalidate()
+
+
+def get_current_season():
+    season, _match = _current_context.get()
+    return dict(season) if season else None
 
 
 def get_current_match():
+    _season, match = _current_context.get()
+    return dict(match) if match else None
+
+
+def count_checkins_for_match(match_id):
+    """From the trigger-maintained match_checkin_counts (schema.sql), so
+    the headcount polls are a primary-key read, not a COUNT(*)."""
     with cursor() as cur:
-        cur.execute("SELECT * FROM matches WHERE is_current")
+        cur.execute("SELECT checkin_count FROM match_checkin_counts WHERE match_id = %s", (match_id,))
+        row = cur.fetchone()
+        return row['checkin_count'] if row else 0
+
+
+HEADCOUNT_CHANNEL = "olsc_headcount"
+# Events a slow /api/checkins/stream client may fall behind by before it
+# starts missing some (harmlessly -- every event carries the full count).
+HEADCOUNT_CLIENT_QUEUE = _env_int("HEADCOUNT_CLIENT_QUEUE", 100)
+# Open /api/checkins/stream clients per process -- door phones and admin
+# screens only, the public page polls. Each one holds a server thread for
+# as long as it's connected, so this stays well under the threads the
+# server has to go round (`python3 app.py` and
+# `python3 scanner_app.py` start a thread per request; gunicorn has only
+# its --threads per worker). Past it, new clients get a 503 and the pages
+# keep polling, which they do anyway until a stream connects.
+HEADCOUNT_STREAM_MAX_CLIENTS = _env_int("HEADCOUNT_STREAM_MAX_CLIENTS", 24)
+
+
+def headcount_snapshot():
+    """{"match_id", "count", "capacity", "last": None} for the current
+    match -- the first event on a new headcount stream."""
+    match = get_current_match()
+    if not match:
+        return {"match_id": None, "count": 0, "capacity": None, "last": None}
+    return {
+        "match_id": match["id"],
+        "count": count_checkins_for_match(match["id"]),
+        "capacity": match.get("capacity"),
+        "last": None,
+    }
+
+
+class _HeadcountFeed:
+    """The live headcount, fanned out from this worker's one LISTEN (see
+    _Listener) to a queue per connected /api/checkins/stream client. A
+    check-in committing on any worker reaches every queue straight from
+    the notify_headcount trigger's payload (schema.sql) -- no query per
+    client, and none at all except to resync after the listener
+    reconnects or the current match changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = set()
+        self._subscribed = False
+
+    def subscribe(self):
+        feed = queue.Queue(maxsize=HEADCOUNT_CLIENT_QUEUE)
+        with self._lock:
+            if len(self._queues) >= HEADCOUNT_STREAM_MAX_CLIENTS:
+                return None
+            self._queues.add(feed)
+            first = not self._subscribed
+            self._subscribed = True
+        if first:
+            listen(HEADCOUNT_CHANNEL, self._on_checkin)
+            listen(CURRENT_CONTEXT_CHANNEL, self._on_context_change)
+        return feed
+
+    def unsubscribe(self, feed):
+        with self._lock:
+            self._queues.discard(feed)
+
+    def _publish(self, event):
+        with self._lock:
+            queues = list(self._queues)
+        for feed in queues:
+            try:
+                feed.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def _publish_snapshot(self):
+        with self._lock:
+            if not self._queues:
+                return
+        self._publish(headcount_snapshot())
+
+    def _on_checkin(self, payload):
+        if payload is None:
+            # (Re)connected: whatever happened while we weren't listening
+            # is lost, so start everyone over from the real count.
+            self._publish_snapshot()
+            return
+        note = json.loads(payload)
+        match = get_current_match()
+        if not match or note["match_id"] != match["id"]:
+            return
+        last = None
+        if note["event"] == "insert":
+            last = {
+                "member_id": note["member_id"],
+                "name": note["name"],
+                "source": note["source"],
+                "checked_in_at": note["checked_in_at"],
+            }
+        self._publish({
+            "match_id": match["id"],
+            "count": note["count"] or 0,
+            "capacity": match.get("capacity"),
+            "last": last,
+        })
+
+    def _on_context_change(self, _payload):
+        # New current match (or capacity): the count to show changed too.
+        # Drop the cached context first -- its own callback on this
+        # channel may not have run yet.
+        _current_context.invalidate()
+        self._publish_snapshot()
+
+
+_headcount_feed = _HeadcountFeed()
+
+
+def subscribe_headcount():
+    """A queue that receives a headcount event dict (see headcount_snapshot
+    for the shape; "last" names who just checked in) for every check-in on
+    the current match, from any worker. unsubscribe_headcount() it when
+    the client goes away. None when this process already has
+    HEADCOUNT_STREAM_MAX_CLIENTS open."""
+    return _headcount_feed.subscribe()
+
+
+def unsubscribe_headcount(feed):
+    _headcount_feed.unsubscribe(feed)
+
+
+def set_match_capacity(match_id, capacity):
+    """capacity: a positive int, or None to remove the limit."""
+    with cursor() as cur:
+        cur.execute("UPDATE matches SET capacity = %s WHERE id = %s", (capacity, match_id))
+
+
+# One statement for the whole door decision: current season + current
+# match, the member behind the scan, the idempotent INSERT, and the
+# existing check-in if there already was one. `{member_sql}` is the only
+# part that differs between a QR scan and a manual roster check-in; it must
+# select member_id, first_name, last_name, email for the current season.
+# `result` is one of no_current_season, no_current_match, member_not_found,
+# checked_in, already_checked_in, at_capacity -- the caller maps those to
+# its responses. at_capacity only comes from the read-only re-run _checkin
+# does after the capacity trigger refused the INSERT.
+# How far before kickoff a queued scan's own timestamp is still believed.
+# Doors open a few hours early at most; anything older (a device clock
+# set wrong, or a client making one up) is recorded as this far before
+# kickoff instead.
+CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES = _env_int("CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES", 240)
+
+# checked_in_at for a scan the door saw at {scanned_at}: that time, held to
+# the match window -- never after now (a device clock running ahead), never
+# before CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES ahead of kickoff.
+_CLAMPED_SCANNED_AT_SQL = """LEAST(
+    GREATEST(COALESCE({scanned_at}, now()),
+             match.kickoff_at - %(earliest_before_kickoff)s * interval '1 minute'),
+    now())"""
+
+_CHECKIN_SQL = """
+WITH season AS (
+    SELECT id, name FROM seasons WHERE is_current
+), match AS (
+    SELECT id, opponent, is_home, competition, kickoff_at, capacity FROM matches WHERE is_current
+), member AS (
+    {member_sql}
+), inserted AS (
+    INSERT INTO checkins (member_id, match_id, scanner_admin_id, source, checked_in_at)
+    SELECT member.member_id, match.id, %(scanner_admin_id)s, %(source)s, {checked_in_at}
+    FROM member, match
+    WHERE %(allow_insert)s
+    ON CONFLICT (member_id, match_id) DO NOTHING
+    RETURNING checked_in_at
+), existing AS (
+    SELECT c.checked_in_at
+    FROM checkins c, member, match
+    WHERE c.member_id = member.member_id AND c.match_id = match.id
+)
+SELECT
+    CASE
+        WHEN s.id IS NULL THEN 'no_current_season'
+        WHEN mt.id IS NULL THEN 'no_current_match'
+        WHEN mb.member_id IS NULL THEN 'member_not_found'
+        WHEN i.checked_in_at IS NOT NULL THEN 'checked_in'
+        WHEN e.checked_in_at IS NOT NULL OR %(allow_insert)s THEN 'already_checked_in'
+        ELSE 'at_capacity'
+    END AS result,
+    s.id AS season_id, s.name AS season_name,
+    mt.id AS match_id, mt.opponent AS match_opponent, mt.is_home AS match_is_home,
+    mt.competition AS match_competition, mt.kickoff_at AS match_kickoff_at,
+    mt.capacity AS match_capacity,
+    mb.member_id, mb.first_name, mb.last_name, mb.email,
+    COALESCE(i.checked_in_at, e.checked_in_at) AS checked_in_at
+FROM (SELECT 1) AS one
+LEFT JOIN season s ON TRUE
+LEFT JOIN match mt ON TRUE
+LEFT JOIN member mb ON TRUE
+LEFT JOIN inserted i ON TRUE
+LEFT JOIN existing e ON TRUE
+"""
+
+
+# SQLSTATE the maintain_match_checkin_count trigger raises when a
+# check-in would take a match past its capacity.
+CHECKIN_CAPACITY_SQLSTATE = "OL001"
+
+
+def _checkin(member_sql, params, scanned_at=None):
+    sql = _CHECKIN_SQL.format(
+        member_sql=member_sql,
+        checked_in_at=_CLAMPED_SCANNED_AT_SQL.format(scanned_at="%(scanned_at)s::timestamptz"),
+    )
+    params = dict(
+        params, scanned_at=scanned_at, earliest_before_kickoff=CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES,
+    )
+    try:
+        with cursor() as cur:
+            cur.execute(sql, dict(params, allow_insert=True))
+            return cur.fetchone()
+    except psycopg.Error as e:
+        if e.sqlstate != CHECKIN_CAPACITY_SQLSTATE:
+            raise
+    # Full: same statement again with the INSERT switched off, so the
+    # caller still gets the member and match to show the door (and a
+    # duplicate scan still reads as already_checked_in, not at_capacity).
+    with cursor() as cur:
+        cur.execute(sql, dict(params, allow_insert=False))
         return cur.fetchone()
 
 
-def count_checkins_for_match(match_id):
+DOOR_INDEX_ENABLED = os.getenv("DOOR_INDEX_ENABLED", "true").strip().lower() == "true"
+# Same two-speed TTL as the current-context cache: how long the door index
+# may go without a NOTIFY-driven reload.
+DOOR_INDEX_TTL_SECONDS = _env_int("DOOR_INDEX_TTL_SECONDS", 15)
+DOOR_INDEX_LISTENING_TTL_SECONDS = _env_int("DOOR_INDEX_LISTENING_TTL_SECONDS", 300)
+DOOR_INDEX_CHANNEL = "olsc_door_index"
+
+
+def _load_door_index(season_id, match_id):
+    """Every live pass of the season, with its member and whether they're
+    already in for `match_id` -- the whole door, in one read."""
     with cursor() as cur:
-        cur.execute("SELECT COUNT(*) AS n FROM checkins WHERE match_id = %s", (match_id,))
-        return cur.fetchone()['n']
+        cur.execute(
+            """
+            SELECT wp.token_hash, m.id AS member_id, m.first_name, m.last_name, m.email,
+                   c.checked_in_at
+            FROM wallet_passes wp
+            JOIN members m ON m.id = wp.member_id
+            LEFT JOIN checkins c ON c.member_id = wp.member_id AND c.match_id = %(match_id)s
+            WHERE wp.season_id = %(season_id)s AND wp.revoked_at IS NULL
+            """,
+            {"season_id": season_id, "match_id": match_id},
+        )
+        return cur.fetchall()
+
+
+class _DoorIndex:
+    """In-process index of the current match's door: every live
+    current-season wallet token hash -> member, and which of those members
+    are already in. checkin_by_token answers an unknown/revoked token or a
+    repeat scan from it with no database round-trip at all; only a
+    genuinely new check-in still goes to Postgres, through the same single
+    statement as before -- which re-checks the pass, so a stale index can
+    never let a revoked pass in, only send a scan the slow way.
+
+    Built from one query (warmed by warm_door_index when an admin sets the
+    current match, otherwise on the first scan), and kept fresh by the
+    olsc_door_index NOTIFYs (schema.sql): a check-in on any worker marks
+    that member in here, and a few passes issued or revoked are patched in
+    place; a bulk pass change, a member rename or a change to the current
+    season/match drops the index for a rebuild on next use. Only one
+    thread rebuilds -- scans arriving meanwhile take the database path
+    rather than all re-running the season-wide load at once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loaded = None  # dict, see _build
+        self._building = False
+        self._subscribed = False
+
+    def invalidate(self, _payload=None):
+        with self._lock:
+            self._generation += 1
+            self._loaded = None
+
+    def _on_notify(self, payload):
+        if payload and payload.startswith("checkin:"):
+            _kind, match_id, member_id, epoch = payload.split(":")
+            self.mark_checked_in(
+                int(match_id), int(member_id), datetime.fromtimestamp(float(epoch), timezone.utc),
+            )
+        elif payload and payload.startswith("{"):
+            change = json.loads(payload)
+            self.apply_pass_changes(change["drop"], change["add"])
+        else:
+            self.invalidate()
+
+    def apply_pass_changes(self, dropped, added):
+        """Patch in passes issued/rotated/revoked (notify_door_index_passes):
+        `dropped` token hashes out, `added` [token_hash, member_id,
+        season_id, first_name, last_name, email] rows in -- for the
+        indexed season only."""
+        with self._lock:
+            if self._building:
+                # The load in flight may have read from before this change:
+                # let it be used once, not kept.
+                self._generation += 1
+            loaded = self._loaded
+            if not loaded or not loaded["season"]:
+                return
+            for token_hash in dropped:
+                loaded["tokens"].pop(token_hash, None)
+            for token_hash, member_id, season_id, first_name, last_name, email in added:
+                if season_id == loaded["season"]["id"]:
+                    loaded["tokens"][token_hash] = member_id
+                    loaded["members"][member_id] = (first_name, last_name, email)
+
+    def mark_checked_in(self, match_id, member_id, checked_in_at):
+        with self._lock:
+            loaded = self._loaded
+            if loaded and loaded["match"] and loaded["match"]["id"] == match_id:
+                loaded["checked_in"].setdefault(member_id, checked_in_at)
+
+    def get(self):
+        if not self._subscribed:
+            self._subscribed = True
+            listen(DOOR_INDEX_CHANNEL, self._on_notify)
+            listen(CURRENT_CONTEXT_CHANNEL, self.invalidate)
+        # Both channels, since either one can make the index stale.
+        listener = get_listener()
+        listening = listener.is_listening(DOOR_INDEX_CHANNEL) and listener.is_listening(CURRENT_CONTEXT_CHANNEL)
+        ttl = DOOR_INDEX_LISTENING_TTL_SECONDS if listening else DOOR_INDEX_TTL_SECONDS
+        with self._lock:
+            loaded, generation = self._loaded, self._generation
+            if loaded and time.monotonic() - loaded["loaded_at"] < ttl:
+                return loaded
+            if self._building:
+                return None  # another thread is on it; see answer()
+            self._building = True
+
+        try:
+            loaded = self._build()
+        finally:
+            with self._lock:
+                self._building = False
+        with self._lock:
+            # Same rule as _CurrentContext: an invalidation mid-build means
+            # this may already be stale -- use it once, don't keep it.
+            if self._generation == generation:
+                self._loaded = loaded
+        return loaded
+
+    def _build(self):
+        season, match = _current_context.get()
+        tokens, members, checked_in = {}, {}, {}
+        if season and match:
+            for row in _load_door_index(season["id"], match["id"]):
+                member_id = row["member_id"]
+                tokens[row["token_hash"]] = member_id
+                members[member_id] = (row["first_name"], row["last_name"], row["email"])
+                if row["checked_in_at"] is not None:
+                    checked_in[member_id] = row["checked_in_at"]
+        return {
+            "loaded_at": time.monotonic(),
+            "season": season,
+            "match": match,
+            "tokens": tokens,
+            "members": members,
+            "checked_in": checked_in,
+        }
+
+    def answer(self, token_hash):
+        """The checkin_by_token row for this scan if the index can decide
+        it without a write (no season/match, unknown token, already in),
+        else None -- a new check-in, or no index to be had."""
+        try:
+            loaded = self.get()
+        except psycopg.Error as e:
+            print(f"door index unavailable, scanning via the database: {e}")
+            return None
+        if loaded is None:
+            return None  # being rebuilt by another scan right now
+        season, match = loaded["season"], loaded["match"]
+        if not season:
+            return _door_row("no_current_season")
+        if not match:
+            return _door_row("no_current_match", season)
+        member_id = loaded["tokens"].get(token_hash)
+        if member_id is None:
+            return _door_row("member_not_found", season, match)
+        checked_in_at = loaded["checked_in"].get(member_id)
+        if checked_in_at is None:
+            return None
+        return _door_row(
+            "already_checked_in", season, match, member_id, loaded["members"][member_id], checked_in_at,
+        )
+
+    def stats(self):
+        with self._lock:
+            loaded = self._loaded
+        if not loaded:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "age_seconds": round(time.monotonic() - loaded["loaded_at"], 1),
+            "match_id": loaded["match"]["id"] if loaded["match"] else None,
+            "passes": len(loaded["tokens"]),
+            "checked_in": len(loaded["checked_in"]),
+        }
+
+
+def _door_row(result, season=None, match=None, member_id=None, member=None, checked_in_at=None):
+    """A row shaped exactly like _CHECKIN_SQL's, for answers the door
+    index gives without running it."""
+    match = match or {}
+    first_name, last_name, email = member or (None, None, None)
+    return {
+        "result": result,
+        "season_id": season["id"] if season else None,
+        "season_name": season["name"] if season else None,
+        "match_id": match.get("id"),
+        "match_opponent": match.get("opponent"),
+        "match_is_home": match.get("is_home"),
+        "match_competition": match.get("competition"),
+        "match_kickoff_at": match.get("kickoff_at"),
+        "match_capacity": match.get("capacity"),
+        "member_id": member_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": email,
+        "checked_in_at": checked_in_at,
+    }
+
+
+_door_index = _DoorIndex()
+
+
+def warm_door_index():
+    """Rebuild this process's door index now (e.g. right after a new
+    current match is set), so the first scan doesn't pay for it. Other
+    workers rebuild on their next scan, after the NOTIFY."""
+    _door_index.invalidate()
+    if DOOR_INDEX_ENABLED:
+        _door_index.get()
+
+
+def door_index_stats():
+    return _door_index.stats()
+
+
+def _note_checked_in(row):
+    if row["result"] in ("checked_in", "already_checked_in"):
+        _door_index.mark_checked_in(row["match_id"], row["member_id"], row["checked_in_at"])
+    return row
+
+
+def checkin_by_token(raw_token, scanner_admin_id, scanned_at=None):
+    """Check in whoever holds this wallet token, against the current
+    season and match, in a single round-trip. A token that's unknown,
+    revoked, or from another season comes back as 'member_not_found' --
+    same "don't distinguish" rule as find_active_wallet_pass_by_token.
+    scanned_at: when the door saw the scan, if not just now (clamped to
+    the match window, see _CLAMPED_SCANNED_AT_SQL).
+
+    Invalid tokens and repeat scans are answered from the in-process door
+    index (_DoorIndex) without touching the database at all."""
+    token_hash = hashlib.sha256((raw_token or "").encode()).hexdigest()
+    if DOOR_INDEX_ENABLED:
+        answered = _door_index.answer(token_hash)
+        if answered is not None:
+            return answered
+    return _note_checked_in(_checkin(
+        """
+        SELECT wp.member_id, m.first_name, m.last_name, m.email
+        FROM wallet_passes wp
+        JOIN members m ON m.id = wp.member_id
+        JOIN season ON season.id = wp.season_id
+        WHERE wp.token_hash = %(token_hash)s AND wp.revoked_at IS NULL
+        """,
+        {"token_hash": token_hash, "scanner_admin_id": scanner_admin_id, "source": "scanner"},
+        scanned_at,
+    ))
+
+
+def checkin_member(member_id, scanner_admin_id, scanned_at=None):
+    """Manual (roster-search) check-in for a member of the current season,
+    in a single round-trip. 'member_not_found' means they aren't in the
+    current season. scanned_at as for checkin_by_token."""
+    return _note_checked_in(_checkin(
+        """
+        SELECT m.id AS member_id, m.first_name, m.last_name, m.email
+        FROM members m
+        JOIN member_seasons ms ON ms.member_id = m.id
+        JOIN season ON season.id = ms.season_id
+        WHERE m.id = %(member_id)s
+        """,
+        {"member_id": member_id, "scanner_admin_id": scanner_admin_id, "source": "manual"},
+        scanned_at,
+    ))
+
+
+# Most check-ins /api/checkins/batch takes in one request.
+CHECKIN_BATCH_MAX = _env_int("CHECKIN_BATCH_MAX", 500)
+
+# checkin_batch's single statement: resolve every queued scan to a member
+# of the current season (by pass token or, for manual ones, member id),
+# INSERT each member's earliest scan, and report every item in input
+# order. A member queued twice gets checked_in for the first and
+# already_checked_in for the rest -- same as scanning them twice.
+_CHECKIN_BATCH_SQL = """
+WITH season AS (
+    SELECT id FROM seasons WHERE is_current
+), match AS (
+    SELECT id, kickoff_at FROM matches WHERE is_current
+), item AS (
+    SELECT *
+    FROM unnest(%(token_hashes)s::text[], %(member_ids)s::int[], %(scanned_at)s::timestamptz[])
+         WITH ORDINALITY AS i (token_hash, member_id, scanned_at, ord)
+), resolved AS (
+    SELECT item.ord,
+           COALESCE(wp.member_id, ms.member_id) AS member_id,
+           CASE WHEN item.token_hash IS NOT NULL THEN 'scanner' ELSE 'manual' END AS source,
+           -- When the door saw them, not when the queue got through --
+           -- but only within the match window.
+           {checked_in_at} AS scanned_at
+    FROM item
+    LEFT JOIN season ON TRUE
+    LEFT JOIN match ON TRUE
+    LEFT JOIN wallet_passes wp
+           ON wp.token_hash = item.token_hash AND wp.season_id = season.id AND wp.revoked_at IS NULL
+    LEFT JOIN member_seasons ms
+           ON item.token_hash IS NULL AND ms.member_id = item.member_id AND ms.season_id = season.id
+), first_scan AS (
+    SELECT DISTINCT ON (member_id) ord, member_id, source, scanned_at
+    FROM resolved
+    WHERE member_id IS NOT NULL
+    ORDER BY member_id, scanned_at, ord
+), inserted AS (
+    INSERT INTO checkins (member_id, match_id, scanner_admin_id, source, checked_in_at)
+    SELECT f.member_id, match.id, %(scanner_admin_id)s, f.source, f.scanned_at
+    FROM first_scan f, match
+    ORDER BY f.member_id
+    ON CONFLICT (member_id, match_id) DO NOTHING
+    RETURNING member_id, checked_in_at
+)
+SELECT r.ord,
+       CASE
+           WHEN (SELECT id FROM season) IS NULL THEN 'no_current_season'
+           WHEN (SELECT id FROM match) IS NULL THEN 'no_current_match'
+           WHEN r.member_id IS NULL THEN 'member_not_found'
+           WHEN i.member_id IS NOT NULL AND f.ord = r.ord THEN 'checked_in'
+           ELSE 'already_checked_in'
+       END AS result,
+       (SELECT id FROM match) AS match_id,
+       r.member_id, m.first_name, m.last_name, m.email,
+       COALESCE(i.checked_in_at, c.checked_in_at) AS checked_in_at
+FROM resolved r
+LEFT JOIN first_scan f ON f.member_id = r.member_id
+LEFT JOIN inserted i ON i.member_id = r.member_id
+LEFT JOIN checkins c ON c.member_id = r.member_id AND c.match_id = (SELECT id FROM match)
+LEFT JOIN members m ON m.id = r.member_id
+ORDER BY r.ord
+""".format(checked_in_at=_CLAMPED_SCANNED_AT_SQL.format(scanned_at="item.scanned_at"))
+
+
+def checkin_batch(items, scanner_admin_id):
+    """Check in a queue of scans (an offline scanner catching up) in one
+    statement and one round-trip. items: list of (raw_token, member_id,
+    scanned_at) -- raw_token for a pass scan, else member_id for a manual
+    one; scanned_at (aware datetime or None) becomes checked_in_at.
+    Idempotent: re-sending items that already went through just comes
+    back already_checked_in, so a client can retry a batch whose response
+    it never saw.
+
+    Returns one row per item, in order, with the same result values and
+    member/checked_in_at keys as checkin_by_token. If the batch would take
+    the match past its capacity the statement can't say which scans made
+    it in, so it falls back to checking the items in one at a time (with
+    the same clamped scanned_at, and at_capacity where they didn't fit).
+
+    A scanned_at is held to the match window: never later than now, and
+    never earlier than CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES before
+    kickoff."""
+    if not items:
+        return []
+    params = {
+        "token_hashes": [
+            hashlib.sha256(token.encode()).hexdigest() if token else None for token, _m, _at in items
+        ],
+        "member_ids": [None if token else member_id for token, member_id, _at in items],
+        "scanned_at": [scanned_at for _t, _m, scanned_at in items],
+        "scanner_admin_id": scanner_admin_id,
+        "earliest_before_kickoff": CHECKIN_EARLIEST_BEFORE_KICKOFF_MINUTES,
+    }
+    try:
+        with cursor() as cur:
+            cur.execute(_CHECKIN_BATCH_SQL, params)
+            rows = cur.fetchall()
+    except psycopg.Error as e:
+        if e.sqlstate != CHECKIN_CAPACITY_SQLSTATE:
+            raise
+        return [
+            checkin_by_token(token, scanner_admin_id, scanned_at) if token
+            else checkin_member(member_id, scanner_admin_id, scanned_at)
+            for token, member_id, scanned_at in items
+        ]
+    for row in rows:
+        _note_checked_in(row)
+    return rows
+
+
+def get_door_snapshot():
+    """What an offline scanner needs to keep deciding at the door on its
+    own: the current match, every live pass's token *hash* -> member id,
+    and who's already in. Hashes only -- a hash can't be turned back into
+    a token, or checked in with (the scan endpoints hash what they're
+    given), so a lost door phone leaks nothing that gets anyone in."""
+    season, match = _current_context.get()
+    if not season or not match:
+        return {"season_id": season["id"] if season else None, "match_id": None, "tokens": [], "checked_in": []}
+    with cursor() as cur:
+        cur.execute(
+            """
+            SELECT token_hash, member_id FROM wallet_passes
+            WHERE season_id = %s AND revoked_at IS NULL
+            """,
+            (season["id"],),
+        )
+        tokens = [[r["token_hash"], r["member_id"]] for r in cur.fetchall()]
+        cur.execute("SELECT member_id FROM checkins WHERE match_id = %s", (match["id"],))
+        checked_in = [r["member_id"] for r in cur.fetchall()]
+    return {"season_id": season["id"], "match_id": match["id"], "tokens": tokens, "checked_in": checked_in}
+
+
+def _parse_roster_version(version):
+    """A roster version string back to (season_id, n); None if it isn't one."""
+    try:
+        season_id, n = (int(part) for part in str(version).split("."))
+    except (TypeError, ValueError):
+        return None
+    return season_id, n
+
+
+def _roster_version(cur, season_id):
+    cur.execute(
+        "SELECT COALESCE(max(version), 0) AS n FROM roster_changes WHERE season_id = %s",
+        (season_id,),
+    )
+    return f"{season_id}.{cur.fetchone()['n']}"
+
+
+def get_roster_version(season_id):
+    """The season roster's current version string -- what a synced door
+    phone holds, and the roster endpoint's ETag. Cheap: one index probe
+    on roster_changes."""
+    with cursor(read_only=True) as cur:
+        return _roster_version(cur, season_id)
+
+
+def get_season_roster_names(season_id):
+    """id, first_name, last_name of every member of the season, by name --
+    the scanner's search fallback (/api/members/roster.json). Names only,
+    no contact details, on purpose."""
+    with cursor(read_only=True) as cur:
+        cur.execute(
+            """
+            SELECT m.id, m.first_name, m.last_name
+            FROM members m
+            JOIN member_seasons ms ON ms.member_id = m.id
+            WHERE ms.season_id = %s
+            ORDER BY m.last_name, m.first_name
+            """,
+            (season_id,),
+        )
+        return cur.fetchall()
+
+
+def get_roster_sync(season_id, since=None):
+    """The season's roster (member id + display name) as of now, either in
+    full or -- when `since` is a version this season handed out earlier --
+    as just the members whose entry changed after it: joined or renamed
+    members in `ids`/`names`, members who left in `removed`. Columnar
+    (parallel lists) rather than a list of objects, so a few thousand
+    names stay a small download on a door phone.
+
+    The version is read before the roster, so a change committing in
+    between lands in this answer *and* the next delta. Applying a change
+    twice is harmless -- a delta always carries the member's current state
+    -- whereas missing one wouldn't be."""
+    parsed = _parse_roster_version(since) if since is not None else None
+    with cursor(read_only=True) as cur:
+        version = _roster_version(cur, season_id)
+        # Anything we can't diff from -- no version, another season's, or
+        # one from ahead of us (a restored database) -- gets the lot.
+        full = parsed is None or parsed[0] != season_id or parsed[1] > _parse_roster_version(version)[1]
+        if full:
+            cur.execute(
+                """
+                SELECT m.id, trim(m.first_name || ' ' || m.last_name) AS name
+                FROM member_seasons ms
+                JOIN members m ON m.id = ms.member_id
+                WHERE ms.season_id = %s
+                ORDER BY m.last_name, m.first_name
+                """,
+                (season_id,),
+            )
+        else:
+            cur.execute(
+                """
+                SELECT c.member_id AS id, trim(m.first_name || ' ' || m.last_name) AS name
+                FROM (
+                    SELECT DISTINCT member_id FROM roster_changes
+                    WHERE season_id = %(season_id)s AND version > %(since)s
+                ) c
+                LEFT JOIN member_seasons ms
+                       ON ms.member_id = c.member_id AND ms.season_id = %(season_id)s
+                LEFT JOIN members m ON m.id = ms.member_id
+                ORDER BY c.member_id
+                """,
+                {"season_id": season_id, "since": parsed[1]},
+            )
+        rows = cur.fetchall()
+    present = [r for r in rows if r["name"] is not None]
+    return {
+        "version": version,
+        "full": full,
+        "ids": [r["id"] for r in present],
+        "names": [r["name"] for r in present],
+        "removed": [r["id"] for r in rows if r["name"] is None],
+    }
 
 
 def get_matches_missing_result():
@@ -102,45 +2095,382 @@ def get_matches_missing_result():
         return cur.fetchall()
 
 
+_SET_MATCH_RESULT_SQL = "UPDATE matches SET result = %s, final_score = %s WHERE id = %s"
+
+
 def set_match_result(match_id, result, final_score):
     with cursor() as cur:
-        cur.execute(
-            "UPDATE matches SET result = %s, final_score = %s WHERE id = %s",
-            (result, final_score, match_id),
+        cur.execute(_SET_MATCH_RESULT_SQL, (result, final_score, match_id))
+
+
+def set_match_results(results):
+    """Bulk set_match_result, pipelined: every UPDATE goes out in one
+    round-trip. results: iterable of (match_id, result, final_score)."""
+    results = list(results)
+    if not results:
+        return
+    with cursor() as cur:
+        cur.executemany(
+            _SET_MATCH_RESULT_SQL,
+            [(result, final_score, match_id) for match_id, result, final_score in results],
         )
 
 
 def get_leaderboard(season_id):
     """Points per member for a season: 3 for a win, 1 for a draw, 0 for a
-    loss or a not-yet-known result, summed across every match they checked
-    into. Members with zero check-ins still appear, ranked last."""
-    with cursor() as cur:
+    loss or a not-yet-known result, summed across every match of *this
+    season* they checked into. Members with zero check-ins still appear,
+    ranked last.
+
+    Reads member_season_stats, which triggers keep current (schema.sql).
+    The ranked part walks that table's leaderboard index in order (points,
+    then matches, with only name ties left to sort); members without a
+    stats row have nothing to rank and follow in name order, from a second
+    query. current_streak is only reported while the member's streak
+    reaches the season's latest scanned match -- miss the next one the
+    scanner ran at and it's broken, even though their stored row hasn't
+    been touched since."""
+    with cursor(read_only=True) as cur:
         cur.execute(
             """
+            WITH latest_scanned AS (
+                SELECT mt.id
+                FROM matches mt
+                JOIN match_checkin_counts mcc ON mcc.match_id = mt.id AND mcc.checkin_count > 0
+                WHERE mt.season_id = %(season_id)s
+                ORDER BY mt.kickoff_at DESC, mt.id DESC
+                LIMIT 1
+            )
             SELECT
                 m.id AS member_id,
                 m.first_name,
                 m.last_name,
-                COALESCE(SUM(
-                    CASE mt.result
-                        WHEN 'win' THEN 3
-                        WHEN 'draw' THEN 1
-                        ELSE 0
-                    END
-                ), 0) AS points,
-                COUNT(c.id) AS matches_checked_in
-            FROM members m
-            JOIN member_seasons ms ON ms.member_id = m.id AND ms.season_id = %s
-            LEFT JOIN checkins c ON c.member_id = m.id
-            LEFT JOIN matches mt ON mt.id = c.match_id AND mt.season_id = %s
-            GROUP BY m.id, m.first_name, m.last_name
-            ORDER BY points DESC, matches_checked_in DESC, m.last_name, m.first_name
+                s.points,
+                s.matches_attended AS matches_checked_in,
+                s.last_checkin_at,
+                CASE WHEN s.last_match_id = (SELECT id FROM latest_scanned)
+                     THEN s.current_streak ELSE 0 END AS current_streak,
+                s.longest_streak
+            FROM member_season_stats s
+            JOIN members m ON m.id = s.member_id
+            WHERE s.season_id = %(season_id)s
+              AND EXISTS (
+                  SELECT 1 FROM member_seasons ms
+                  WHERE ms.member_id = s.member_id AND ms.season_id = s.season_id
+              )
+            ORDER BY s.points DESC, s.matches_attended DESC, m.last_name, m.first_name
             """,
-            (season_id, season_id),
+            {"season_id": season_id},
         )
+        ranked = cur.fetchall()
+        cur.execute(
+            """
+            SELECT
+                m.id AS member_id,
+                m.first_name,
+                m.last_name,
+                0 AS points,
+                0 AS matches_checked_in,
+                NULL::timestamptz AS last_checkin_at,
+                0 AS current_streak,
+                0 AS longest_streak
+            FROM member_seasons ms
+            JOIN members m ON m.id = ms.member_id
+            WHERE ms.season_id = %(season_id)s
+              AND NOT EXISTS (
+                  SELECT 1 FROM member_season_stats s
+                  WHERE s.member_id = ms.member_id AND s.season_id = ms.season_id
+              )
+            ORDER BY m.last_name, m.first_name
+            """,
+            {"season_id": season_id},
+        )
+        return ranked + cur.fetchall()
+
+
+# The season roster as the members page and the members CSV show it. Both
+# per-member figures are joins against one row each -- the member's
+# member_season_stats row (matches_attended is exactly their check-ins this
+# season: any check-in makes its match a scanned one) and their live Apple
+# pass, unique per (member, season, platform) -- instead of a correlated
+# COUNT over checkins and an EXISTS per member.
+_SEASON_ROSTER_SQL = """
+    SELECT m.id, m.first_name, m.last_name, m.email, m.phone, m.created_at,
+           COALESCE(s.matches_attended, 0) AS checkins_this_season,
+           wp.id IS NOT NULL AS has_active_pass
+    FROM member_seasons ms
+    JOIN members m ON m.id = ms.member_id
+    LEFT JOIN member_season_stats s
+           ON s.member_id = ms.member_id AND s.season_id = ms.season_id
+    LEFT JOIN wallet_passes wp
+           ON wp.member_id = ms.member_id AND wp.season_id = ms.season_id
+          AND wp.platform = 'apple' AND wp.revoked_at IS NULL
+    WHERE ms.season_id = %(season_id)s
+    ORDER BY m.last_name, m.first_name
+"""
+
+
+def get_season_roster(season_id):
+    """Every member of the season with their check-in count and whether
+    they hold a live Apple pass -- the /admin/members table."""
+    with cursor(read_only=True) as cur:
+        cur.execute(_SEASON_ROSTER_SQL, {"season_id": season_id})
         return cur.fetchall()
 
 
+def stream_season_roster(season_id):
+    """get_season_roster, streamed (see stream_rows) -- for the CSV export."""
+    return stream_rows(_SEASON_ROSTER_SQL, {"season_id": season_id}, read_only=True)
+
+
+# Sorts search_season_roster accepts -> the key columns it orders (and
+# keysets) by, before the m.id tie-breaker. "relevance" only applies while
+# searching: substring hits first, then the closest fuzzy matches.
+ROSTER_SORTS = {
+    "name": ("lower(m.last_name)", "lower(m.first_name)"),
+    "email": ("m.email",),
+    "phone": ("COALESCE(m.phone, '')",),
+    "checkins": ("COALESCE(s.matches_attended, 0)",),
+    "relevance": (
+        "(member_search_text(m.first_name, m.last_name, m.email, m.phone) LIKE %(like)s)::int",
+        "word_similarity(%(q)s, member_search_text(m.first_name, m.last_name, m.email, m.phone))",
+    ),
+}
+ROSTER_PAGE_SIZE = 50
+
+
+def _encode_roster_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_roster_cursor(cursor_token):
+    try:
+        padded = cursor_token + "=" * (-len(cursor_token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def search_season_roster(season_id, q="", sort="name", direction="asc", after=None, limit=ROSTER_PAGE_SIZE):
+    """One keyset page of the season roster, optionally filtered by `q`
+    over name, email and phone -- substring or trigram word-similarity, off
+    the members_search_trgm index (schema.sql), so typos still find people.
+
+    `after` is the `next` token from the previous page. Keyset rather than
+    OFFSET: page 40 costs the same as page 1, and a member added mid-scroll
+    doesn't shift everyone down a row.
+
+    Returns {"members": [...], "next": token or None}; rows have the same
+    shape as get_season_roster's."""
+    q = " ".join((q or "").lower().split())
+    if sort not in ROSTER_SORTS or (sort == "relevance" and not q):
+        sort = "name"
+    descending = direction == "desc" or sort == "relevance"
+    keys = ROSTER_SORTS[sort] + ("m.id",)
+    limit = max(1, min(int(limit or ROSTER_PAGE_SIZE), 200))
+    params = {
+        "season_id": season_id,
+        "q": q,
+        "like": "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",
+        "limit": limit + 1,
+    }
+
+    where = ["ms.season_id = %(season_id)s"]
+    if q:
+        where.append(
+            "(member_search_text(m.first_name, m.last_name, m.email, m.phone) LIKE %(like)s"
+            " OR %(q)s <%% member_search_text(m.first_name, m.last_name, m.email, m.phone))"
+        )
+    after_values = _decode_roster_cursor(after) if after else None
+    if after_values is not None and len(after_values) == len(keys):
+        # Keys come back as text (sort_key below) and go in as untyped
+        # literals, which Postgres reads as each key's own type.
+        placeholders = []
+        for i, value in enumerate(after_values):
+            params[f"after_{i}"] = value
+            placeholders.append(f"%(after_{i})s")
+        where.append(
+            f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join(placeholders)})"
+        )
+    order = " DESC" if descending else ""
+
+    with cursor(read_only=True) as cur:
+        cur.execute(
+            f"""
+            SELECT m.id, m.first_name, m.last_name, m.email, m.phone, m.created_at,
+                   COALESCE(s.matches_attended, 0) AS checkins_this_season,
+                   wp.id IS NOT NULL AS has_active_pass,
+                   ARRAY[{', '.join(f'({k})::text' for k in keys)}] AS sort_key
+            FROM member_seasons ms
+            JOIN members m ON m.id = ms.member_id
+            LEFT JOIN member_season_stats s
+                   ON s.member_id = ms.member_id AND s.season_id = ms.season_id
+            LEFT JOIN wallet_passes wp
+                   ON wp.member_id = ms.member_id AND wp.season_id = ms.season_id
+                  AND wp.platform = 'apple' AND wp.revoked_at IS NULL
+            WHERE {' AND '.join(where)}
+            ORDER BY {', '.join(k + order for k in keys)}
+            LIMIT %(limit)s
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+
+    next_token = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_token = _encode_roster_cursor(rows[-1]["sort_key"])
+    for row in rows:
+        del row["sort_key"]
+    return {"members": rows, "next": next_token}
+
+
+def count_season_members(season_id):
+    with cursor(read_only=True) as cur:
+        cur.execute("SELECT COUNT(*) AS n FROM member_seasons WHERE season_id = %s", (season_id,))
+        return cur.fetchone()["n"]
+
+
+def rebuild_member_season_stats(season=None):
+    """Recompute member_season_stats from the check-ins themselves, for one
+    season (id or name) or every season -- the repair for stats suspected
+    of drifting. Returns the number of rows rebuilt."""
+    with cursor() as cur:
+        season_id = None
+        if season is not None:
+            row = _find_season(cur, season)
+            if row is None:
+                raise ValueError(f"No season {season!r}")
+            season_id = row["id"]
+        cur.execute("SELECT rebuild_member_season_stats(%s) AS rebuilt", (season_id,))
+        return cur.fetchone()["rebuilt"]
+
+
+# Longest value an imported field may hold. Emails cap at RFC 5321's 254;
+# names and phone get the same generous limit. Mostly this keeps a pasted
+# blob out of members' btree indexes, which can't hold a value over ~2.7kB
+# and would otherwise fail the whole import at the INSERT.
+IMPORT_MAX_FIELD_LENGTH = 254
+
+
+def bulk_import_members(rows, season_id):
+    """Set-based roster import: COPY every row into a temp staging table,
+    then upsert members and add them to the season in one statement,
+    instead of two round-trips per row.
+
+    rows: iterable of (line_num, first_name, last_name, email, phone),
+    already normalized (email lowercased, nothing None). If the same email
+    appears more than once, the last row wins, same as upserting them in
+    order would.
+
+    A bad row doesn't sink the rest of the file: rows that can't be staged
+    at all (a NUL byte, a character the connection encoding can't carry)
+    are set aside before the COPY, and rows that wouldn't make a valid
+    member (no usable email, an oversized field) are deleted out of the
+    staging table before the merge. Everything else is imported.
+
+    Returns (existing_emails, rejected): the set of emails that already had
+    a members row *before* this import, and a list of
+    {"line", "email", "reason"} dicts for the rows that were left out,
+    in file order.
+    """
+    rows = list(rows)
+    if not rows:
+        return set(), []
+
+    with cursor() as cur:
+        encoding = cur.connection.info.encoding
+        rejected = []
+        stageable = []
+        for row in rows:
+            line_num, _first, _last, email, _phone = row
+            if any("\x00" in value for value in row[1:]):
+                rejected.append({"line": line_num, "email": email, "reason": "contains a NUL character"})
+                continue
+            try:
+                for value in row[1:]:
+                    value.encode(encoding)
+            except UnicodeEncodeError:
+                rejected.append({"line": line_num, "email": email, "reason": f"has characters {encoding} can't store"})
+                continue
+            stageable.append(row)
+
+        cur.execute(
+            """
+            CREATE TEMP TABLE member_import_staging (
+                line_num INTEGER NOT NULL,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                phone TEXT NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        # Binary COPY: the server takes each field as-is -- no CSV quoting
+        # to escape on the way in and no text to parse on the way out.
+        with cur.copy(
+            "COPY member_import_staging (line_num, first_name, last_name, email, phone) "
+            "FROM STDIN WITH (FORMAT binary)"
+        ) as copy:
+            copy.set_types(["int4", "text", "text", "text", "text"])
+            for row in stageable:
+                copy.write_row(row)
+        # Validate in staging, one pass: anything that fails comes back out
+        # with its line number and why, and never reaches members. Then the
+        # merge, and the staging table dropped -- ON COMMIT DROP only fires
+        # at commit, and inside a request session that's the end of the
+        # request, so a second import in the same transaction would collide
+        # with it. None of the three waits on another's result, so they go
+        # out pipelined, one round-trip for all of them, each reading its
+        # rows back on a cursor of its own.
+        conn = cur.connection
+        with conn.cursor() as merge, conn.cursor() as drop:
+            with conn.pipeline():
+                cur.execute(
+                    """
+                    DELETE FROM member_import_staging
+                    WHERE email !~ '^[^@[:space:]]+@[^@[:space:]]+$'
+                       OR greatest(length(first_name), length(last_name), length(email), length(phone)) > %(max_len)s
+                    RETURNING line_num, email,
+                        CASE WHEN email !~ '^[^@[:space:]]+@[^@[:space:]]+$' THEN 'not a valid email address'
+                             ELSE 'a field is longer than ' || %(max_len)s || ' characters'
+                        END AS reason
+                    """,
+                    {"max_len": IMPORT_MAX_FIELD_LENGTH},
+                )
+                merge.execute(
+                    """
+                    WITH latest AS (
+                        SELECT DISTINCT ON (email) first_name, last_name, email, phone
+                        FROM member_import_staging
+                        ORDER BY email, line_num DESC
+                    ), upserted AS (
+                        INSERT INTO members (first_name, last_name, email, phone)
+                        SELECT first_name, last_name, email, phone FROM latest
+                        ON CONFLICT (email) DO UPDATE SET
+                            first_name = EXCLUDED.first_name,
+                            last_name = EXCLUDED.last_name,
+                            phone = EXCLUDED.phone
+                        RETURNING id, email, (xmax = 0) AS was_new
+                    ), joined AS (
+                        INSERT INTO member_seasons (member_id, season_id)
+                        SELECT id, %s FROM upserted
+                        ON CONFLICT (member_id, season_id) DO NOTHING
+                    )
+                    SELECT email FROM upserted WHERE NOT was_new
+                    """,
+                    (season_id,),
+                )
+                drop.execute("DROP TABLE member_import_staging")
+            rejected.extend(
+                {"line": r['line_num'], "email": r['email'], "reason": r['reason']} for r in cur.fetchall()
+            )
+            existing = {r['email'] for r in merge.fetchall()}
+        rejected.sort(key=lambda r: r["line"])
+        return existing, rejected
+
+
 def _wallet_token_fernet():
     """Symmetric key for encrypting (not hashing) the barcode token copy
     kept for PassKit web-service refreshes. Derived from FLASK_SECRET_KEY
@@ -173,28 +2503,54 @@ def issue_wallet_token(member_id, season_id, platform='apple'):
 
     Returns (raw_token, serial_number, auth_token).
     """
+    raw_token, row = _mint_wallet_token(member_id, season_id, platform)
+    with cursor() as cur:
+        cur.execute(_UPSERT_WALLET_PASS_SQL, row)
+    return raw_token, row[4], row[6]
+
+
+def issue_wallet_tokens(member_ids, season_id, platform='apple'):
+    """Bulk issue_wallet_token: mints a token for every member in
+    `member_ids` and writes all the wallet_passes rows pipelined, in one
+    round-trip, instead of a connection (and round-trip) per member. Same
+    rotate-on-reissue semantics. Returns {member_id: (raw_token,
+    serial_number, auth_token)}."""
+    issued = {}
+    rows = []
+    for member_id in dict.fromkeys(member_ids):
+        raw_token, row = _mint_wallet_token(member_id, season_id, platform)
+        issued[member_id] = (raw_token, row[4], row[6])
+        rows.append(row)
+    if rows:
+        with cursor() as cur:
+            cur.executemany(_UPSERT_WALLET_PASS_SQL, rows)
+    return issued
+
+
+_UPSERT_WALLET_PASS_SQL = """
+    INSERT INTO wallet_passes
+        (member_id, season_id, token_hash, token_encrypted, serial_number, platform, auth_token)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (member_id, season_id, platform) DO UPDATE SET
+        token_hash = EXCLUDED.token_hash,
+        token_encrypted = EXCLUDED.token_encrypted,
+        serial_number = EXCLUDED.serial_number,
+        auth_token = EXCLUDED.auth_token,
+        revoked_at = NULL,
+        created_at = now()
+"""
+
+
+def _mint_wallet_token(member_id, season_id, platform):
+    """(raw_token, wallet_passes row tuple in _UPSERT_WALLET_PASS_SQL's
+    column order) for a fresh token -- only the raw token ever leaves
+    here unhashed, and only to go into the pass itself."""
     raw_token = secrets.token_urlsafe(32)
     token_hash = hashlib.sha256(raw_token.encode()).hexdigest()
     token_encrypted = _wallet_token_fernet().encrypt(raw_token.encode()).decode()
     serial_number = f"OLSC-{member_id}-{season_id}-{secrets.token_hex(4)}"
     auth_token = secrets.token_urlsafe(24)
-    with cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO wallet_passes
-                (member_id, season_id, token_hash, token_encrypted, serial_number, platform, auth_token)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (member_id, season_id, platform) DO UPDATE SET
-                token_hash = EXCLUDED.token_hash,
-                token_encrypted = EXCLUDED.token_encrypted,
-                serial_number = EXCLUDED.serial_number,
-                auth_token = EXCLUDED.auth_token,
-                revoked_at = NULL,
-                created_at = now()
-            """,
-            (member_id, season_id, token_hash, token_encrypted, serial_number, platform, auth_token),
-        )
-    return raw_token, serial_number, auth_token
+    return raw_token, (member_id, season_id, token_hash, token_encrypted, serial_number, platform, auth_token)
 
 
 def set_google_wallet_object(member_id, season_id, object_id, class_id):
@@ -203,16 +2559,30 @@ def set_google_wallet_object(member_id, season_id, object_id, class_id):
     object instead of recomputing it from a serial number that may have
     since rotated (which would silently point at a different object)."""
     with cursor() as cur:
-        cur.execute(
-            """
-            UPDATE wallet_passes
-            SET google_object_id = %s, google_class_id = %s
-            WHERE member_id = %s AND season_id = %s AND platform = 'apple'
-            """,
-            (object_id, class_id, member_id, season_id),
+        cur.execute(_SET_GOOGLE_WALLET_OBJECT_SQL, (object_id, class_id, member_id, season_id))
+
+
+def set_google_wallet_objects(objects):
+    """Bulk set_google_wallet_object, pipelined: every UPDATE goes out in
+    one round-trip. objects: iterable of (member_id, season_id, object_id,
+    class_id)."""
+    objects = list(objects)
+    if not objects:
+        return
+    with cursor() as cur:
+        cur.executemany(
+            _SET_GOOGLE_WALLET_OBJECT_SQL,
+            [(object_id, class_id, member_id, season_id) for member_id, season_id, object_id, class_id in objects],
         )
 
 
+_SET_GOOGLE_WALLET_OBJECT_SQL = """
+    UPDATE wallet_passes
+    SET google_object_id = %s, google_class_id = %s
+    WHERE member_id = %s AND season_id = %s AND platform = 'apple'
+"""
+
+
 def all_google_wallet_objects():
     """Every Google Wallet object we've issued a save link for (whether or
     not the member actually tapped 'Add' -- PATCHing an object nobody saved
@@ -437,21 +2807,24 @@ def get_apple_passes_issued_before(cutoff):
 
 
 def get_members_without_wallet_pass(season_id):
-    """Members with no active wallet pass at all for the given season --
+    """Members of the given season with no active wallet pass for it --
     the "never sent a first pass" cohort, distinct from
-    get_apple_passes_issued_before's "has a pass, but it's stale" cohort."""
+    get_apple_passes_issued_before's "has a pass, but it's stale" cohort.
+    Right after a rollover (rollover_season) that's everyone carried over;
+    members who weren't are not in the new season and get no pass for it."""
     with cursor() as cur:
         cur.execute(
             """
             SELECT m.id AS member_id, m.first_name, m.last_name, m.email, m.created_at
             FROM members m
+            JOIN member_seasons ms ON ms.member_id = m.id AND ms.season_id = %(season_id)s
             WHERE NOT EXISTS (
                 SELECT 1 FROM wallet_passes wp
-                WHERE wp.member_id = m.id AND wp.season_id = %s AND wp.revoked_at IS NULL
+                WHERE wp.member_id = m.id AND wp.season_id = %(season_id)s AND wp.revoked_at IS NULL
             )
             ORDER BY m.last_name, m.first_name
             """,
-            (season_id,),
+            {"season_id": season_id},
         )
         return cur.fetchall()
 
@@ -532,6 +2905,65 @@ def get_door_pass(pass_id):
         return cur.fetchone()
 
 
+# How long a door pass looked up for require_scanner_access may be reused.
+# Only while the listener is actually LISTENing for door-pass changes --
+# then a revoke reaches us as a NOTIFY within milliseconds and the TTL is
+# just a backstop. Otherwise 0: every request re-checks the DB, as before,
+# so revoking a pass mid-shift always takes effect on the next request.
+DOOR_PASS_TTL_SECONDS = _env_int("DOOR_PASS_TTL_SECONDS", 0)
+DOOR_PASS_LISTENING_TTL_SECONDS = _env_int("DOOR_PASS_LISTENING_TTL_SECONDS", 60)
+DOOR_PASS_CHANNEL = "olsc_door_passes"
+
+
+class _DoorPassCache:
+    """In-process cache of door_passes rows by id, for the check every
+    request made with a door link does (every scan, count poll and roster
+    sync). Any change to door_passes -- a revoke, a season rollover
+    revoking them all -- NOTIFYs and drops the lot; passes are few and
+    change rarely, so per-pass invalidation isn't worth the bookkeeping."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._rows = {}  # pass_id -> (generation, loaded_at, row or None)
+        self._subscribed = False
+
+    def invalidate(self, _payload=None):
+        with self._lock:
+            self._generation += 1
+            self._rows = {}
+
+    def get(self, pass_id):
+        if not self._subscribed:
+            self._subscribed = True
+            listen(DOOR_PASS_CHANNEL, self.invalidate)
+        listening = get_listener().is_listening(DOOR_PASS_CHANNEL)
+        ttl = DOOR_PASS_LISTENING_TTL_SECONDS if listening else DOOR_PASS_TTL_SECONDS
+        with self._lock:
+            cached, generation = self._rows.get(pass_id), self._generation
+        if cached and cached[0] == generation and time.monotonic() - cached[1] < ttl:
+            return cached[2]
+
+        row = get_door_pass(pass_id)
+        row = dict(row) if row else None
+        with self._lock:
+            # Same rule as _CurrentContext: a NOTIFY mid-load means this
+            # row may already be stale, so it's served once, not kept.
+            if self._generation == generation and ttl > 0:
+                self._rows[pass_id] = (generation, time.monotonic(), row)
+        return row
+
+
+_door_pass_cache = _DoorPassCache()
+
+
+def get_door_pass_cached(pass_id):
+    """get_door_pass through the per-process cache above -- for the
+    per-request access check, not for anything that's about to change the
+    pass."""
+    return _door_pass_cache.get(pass_id)
+
+
 def list_door_passes():
     with cursor() as cur:
         cur.execute("SELECT * FROM door_passes ORDER BY created_at DESC")
@@ -541,9 +2973,60 @@ def list_door_passes():
 def revoke_door_pass(pass_id):
     with cursor() as cur:
         cur.execute("UPDATE door_passes SET revoked_at = now() WHERE id = %s AND revoked_at IS NULL", (pass_id,))
+    # Other workers hear it from the trigger's NOTIFY; this one needn't wait
+    # for it -- just for the commit.
+    _after_commit(_door_pass_cache.invalidate)
 
 
 if __name__ == "__main__":
-    init_schema()
-    season = ensure_default_season("2026/27")
-    print(f"Schema applied. Current season: {season['name']} (id={season['id']})")
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Apply schema.sql and ensure a current season (no command), or run a season job."
+    )
+    commands = parser.add_subparsers(dest="command")
+    archive = commands.add_parser("archive-season", help="move a closed season to the archive tables")
+    archive.add_argument("season", help="season name (e.g. 2024/25) or id")
+    rollover = commands.add_parser("rollover", help="start a new season and make it current")
+    rollover.add_argument("name", help="new season name, e.g. 2027/28")
+    rollover.add_argument("--starts-on")
+    rollover.add_argument("--ends-on")
+    rollover.add_argument("--carry-over", choices=sorted(ROLLOVER_CARRY_OVER), default="all")
+    rollover.add_argument("--to-issue-csv", help="write the members needing a new pass to this CSV")
+    rebuild = commands.add_parser("rebuild-stats", help="recompute the leaderboard stats table")
+    rebuild.add_argument("season", nargs="?", help="season name or id (default: every season)")
+    args = parser.parse_args()
+
+    if args.command == "archive-season":
+        moved = archive_season(args.season)
+        print(
+            f"Archived {moved['season']}: {moved['checkins']} check-ins, "
+            f"{moved['wallet_passes']} wallet passes moved to cold storage."
+        )
+    elif args.command == "rollover":
+        result = rollover_season(args.name, args.starts_on, args.ends_on, carry_over=args.carry_over)
+        previous = result["previous_season"]
+        print(
+            f"{result['season']['name']} is now current (id={result['season']['id']}). "
+            f"Carried over {result['members_carried']} member(s) from "
+            f"{previous['name'] if previous else 'no previous season'}; revoked "
+            f"{result['wallet_passes_revoked']} wallet pass(es) and "
+            f"{result['door_passes_revoked']} door pass(es)."
+        )
+        if args.to_issue_csv:
+            with open(args.to_issue_csv, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["member_id", "first_name", "last_name", "email"])
+                for r in result["to_issue"]:
+                    writer.writerow([r["member_id"], r["first_name"], r["last_name"], r["email"]])
+        print(
+            f"{len(result['to_issue'])} member(s) need a new pass -- send them from "
+            f"/admin/issue-passes."
+        )
+    elif args.command == "rebuild-stats":
+        rebuilt = rebuild_member_season_stats(args.season)
+        print(f"Rebuilt leaderboard stats for {rebuilt} member-season(s).")
+    else:
+        init_schema()
+        season = ensure_default_season("2026/27")
+        print(f"Schema applied. Current season: {season['name']} (id={season['id']})")
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Match-night door-rush load test: how many scans per second the door path
+sustains, and what the latency looks like while it does.
+
+Seeds its own throwaway schema in a local Postgres (N members, each with a
+current-season pass, and a current match), logs a number of simulated door
+devices in through a door link, and has them hammer /api/checkins/scan and
+/api/checkins/manual with a mix of first-time, duplicate and invalid scans.
+Reports p50/p95/p99 latency, throughput and error rates, and writes the
+same as JSON so one release can be compared against the last:
+
+    TEST_DATABASE_URL=postgresql://localhost/olsc_test \\
+        python3 loadtest_door_rush.py --members 5000 --devices 16 --requests 20000 \\
+        --json door-rush.json --baseline door-rush-last-release.json
+
+By default the app runs in-process (scanner_app through Flask's test
+client, one client per device, real pool and database -- no HTTP in the
+way). --url drives a server that's already running instead; start it with
+the DATABASE_URL this prints after seeding, so it sees the seeded schema.
+
+Never point this at production: it drops and recreates --schema.
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+DEFAULT_SCHEMA = "olsc_door_rush"
+DEFAULT_MIX = "valid=60,duplicate=20,invalid=10,manual=10"
+KINDS = ("valid", "duplicate", "invalid", "manual")
+RESULT_FORMAT_VERSION = 1
+
+SEED_SQL = """
+INSERT INTO seasons (name, is_current) VALUES ('Door rush', TRUE);
+
+INSERT INTO members (first_name, last_name, email)
+SELECT 'Rush' || g, 'Member' || g, 'rush' || g || '@example.com'
+FROM generate_series(1, %(members)s) AS g;
+
+INSERT INTO member_seasons (member_id, season_id)
+SELECT m.id, s.id FROM members m, seasons s;
+
+-- Raw token 'rush-<member id>', hashed the way db.checkin_by_token does.
+INSERT INTO wallet_passes (member_id, season_id, token_hash, serial_number)
+SELECT member_id, season_id, encode(sha256(convert_to('rush-' || member_id, 'UTF8')), 'hex'),
+       'RUSH-' || member_id
+FROM member_seasons;
+
+INSERT INTO matches (season_id, opponent, is_home, kickoff_at, is_current)
+SELECT id, 'Door Rush FC', TRUE, now() + interval '1 hour', TRUE FROM seasons;
+"""
+
+
+def schema_dsn(url, schema):
+    """`url` with every connection's search_path pinned to `schema`."""
+    return make_conninfo(url, options=f"-c search_path={schema}")
+
+
+def seed(url, schema, members):
+    """Fresh `schema` with `members` members, passes and a current match,
+    plus a door pass for the simulated devices. Returns (member_ids,
+    door_token)."""
+    admin = psycopg.connect(url)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    admin.close()
+
+    door_token = secrets.token_urlsafe(24)
+    # Client-side binding: SEED_SQL is several statements in one execute().
+    conn = psycopg.connect(schema_dsn(url, schema), cursor_factory=psycopg.ClientCursor)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_PATH.read_text())
+            cur.execute(SEED_SQL, {"members": members})
+            cur.execute(
+                "INSERT INTO door_passes (token_hash, label) VALUES (%s, 'door rush load test')",
+                (hashlib.sha256(door_token.encode()).hexdigest(),),
+            )
+            cur.execute("SELECT member_id FROM member_seasons ORDER BY member_id")
+            member_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+    return member_ids, door_token
+
+
+def drop_schema(url, schema):
+    conn = psycopg.connect(url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    conn.close()
+
+
+class _InProcessDevice:
+    """One door phone, talking to the app through Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_json(silent=True)
+
+    def post(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class _HttpDevice:
+    """One door phone, talking to a running server over HTTP."""
+
+    def __init__(self, base_url, timeout):
+        import requests
+
+        self.session = requests.Session()
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _json(self, response):
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def get(self, path):
+        response = self.session.get(self.base_url + path, timeout=self.timeout, allow_redirects=False)
+        return response.status_code, self._json(response)
+
+    def post(self, path, payload):
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        return response.status_code, self._json(response)
+
+
+def in_process_app(dsn):
+    """scanner_app, with db pointed at `dsn` (and any earlier pool or
+    cached context dropped)."""
+    import db
+    import scanner_app
+
+    for pool in (db._pool, db._read_pool):
+        if pool is not None:
+            pool.close_all()
+    db._pool = db._read_pool = None
+    db.DATABASE_URL = db.DATABASE_LISTEN_URL = dsn
+    db.DATABASE_READ_URL = None
+    db.invalidate_current_context()
+    db._door_pass_cache.invalidate()
+    return scanner_app.app
+
+
+def parse_mix(value):
+    """'valid=60,duplicate=20,...' -> {kind: weight}."""
+    weights = dict.fromkeys(KINDS, 0.0)
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in weights:
+            raise argparse.ArgumentTypeError(f"unknown traffic kind {kind!r} (one of {', '.join(KINDS)})")
+        try:
+            weights[kind] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {kind}: {weight!r}")
+    if sum(weights.values()) <= 0:
+        raise argparse.ArgumentTypeError("the traffic mix needs at least one positive weight")
+    return weights
+
+
+class _Traffic:
+    """Hands out the next request for any device: who's still to arrive,
+    who's already in (for duplicates), and a made-up token now and then.
+    A member only counts as in once their check-in has been answered, so
+    a "duplicate" never races the first scan it duplicates."""
+
+    def __init__(self, member_ids, mix, seed):
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._arriving = list(member_ids)
+        self._rng.shuffle(self._arriving)
+        self._in = []
+        self._kinds = list(mix)
+        self._weights = [mix[kind] for kind in self._kinds]
+
+    def next(self):
+        """(kind, path, payload, expected_result)."""
+        with self._lock:
+            kind = self._rng.choices(self._kinds, self._weights)[0]
+            if kind in ("valid", "manual") and not self._arriving:
+                kind = "duplicate"
+            if kind == "duplicate" and not self._in:
+                kind = "valid" if self._arriving else "invalid"
+            if kind == "valid":
+                member_id = self._arriving.pop()
+                return kind, "/api/checkins/scan", {"token": f"rush-{member_id}"}, ("checked_in", member_id)
+            if kind == "manual":
+                member_id = self._arriving.pop()
+                return kind, "/api/checkins/manual", {"member_id": member_id}, ("checked_in", member_id)
+            if kind == "duplicate":
+                member_id = self._rng.choice(self._in)
+                return kind, "/api/checkins/scan", {"token": f"rush-{member_id}"}, ("already_checked_in", None)
+            bogus = f"rush-bogus-{self._rng.getrandbits(64):x}"
+            return kind, "/api/checkins/scan", {"token": bogus}, ("invalid", None)
+
+    def arrived(self, member_id):
+        with self._lock:
+            self._in.append(member_id)
+
+
+def _outcome(expected, status, body):
+    """'ok', 'unexpected' (answered, but not what this scan should get) or
+    'error' (failed: 5xx, 401, no JSON...)."""
+    result, _member_id = expected
+    if result == "invalid":
+        if status == 404 and body and body.get("code") == "invalid_or_expired":
+            return "ok"
+        return "unexpected" if status < 500 and body else "error"
+    if status != 200 or not body or body.get("status") != "success":
+        return "unexpected" if status in (404, 409) and body else "error"
+    return "ok" if body.get("result") == result else "unexpected"
+
+
+def run(make_device, door_token, member_ids, devices, requests_total, duration, mix, seed=None):
+    """Drive the door path from `devices` threads until `requests_total`
+    requests are done (or `duration` seconds pass). Returns the samples,
+    as (kind, latency_ms, outcome, status), and the wall-clock seconds."""
+    traffic = _Traffic(member_ids, mix, seed)
+    samples = []
+    samples_lock = threading.Lock()
+    remaining = [requests_total]
+    failures = []
+    started = [0.0]
+    # The clock starts once every device has logged in.
+    start_gate = threading.Barrier(devices + 1, action=lambda: started.__setitem__(0, time.perf_counter()))
+
+    def take_one():
+        with samples_lock:
+            if remaining[0] <= 0:
+                return False
+            if duration and time.perf_counter() - started[0] >= duration:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def device_loop(device):
+        local = []
+        try:
+            # Log in through the door link first, like a volunteer's phone.
+            status, _body = device.get(f"/door/{door_token}")
+            if status not in (301, 302, 303):
+                raise RuntimeError(f"door link login failed with HTTP {status}")
+            device.get("/api/checkins/count")
+        except Exception as e:
+            failures.append(e)
+        finally:
+            start_gate.wait()
+        if failures:
+            return
+        while take_one():
+            kind, path, payload, expected = traffic.next()
+            began = time.perf_counter()
+            try:
+                status, body = device.post(path, payload)
+            except Exception:
+                status, body = 0, None
+            latency_ms = (time.perf_counter() - began) * 1000
+            outcome = _outcome(expected, status, body)
+            if expected[1] is not None and body and body.get("status") == "success":
+                traffic.arrived(expected[1])
+            local.append((kind, latency_ms, outcome, status))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=device_loop, args=(make_device(),), daemon=True) for _ in range(devices)]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started[0]
+    if failures:
+        raise failures[0]
+    return samples, wall_seconds
+
+
+def _latency(values):
+    if not values:
+        return None
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0], "max": values[0], "mean": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 2),
+        "p95": round(cuts[94], 2),
+        "p99": round(cuts[98], 2),
+        "max": round(max(values), 2),
+        "mean": round(statistics.fmean(values), 2),
+    }
+
+
+def summarize(samples, wall_seconds):
+    """The machine-readable part of the report: overall and per-kind
+    latency (ms), throughput, and error/unexpected-result rates."""
+    total = len(samples)
+    errors = sum(1 for s in samples if s[2] == "error")
+    unexpected = sum(1 for s in samples if s[2] == "unexpected")
+    statuses = {}
+    for _kind, _ms, outcome, status in samples:
+        if outcome != "ok":
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_kind = {}
+    for kind in KINDS:
+        mine = [s for s in samples if s[0] == kind]
+        if not mine:
+            continue
+        by_kind[kind] = {
+            "requests": len(mine),
+            "errors": sum(1 for s in mine if s[2] == "error"),
+            "unexpected": sum(1 for s in mine if s[2] == "unexpected"),
+            "latency_ms": _latency([s[1] for s in mine]),
+        }
+    return {
+        "requests": total,
+        "duration_s": round(wall_seconds, 3),
+        "throughput_rps": round(total / wall_seconds, 1) if wall_seconds else 0.0,
+        "error_rate": round(errors / total, 5) if total else 0.0,
+        "unexpected_rate": round(unexpected / total, 5) if total else 0.0,
+        "failed_statuses": statuses,
+        "latency_ms": _latency([s[1] for s in samples]),
+        "by_kind": by_kind,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(result):
+    summary = result["summary"]
+    config = result["config"]
+    print(
+        f"\ndoor rush: {summary['requests']} requests from {config['devices']} devices "
+        f"in {summary['duration_s']:.1f}s ({config['members']} members, target {config['target']})"
+    )
+    print(f"  throughput   {summary['throughput_rps']:.1f} req/s")
+    print(f"  errors       {summary['error_rate']:.2%}   unexpected results {summary['unexpected_rate']:.2%}")
+    if summary["failed_statuses"]:
+        print("  failed by HTTP status: " + ", ".join(f"{k}: {v}" for k, v in sorted(summary["failed_statuses"].items())))
+    print(f"  {'':10} {'requests':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}   (ms)")
+    rows = [("all", summary["requests"], summary["latency_ms"])]
+    rows += [(kind, s["requests"], s["latency_ms"]) for kind, s in summary["by_kind"].items()]
+    for name, count, latency in rows:
+        if latency:
+            print(
+                f"  {name:10} {count:>9} {latency['p50']:>8.1f} {latency['p95']:>8.1f} "
+                f"{latency['p99']:>8.1f} {latency['max']:>8.1f}"
+            )
+
+
+def compare(result, baseline, max_regression):
+    """Print p95 / p99 / throughput against a saved result. Returns the
+    regressions beyond `max_regression` (a fraction) -- empty if none."""
+    now, then = result["summary"], baseline["summary"]
+    regressions = []
+    print(f"\nvs baseline {baseline.get('git_revision') or '?'} ({baseline.get('started_at', '?')}):")
+    for label, key in (("p95", "p95"), ("p99", "p99")):
+        before, after = then["latency_ms"][key], now["latency_ms"][key]
+        change = (after - before) / before if before else 0.0
+        print(f"  {label:10} {before:8.1f} -> {after:8.1f} ms  ({change:+.0%})")
+        if change > max_regression:
+            regressions.append(f"{label} latency up {change:.0%}")
+    before, after = then["throughput_rps"], now["throughput_rps"]
+    change = (after - before) / before if before else 0.0
+    print(f"  {'throughput':10} {before:8.1f} -> {after:8.1f} req/s ({change:+.0%})")
+    if -change > max_regression:
+        regressions.append(f"throughput down {-change:.0%}")
+    if now["error_rate"] > then["error_rate"]:
+        regressions.append(f"error rate up from {then['error_rate']:.2%} to {now['error_rate']:.2%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Match-night door-rush load test for the check-in path.")
+    parser.add_argument("--database-url", default=os.getenv("TEST_DATABASE_URL"),
+                        help="scratch Postgres to seed (default: TEST_DATABASE_URL)")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help=f"schema to (re)create (default {DEFAULT_SCHEMA})")
+    parser.add_argument("--members", type=int, default=2000, help="members with a pass (default 2000)")
+    parser.add_argument("--devices", type=int, default=8, help="simulated door devices (default 8)")
+    parser.add_argument("--requests", type=int, default=5000, help="requests to send in total (default 5000)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds, if sooner")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"traffic weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for a repeatable request sequence")
+    parser.add_argument("--url", help="drive a running server at this base URL instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout with --url (default 10s)")
+    parser.add_argument("--json", dest="json_path", help="write the result here as JSON ('-' for stdout)")
+    parser.add_argument("--baseline", help="an earlier --json result to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="with --baseline: exit 1 if p95/p99 or throughput is worse by more than this (default 0.2)")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded schema in place afterwards")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("no database: pass --database-url or set TEST_DATABASE_URL (a scratch Postgres, never production)")
+
+    dsn = schema_dsn(args.database_url, args.schema)
+    print(f"Seeding {args.members} members into schema {args.schema}...")
+    member_ids, door_token = seed(args.database_url, args.schema, args.members)
+    try:
+        if args.url:
+            print(f"Driving {args.url} -- its DATABASE_URL must be: {dsn}")
+            make_device = functools.partial(_HttpDevice, args.url, args.timeout)
+        else:
+            make_device = functools.partial(_InProcessDevice, in_process_app(dsn))
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        samples, wall_seconds = run(
+            make_device, door_token, member_ids, args.devices, args.requests, args.duration, args.mix, args.seed,
+        )
+    finally:
+        if not args.keep:
+            drop_schema(args.database_url, args.schema)
+
+    result = {
+        "tool": "loadtest_door_rush",
+        "format_version": RESULT_FORMAT_VERSION,
+        "started_at": started_at,
+        "git_revision": _git_revision(),
+        "config": {
+            "target": args.url or "in-process scanner_app",
+            "members": args.members,
+            "devices": args.devices,
+            "requests": args.requests,
+            "duration": args.duration,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "summary": summarize(samples, wall_seconds),
+    }
+    print_report(result)
+
+    if args.json_path == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    elif args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nWrote {args.json_path}")
+
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        if regressions:
+            print("REGRESSED: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -70,8 +70,8 @@ def get_liverpool_fixtures():
             print(f"   Raw UTC time: {match.get('utcDate')}")
         
         # Fetch every active override once, up front — not per fixture. Each
-        # DB round-trip here costs ~1.3s (no connection pooling), so doing
-        # this inside the loop below turned a fast local lookup into a
+        # DB round-trip used to cost ~1.3s (before db.cursor() was pooled),
+        # and doing this inside the loop below turned a fast local lookup into a
         # 25-fixture-long chain of network calls (~30s total) the moment
         # overrides moved off the JSON file and onto the DB.
         overrides_by_date = {
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Scanner-only web app for match night: the door scanner page, its check-in,
+count and roster APIs, and door links (/door/<token>) -- nothing else.
+
+Same views as the full app (they live in scanner_routes.py), but none of
+app.py's 80-odd admin routes or the Pillow / qrcode / wallet / Google
+imports behind them, so a worker starts in a fraction of the time and
+memory and can be scaled up on its own for the door rush:
+
+    python3 scanner_app.py
+
+That's Flask's own server, starting a thread per request. Under gunicorn,
+use threaded workers with --threads comfortably above
+HEADCOUNT_STREAM_MAX_CLIENTS (each open /api/checkins/stream holds one),
+so scans are never left queueing behind headcount streams:
+
+    gunicorn --worker-class gthread --threads 32 scanner_app:app
+
+Shares FLASK_SECRET_KEY (and so the session cookie) with app.py: route
+/scanner, /scanner-sw.js, /door/* and /api/checkins/* plus
+/api/members/roster*.json to this service on the same host and an admin
+who logged in on the main app is logged in here too. Logging in happens
+on the main app -- set MAIN_APP_URL and /login here sends people there.
+"""
+
+import os
+
+from dotenv import load_dotenv
+from flask import Flask, redirect, render_template, session, url_for
+
+import db
+from scanner_routes import current_match_theme, headcount_refresh_seconds, register_scanner_routes
+
+load_dotenv()
+
+app = Flask(__name__)
+app.secret_key = os.getenv('FLASK_SECRET_KEY', 'change-this-secret-key-in-production')
+app.config['SESSION_COOKIE_HTTPONLY'] = True
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', 'false').lower() == 'true'
+
+MAIN_APP_URL = (os.getenv('MAIN_APP_URL') or '').strip().rstrip('/')
+
+
+@app.context_processor
+def inject_headcount_refresh():
+    return {"headcount_refresh_seconds": headcount_refresh_seconds()}
+
+
+@app.before_request
+def _begin_db_session():
+    """Same one-connection-per-request session as app.py's hooks."""
+    db.begin_session()
+
+
+@app.after_request
+def _commit_db_session(response):
+    db.end_session(commit=response.status_code < 500)
+    timing = db.request_timing()
+    if timing["queries"]:
+        response.headers['Server-Timing'] = (
+            f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries", '
+            f'db-acquire;dur={timing["acquire_ms"]:.1f}'
+        )
+    return response
+
+
+@app.teardown_request
+def _end_db_session(exc):
+    db.end_session(commit=False)
+
+
+@app.route('/login')
+def login():
+    """No passwords here: send admins to the main app's login (and back to
+    the scanner after), or, with no MAIN_APP_URL set, show the same page
+    as a dead door link."""
+    if MAIN_APP_URL:
+        return redirect(f"{MAIN_APP_URL}/login?next={url_for('scanner')}")
+    return render_template('door_invalid.html', wordmark_data_uri=current_match_theme()[1]), 401
+
+
+@app.route('/logout')
+def logout():
+    session.pop('authenticated', None)
+    session.pop('oauth_state', None)
+    session.pop('door_pass_id', None)
+    return redirect(f"{MAIN_APP_URL}/" if MAIN_APP_URL else url_for('login'))
+
+
+register_scanner_routes(app)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5001)), threaded=True)
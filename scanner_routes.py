@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+The door scanner: its page, the check-in / count / roster APIs it calls,
+and door-link auth. Served by the full admin app (app.py) and, on its own,
+by the scanner-only entry point (scanner_app.py) -- so this module only
+imports what those views need: Flask, db and pytz, no Pillow, wallet or
+Google libraries.
+
+Views are declared with @route below and attached to an app by
+register_scanner_routes(app), keeping their usual endpoint names
+('scanner', 'api_checkins_scan', ...) so url_for works the same in both.
+"""
+
+import base64
+import functools
+import json
+import os
+import queue
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pytz
+from flask import (
+    Response, current_app, jsonify, redirect, render_template, request, send_file, session, url_for,
+)
+
+import db
+
+ADMIN_USERNAME = (os.getenv('ADMIN_USERNAME') or '').strip()
+MEMBERSHIP_SHOP_URL = "https://olscbrooklyn.com/shop/p/lfc-brooklyn-2627-membership"
+
+# Same wordmarks as wallet_pass.PASS_THEMES, by path, so the scanner-only
+# app can theme its page without importing the pass builder (and Pillow).
+WORDMARK_PATHS = {
+    "home": Path(__file__).resolve().parent / "wallet_pass_assets" / "olsc_wordmark_white.png",
+    "away": Path(__file__).resolve().parent / "wallet_pass_assets" / "olsc_wordmark_red.png",
+}
+
+_ROUTES = []  # (rule, view_func, options), in declaration order
+
+
+def route(rule, **options):
+    """@app.route, deferred until register_scanner_routes(app)."""
+    def decorator(view_func):
+        _ROUTES.append((rule, view_func, options))
+        return view_func
+    return decorator
+
+
+def register_scanner_routes(app, page_theme=None):
+    """Attach every scanner view to `app`. `page_theme` is a
+    () -> (is_home, wordmark_data_uri) for the scanner and door-link pages;
+    it defaults to current_match_theme."""
+    app.config['SCANNER_PAGE_THEME'] = page_theme or current_match_theme
+    for rule, view_func, options in _ROUTES:
+        app.add_url_rule(rule, view_func=view_func, **options)
+
+
+@functools.lru_cache(maxsize=None)
+def _wordmark_data_uri(kit):
+    encoded = base64.b64encode(WORDMARK_PATHS[kit].read_bytes()).decode("ascii")
+    return f"data:image/png;base64,{encoded}"
+
+
+def current_match_theme():
+    """(is_home, wordmark_data_uri) from the current match -- the one the
+    door is scanning for -- rather than app.py's _current_theme, which
+    asks football-data.org for the next fixture on every page load."""
+    try:
+        match = db.get_current_match()
+    except Exception:
+        match = None
+    is_home = bool(match.get("is_home", True)) if match else True
+    return is_home, _wordmark_data_uri("home" if is_home else "away")
+
+
+@functools.lru_cache(maxsize=None)
+def _shop_qr_data_uri():
+    """The "scan to join" QR on the scanner's no-results screen. The URL
+    never changes, so it's drawn once per process -- as SVG, which needs no
+    Pillow -- and the qrcode import waits until someone first needs it."""
+    import qrcode
+    import qrcode.image.svg
+
+    img = qrcode.make(
+        MEMBERSHIP_SHOP_URL,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        image_factory=qrcode.image.svg.SvgPathImage,
+    )
+    encoded = base64.b64encode(img.to_string()).decode("ascii")
+    return f"data:image/svg+xml;base64,{encoded}"
+
+
+def headcount_refresh_seconds():
+    """Headcount refresh interval in seconds (10–300). Set HEADCOUNT_REFRESH_SECONDS in env to override default 60."""
+    try:
+        s = (os.getenv("HEADCOUNT_REFRESH_SECONDS") or "60").strip()
+        return max(10, min(300, int(s)))
+    except ValueError:
+        return 60
+
+
+def require_password():
+    """Check if user is authenticated (password or Google OAuth)."""
+    return bool(session.get('authenticated'))
+
+
+def _door_pass_is_valid(pass_id):
+    """Re-checked on every request, not just once at redemption time -- so
+    revoking a door pass takes effect immediately, even for someone already
+    mid-shift with it open. Checked against db's per-process cache, which
+    a revoke's NOTIFY clears the moment it commits (and which is bypassed
+    whenever that NOTIFY couldn't reach us), so most requests don't query."""
+    row = db.get_door_pass_cached(pass_id)
+    if not row or row['revoked_at']:
+        return False
+    if row['expires_at'] and row['expires_at'] <= datetime.now(timezone.utc):
+        return False
+    return True
+
+
+def require_scanner_access():
+    """Full admin session, OR a still-valid door pass -- the scoped,
+    revocable link volunteer door staff use to reach only the scanner,
+    never the rest of admin."""
+    if require_password():
+        return True
+    door_pass_id = session.get('door_pass_id')
+    return bool(door_pass_id and _door_pass_is_valid(door_pass_id))
+
+
+@route('/door/<token>')
+def door_access(token):
+    """Redeem a volunteer door-staff link: scoped to the scanner only,
+    revocable/expirable independently of the real admin password. Doesn't
+    touch any existing admin session -- an admin opening this link to
+    test it stays logged in as admin too, the two are independent flags."""
+    row = db.find_door_pass_by_token(token)
+    if not row or row['revoked_at'] or (row['expires_at'] and row['expires_at'] <= datetime.now(timezone.utc)):
+        return render_template('door_invalid.html', wordmark_data_uri=current_app.config['SCANNER_PAGE_THEME']()[1]), 404
+    session['door_pass_id'] = row['id']
+    return redirect(url_for('scanner'))
+
+
+def _extract_scan_token(raw_value):
+    """Accept a raw wallet token, a full /checkin/t/<token> URL (what's
+    actually embedded in the QR), or a /pass/<token> URL (the mobile pass
+    page / the link that's actually in the resend/recovery emails — this is
+    the one realistic thing a person might have as copyable text, so it
+    needs to work here too, not just the QR-only URL shape).
+    """
+    value = (raw_value or "").strip()
+    if not value:
+        return ""
+    try:
+        parsed = urlparse(value)
+        if parsed.scheme and parsed.netloc:
+            parts = [part for part in parsed.path.split("/") if part]
+            if len(parts) >= 3 and parts[-3:-1] == ["checkin", "t"]:
+                return parts[-1].strip()
+            if len(parts) >= 2 and parts[-2] in ("t", "pass"):
+                return parts[-1].strip()
+    except Exception:
+        pass
+    if "/checkin/t/" in value:
+        return value.rsplit("/checkin/t/", 1)[-1].split("?", 1)[0].split("#", 1)[0].strip()
+    if "/pass/" in value:
+        return value.rsplit("/pass/", 1)[-1].split("?", 1)[0].split("#", 1)[0].strip()
+    return value
+
+
+def _format_match_for_scan(match):
+    if not match:
+        return None
+    kickoff = match.get('kickoff_at')
+    if kickoff:
+        try:
+            tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
+            kickoff = kickoff.astimezone(tz).strftime('%a %b %-d, %-I:%M %p')
+        except Exception:
+            kickoff = str(kickoff)
+    return {
+        "id": match.get("id"),
+        "opponent": match.get("opponent"),
+        "is_home": bool(match.get("is_home")),
+        "competition": match.get("competition") or "",
+        "kickoff": kickoff or "",
+        "label": f"{'vs' if match.get('is_home') else '@'} {match.get('opponent')}",
+    }
+
+
+@route('/scanner')
+def scanner():
+    if not require_scanner_access():
+        return redirect(url_for('login'))
+
+    season = db.get_current_season()
+    match = db.get_current_match()
+    is_home, wordmark_data_uri = current_app.config['SCANNER_PAGE_THEME']()
+    checked_in_count = db.count_checkins_for_match(match['id']) if match else 0
+
+    return render_template(
+        'scanner.html',
+        capacity=match.get('capacity') if match else None,
+        season=season,
+        match=_format_match_for_scan(match),
+        is_home=is_home,
+        wordmark_data_uri=wordmark_data_uri,
+        shop_qr_data_uri=_shop_qr_data_uri(),
+        shop_url=MEMBERSHIP_SHOP_URL,
+        checked_in_count=checked_in_count,
+        # The scanner-only app has no admin pages to link to, even for an
+        # admin session.
+        door_only=not require_password() or 'admin_index' not in current_app.view_functions,
+    )
+
+
+@route('/api/checkins/count')
+def api_checkins_count():
+    """Running check-in count for the current match — lets door staff watch
+    for fire-marshal capacity on early-entry nights (and, if the match has
+    a capacity set, the scan path itself refuses check-ins past it). Grows
+    only; there's no "check out" in this system, checkins are a permanent
+    per-match record."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized"}), 401
+    match = db.get_current_match()
+    if not match:
+        return jsonify({"status": "ok", "count": 0, "match_id": None, "capacity": None})
+    return jsonify({
+        "status": "ok",
+        "count": db.count_checkins_for_match(match['id']),
+        "match_id": match['id'],
+        "capacity": match.get('capacity'),
+    })
+
+
+# An idle headcount stream sends a comment this often, so proxies don't
+# time it out and a client that vanished is noticed (the write fails).
+HEADCOUNT_STREAM_KEEPALIVE_SECONDS = 20
+
+
+def _headcount_sse(event):
+    data = {"match_id": event["match_id"], "count": event["count"], "capacity": event["capacity"]}
+    last = event.get("last")
+    if last:
+        try:
+            checked_in_at = datetime.fromisoformat(last["checked_in_at"])
+        except (TypeError, ValueError):
+            checked_in_at = None
+        data["last"] = {
+            "member_id": last["member_id"],
+            "name": last["name"],
+            "source": last["source"],
+            "checked_in_at": _format_checkin_time(checked_in_at),
+        }
+    return f"event: headcount\ndata: {json.dumps(data)}\n\n"
+
+
+@route('/api/checkins/stream')
+def api_checkins_stream():
+    """Server-Sent Events: the current match's headcount, pushed the moment
+    a check-in commits (on any worker, via the notify_headcount trigger and
+    this worker's one LISTEN -- see db.subscribe_headcount), instead of
+    every screen polling /api/checkins/count or /api/headcount, along with
+    who just came in.
+
+    Door staff and admins only: each open stream holds a server thread for
+    as long as it's connected, and only db.HEADCOUNT_STREAM_MAX_CLIENTS of
+    them are let in per process, so the public landing page sticks to
+    polling /api/headcount rather than filling those slots with visitors.
+    503 past the cap, or when LISTEN is turned off -- the pages poll until
+    a stream connects, so they just carry on polling."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+    if not (db.LISTEN_ENABLED and db.DATABASE_LISTEN_URL):
+        return jsonify({"status": "error", "code": "stream_unavailable"}), 503
+    # Subscribe before reading the starting count, so a check-in landing
+    # in between is never missed (at worst it's counted twice over, and
+    # the later event's count is the right one either way).
+    feed = db.subscribe_headcount()
+    if feed is None:
+        return jsonify({"status": "error", "code": "stream_full"}), 503
+    try:
+        first = db.headcount_snapshot()
+    except Exception:
+        db.unsubscribe_headcount(feed)
+        raise
+
+    def events():
+        try:
+            yield "retry: 5000\n\n"
+            yield _headcount_sse(first)
+            while True:
+                try:
+                    event = feed.get(timeout=HEADCOUNT_STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _headcount_sse(event)
+        finally:
+            db.unsubscribe_headcount(feed)
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@route('/api/checkins/scan', methods=['POST'])
+def api_checkins_scan():
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+
+    payload = request.get_json(silent=True) or {}
+    token = _extract_scan_token(payload.get('token') or payload.get('barcode') or payload.get('value'))
+    if not token:
+        return jsonify({
+            "status": "error",
+            "code": "missing_token",
+            "message": "No wallet token found in the scan.",
+        }), 400
+
+    scanner_admin_id = session.get('username') or ADMIN_USERNAME or "admin"
+    try:
+        row = db.checkin_by_token(token, scanner_admin_id)
+        return _checkin_response(row, "invalid_or_expired", "Invalid, expired, or revoked pass.")
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "code": "server_error",
+            "message": f"Scanner failed: {e}",
+        }), 500
+
+
+def _format_checkin_time(checked_in_at):
+    if not checked_in_at:
+        return ""
+    try:
+        tz = pytz.timezone(os.getenv('TIMEZONE', 'America/New_York'))
+        return checked_in_at.astimezone(tz).strftime('%-I:%M:%S %p')
+    except Exception:
+        return str(checked_in_at)
+
+
+def _checkin_response(row, not_found_code, not_found_message):
+    """Shared response shape for /api/checkins/scan and /manual, from the
+    single row db.checkin_by_token / db.checkin_member return."""
+    if row['result'] == 'no_current_season':
+        return jsonify({
+            "status": "error",
+            "code": "no_current_season",
+            "message": "No current season is configured.",
+        }), 400
+    if row['result'] == 'no_current_match':
+        return jsonify({
+            "status": "error",
+            "code": "no_current_match",
+            "message": "No current match is configured. Set one in Matches before scanning.",
+        }), 400
+
+    match = _format_match_for_scan({
+        "id": row['match_id'],
+        "opponent": row['match_opponent'],
+        "is_home": row['match_is_home'],
+        "competition": row['match_competition'],
+        "kickoff_at": row['match_kickoff_at'],
+    })
+    if row['result'] == 'member_not_found':
+        return jsonify({
+            "status": "error",
+            "code": not_found_code,
+            "message": not_found_message,
+            "match": match,
+        }), 404
+    if row['result'] == 'at_capacity':
+        return jsonify({
+            "status": "error",
+            "code": "at_capacity",
+            "message": f"At capacity ({row['match_capacity']}) — no more check-ins for this match.",
+            "member": {
+                "id": row['member_id'],
+                "name": f"{row['first_name']} {row['last_name']}".strip(),
+                "email": row['email'],
+            },
+            "match": match,
+        }), 409
+
+    return jsonify({
+        "status": "success",
+        "result": row['result'],
+        "message": "Checked in." if row['result'] == 'checked_in' else "Already used for this match.",
+        "checked_in_at": _format_checkin_time(row['checked_in_at']),
+        "member": {
+            "id": row['member_id'],
+            "name": f"{row['first_name']} {row['last_name']}".strip(),
+            "email": row['email'],
+        },
+        "match": match,
+    })
+
+
+def _parse_scanned_at(value):
+    """Client-side scan time (ISO 8601, as JS toISOString() writes it) ->
+    aware datetime, or None if missing/unparseable (the server then uses
+    its own clock). db.checkin_batch holds it to the match window either
+    way."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@route('/api/checkins/batch', methods=['POST'])
+def api_checkins_batch():
+    """Flush an offline scanner's queue: {"items": [{"client_id",
+    "token" | "member_id", "scanned_at"}, ...]}, all checked in with one
+    statement (db.checkin_batch). Answers every item by its client_id,
+    with the same result values as /scan -- the device drops an item from
+    its queue once it has a result for it, whatever that result is, and
+    can safely re-send anything it never heard back about."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+
+    payload = request.get_json(silent=True) or {}
+    items = payload.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "code": "missing_items", "message": "No check-ins to sync."}), 400
+    if len(items) > db.CHECKIN_BATCH_MAX:
+        return jsonify({
+            "status": "error",
+            "code": "too_many_items",
+            "message": f"At most {db.CHECKIN_BATCH_MAX} check-ins per batch.",
+        }), 400
+
+    results = [None] * len(items)
+    valid, positions = [], []
+    for i, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        client_id = str(item.get('client_id') or i)[:64]
+        token = _extract_scan_token(item.get('token') or '')
+        try:
+            member_id = int(item.get('member_id')) if not token else None
+        except (TypeError, ValueError):
+            member_id = None
+        if not token and member_id is None:
+            results[i] = {"client_id": client_id, "result": "invalid_item"}
+            continue
+        valid.append((token or None, member_id, _parse_scanned_at(item.get('scanned_at'))))
+        positions.append((i, client_id))
+
+    scanner_admin_id = session.get('username') or ADMIN_USERNAME or "admin"
+    try:
+        rows = db.checkin_batch(valid, scanner_admin_id)
+    except Exception as e:
+        return jsonify({"status": "error", "code": "server_error", "message": f"Sync failed: {e}"}), 500
+
+    for (i, client_id), row in zip(positions, rows):
+        result = {"client_id": client_id, "result": row['result']}
+        if row['member_id'] is not None:
+            result["member"] = {
+                "id": row['member_id'],
+                "name": f"{row['first_name']} {row['last_name']}".strip(),
+            }
+        if row['checked_in_at']:
+            result["checked_in_at"] = _format_checkin_time(row['checked_in_at'])
+        results[i] = result
+    return jsonify({"status": "ok", "results": results})
+
+
+@route('/api/checkins/offline.json')
+def api_checkins_offline():
+    """The door snapshot (db.get_door_snapshot) an offline scanner keeps in
+    IndexedDB: current match, pass token hashes -> member id, and who's
+    already in. Names come from /api/members/roster.json, as before."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+    snapshot = db.get_door_snapshot()
+    snapshot["status"] = "ok"
+    snapshot["generated_at"] = datetime.now(timezone.utc).isoformat()
+    response = jsonify(snapshot)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@route('/scanner-sw.js')
+def scanner_service_worker():
+    """The scanner's service worker. Served from the site root rather than
+    /static/ because a worker can only control pages at or below its own
+    path, and it has to cover /scanner."""
+    response = send_file(os.path.join(current_app.static_folder, 'scanner-sw.js'), mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@route('/api/checkins/manual', methods=['POST'])
+def api_checkins_manual():
+    """Check in a member found via the roster-search fallback, bypassing
+    the wallet token entirely — the admin has already identified who this
+    is by name, so there's no QR/token to look up. Same idempotency and
+    response shape as /api/checkins/scan, but source='manual' so the two
+    paths stay distinguishable in exports later."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+
+    payload = request.get_json(silent=True) or {}
+    try:
+        member_id = int(payload.get('member_id'))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "code": "missing_member_id", "message": "No member selected."}), 400
+
+    scanner_admin_id = session.get('username') or ADMIN_USERNAME or "admin"
+    try:
+        row = db.checkin_member(member_id, scanner_admin_id)
+        return _checkin_response(row, "not_in_current_season", "That member isn't in the current season.")
+    except Exception as e:
+        return jsonify({"status": "error", "code": "server_error", "message": f"Manual check-in failed: {e}"}), 500
+
+
+@route('/api/members/roster.json')
+def api_members_roster():
+    """Name + ID only for the current season, for the scanner's client-side
+    search fallback. Deliberately excludes email/phone — if this ends up on
+    a lost/borrowed phone, it should only ever leak names, not contact info.
+    """
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+
+    season = db.get_current_season()
+    if not season:
+        return jsonify([])
+
+    rows = db.get_season_roster_names(season['id'])
+    return jsonify([{"id": r['id'], "name": f"{r['first_name']} {r['last_name']}".strip()} for r in rows])
+
+
+@route('/api/members/roster-sync.json')
+def api_members_roster_sync():
+    """The scanner's copy of the roster, kept in sync by version instead of
+    re-downloaded: same names-and-IDs-only rule as /api/members/roster.json,
+    but columnar (`ids`/`names` side by side), with the roster version as
+    the ETag -- an If-None-Match that's still current gets a bare 304 --
+    and `?since=<version>` returning only who joined, left (`removed`) or
+    was renamed after that. A phone that synced before doors opened pulls
+    a handful of names, not the whole season. See db.get_roster_sync."""
+    if not require_scanner_access():
+        return jsonify({"status": "error", "code": "unauthorized", "message": "Login required."}), 401
+
+    season = db.get_current_season()
+    if not season:
+        return jsonify({"status": "ok", "version": None, "full": True, "ids": [], "names": [], "removed": []})
+
+    version = db.get_roster_version(season['id'])
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        sync = db.get_roster_sync(season['id'], since=request.args.get('since'))
+        response = jsonify({"status": "ok", **sync})
+        version = sync['version']
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -206,3 +206,781 @@ CREATE TABLE IF NOT EXISTS checkins (
     notes TEXT,
     UNIQUE (member_id, match_id)             -- one check-in per member per match
 );
+
+-- Cross-worker invalidation for db.py's cached current season / current
+-- match: a change touching the current row of either table NOTIFYs every
+-- worker's listener once the transaction commits (NOTIFYs within one
+-- transaction are collapsed, so a set-current's two UPDATEs still only
+-- send one). Statement-level, but only for statements whose rows were or
+-- became current -- the nightly result/fixture sync updating other
+-- matches would otherwise drop every worker's cached context, and with
+-- it the door index, in the middle of a door rush. (Transition tables
+-- can't be shared between events, hence one trigger per event.)
+CREATE OR REPLACE FUNCTION notify_current_context() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows WHERE is_current) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows WHERE is_current) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF NOT EXISTS (SELECT 1 FROM old_rows WHERE is_current)
+      AND NOT EXISTS (SELECT 1 FROM new_rows WHERE is_current) THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('olsc_current_context', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS seasons_notify_current_context ON seasons;
+DROP TRIGGER IF EXISTS seasons_notify_current_context_insert ON seasons;
+CREATE TRIGGER seasons_notify_current_context_insert
+    AFTER INSERT ON seasons REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+DROP TRIGGER IF EXISTS seasons_notify_current_context_update ON seasons;
+CREATE TRIGGER seasons_notify_current_context_update
+    AFTER UPDATE ON seasons REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+DROP TRIGGER IF EXISTS seasons_notify_current_context_delete ON seasons;
+CREATE TRIGGER seasons_notify_current_context_delete
+    AFTER DELETE ON seasons REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+
+DROP TRIGGER IF EXISTS matches_notify_current_context ON matches;
+DROP TRIGGER IF EXISTS matches_notify_current_context_insert ON matches;
+CREATE TRIGGER matches_notify_current_context_insert
+    AFTER INSERT ON matches REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+DROP TRIGGER IF EXISTS matches_notify_current_context_update ON matches;
+CREATE TRIGGER matches_notify_current_context_update
+    AFTER UPDATE ON matches REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+DROP TRIGGER IF EXISTS matches_notify_current_context_delete ON matches;
+CREATE TRIGGER matches_notify_current_context_delete
+    AFTER DELETE ON matches REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_current_context();
+
+-- Secondary indexes for the hot read paths in db.py / app.py. Each one
+-- names the query it exists for; tests/test_query_plans.py EXPLAINs those
+-- queries against a seeded 50k-member DB and fails if one of them falls
+-- back to a sequential scan. The UNIQUE constraints above already give us
+-- (member_id, ...) lookups on checkins, member_seasons, and wallet_passes
+-- -- these cover the columns those constraints *don't* lead with.
+
+-- count_checkins_for_match, the match check-in export, the leaderboard.
+CREATE INDEX IF NOT EXISTS checkins_match_id ON checkins (match_id);
+
+-- Every "roster for this season" query (admin_members, roster.json,
+-- exports, recover_pass) filters member_seasons on season_id alone.
+CREATE INDEX IF NOT EXISTS member_seasons_season_member
+    ON member_seasons (season_id, member_id);
+
+-- admin_matches' season listing (ORDER BY kickoff_at).
+CREATE INDEX IF NOT EXISTS matches_season_kickoff
+    ON matches (season_id, kickoff_at);
+
+-- get_matches_missing_result: only ever interested in matches with no
+-- result yet, which is a handful out of every season's fixtures.
+CREATE INDEX IF NOT EXISTS matches_missing_result
+    ON matches (kickoff_at)
+    WHERE result IS NULL;
+
+-- Active (non-revoked) passes only: the roster's has_active_pass EXISTS,
+-- get_members_without_wallet_pass's anti-join, and anything else asking
+-- "does this member have a live pass this season". Revoked rows from
+-- rotations and past seasons never bloat it.
+CREATE INDEX IF NOT EXISTS wallet_passes_active_season_member
+    ON wallet_passes (season_id, member_id, platform)
+    WHERE revoked_at IS NULL;
+
+-- get_apple_passes_issued_before (pass remediation).
+CREATE INDEX IF NOT EXISTS wallet_passes_active_apple_created
+    ON wallet_passes (created_at)
+    WHERE platform = 'apple' AND revoked_at IS NULL;
+
+-- all_google_wallet_objects (match-week Google Wallet PATCH job).
+CREATE INDEX IF NOT EXISTS wallet_passes_active_google_object
+    ON wallet_passes (season_id)
+    WHERE google_object_id IS NOT NULL AND revoked_at IS NULL;
+
+-- all_pass_device_push_tokens' join, plus the ON DELETE CASCADE from
+-- wallet_passes (the UNIQUE above leads with device_library_identifier).
+CREATE INDEX IF NOT EXISTS pass_devices_wallet_pass_id
+    ON pass_devices (wallet_pass_id);
+
+-- Live headcount per match, kept in step with checkins by trigger so the
+-- door phones' and admin screens' constant headcount polls are a
+-- primary-key read instead of a COUNT(*) over checkins every time.
+CREATE TABLE IF NOT EXISTS match_checkin_counts (
+    match_id INTEGER PRIMARY KEY REFERENCES matches(id) ON DELETE CASCADE,
+    checkin_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Optional fire-marshal limit for a match (NULL = no limit), enforced by
+-- the same trigger: the counter row's lock serializes concurrent scans,
+-- so two doors can never both let in the last person.
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS capacity INTEGER;
+
+CREATE OR REPLACE FUNCTION maintain_match_checkin_count() RETURNS trigger AS $$
+DECLARE
+    new_count INTEGER;
+    match_capacity INTEGER;
+BEGIN
+    -- db.archive_season moving a closed season's rows out to
+    -- checkins_archive isn't anyone un-checking-in: its counts stay.
+    IF current_setting('olsc.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE match_checkin_counts
+        SET checkin_count = checkin_count - 1
+        WHERE match_id = OLD.match_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO match_checkin_counts (match_id, checkin_count)
+        VALUES (NEW.match_id, 1)
+        ON CONFLICT (match_id) DO UPDATE
+            SET checkin_count = match_checkin_counts.checkin_count + 1
+        RETURNING checkin_count INTO new_count;
+
+        SELECT capacity INTO match_capacity FROM matches WHERE id = NEW.match_id;
+        IF match_capacity IS NOT NULL AND new_count > match_capacity THEN
+            -- Caught by db._checkin (CHECKIN_CAPACITY_SQLSTATE), which
+            -- reports 'at_capacity' instead of an error.
+            RAISE EXCEPTION 'match % is at capacity (%)', NEW.match_id, match_capacity
+                USING ERRCODE = 'OL001';
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS checkins_maintain_match_count ON checkins;
+CREATE TRIGGER checkins_maintain_match_count
+    AFTER INSERT OR DELETE OR UPDATE OF match_id ON checkins
+    FOR EACH ROW EXECUTE FUNCTION maintain_match_checkin_count();
+
+-- Backfill / repair: recount from checkins. Runs on every init, which is
+-- also the fix if the counters are ever suspected of drifting -- but the
+-- recount isn't locked against live scans, so don't re-run init mid-match.
+-- (Matches of archived seasons have no rows left in checkins, so their
+-- counters are left exactly as they were.)
+INSERT INTO match_checkin_counts (match_id, checkin_count)
+SELECT match_id, COUNT(*) FROM checkins GROUP BY match_id
+ON CONFLICT (match_id) DO UPDATE SET checkin_count = EXCLUDED.checkin_count;
+
+-- Cold storage for closed seasons. checkins and wallet_passes otherwise
+-- keep every season forever, and the door scan, the push fan-out, and the
+-- leaderboard all work against the hot tables. `python3 db.py
+-- archive-season <name>` (db.archive_season) moves a non-current season's
+-- check-ins and passes here in one transaction; the *_all views read hot
+-- and archived rows together for historic exports and analytics.
+--
+-- Not declarative partitioning: a partitioned checkins would need the
+-- partition key (the match's season) in every unique constraint, i.e. a
+-- season_id column the check-in path would have to fill in, and turning
+-- the existing table into a partitioned one means a rewrite this
+-- re-runnable file can't do safely. Same effect for the hot paths.
+ALTER TABLE seasons ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS checkins_archive (
+    id INTEGER PRIMARY KEY,                  -- the id it had in checkins
+    season_id INTEGER NOT NULL REFERENCES seasons(id) ON DELETE CASCADE,
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+    checked_in_at TIMESTAMPTZ NOT NULL,
+    scanner_admin_id TEXT,
+    source TEXT NOT NULL,
+    notes TEXT,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (member_id, match_id)
+);
+CREATE INDEX IF NOT EXISTS checkins_archive_match_id ON checkins_archive (match_id);
+CREATE INDEX IF NOT EXISTS checkins_archive_season_id ON checkins_archive (season_id);
+
+-- Archived passes are always revoked (archiving revokes any still live),
+-- and their pass_devices rows go with them -- the PassKit web service
+-- already ignores revoked passes, so nothing is lost.
+CREATE TABLE IF NOT EXISTS wallet_passes_archive (
+    id INTEGER PRIMARY KEY,                  -- the id it had in wallet_passes
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    season_id INTEGER NOT NULL REFERENCES seasons(id) ON DELETE CASCADE,
+    token_hash TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    revoked_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    auth_token TEXT,
+    token_encrypted TEXT,
+    google_object_id TEXT,
+    google_class_id TEXT,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS wallet_passes_archive_season_member
+    ON wallet_passes_archive (season_id, member_id);
+
+CREATE OR REPLACE VIEW checkins_all AS
+    SELECT id, member_id, match_id, checked_in_at, scanner_admin_id, source, notes,
+           FALSE AS archived
+    FROM checkins
+    UNION ALL
+    SELECT id, member_id, match_id, checked_in_at, scanner_admin_id, source, notes,
+           TRUE AS archived
+    FROM checkins_archive;
+
+CREATE OR REPLACE VIEW wallet_passes_all AS
+    SELECT id, member_id, season_id, token_hash, serial_number, platform, revoked_at,
+           created_at, google_object_id, google_class_id, FALSE AS archived
+    FROM wallet_passes
+    UNION ALL
+    SELECT id, member_id, season_id, token_hash, serial_number, platform, revoked_at,
+           created_at, google_object_id, google_class_id, TRUE AS archived
+    FROM wallet_passes_archive;
+
+-- Per-member, per-season leaderboard stats, maintained by triggers so
+-- /admin/leaderboard is a read of one row per member instead of a
+-- members x member_seasons x checkins x matches aggregate on every view.
+--
+-- Streaks count consecutive *scanned* matches (ones that have any
+-- check-ins at all): we don't run the scanner every match, and a match
+-- nobody was scanned at shouldn't break anyone's streak. current_streak is
+-- the run ending at last_match_id; db.get_leaderboard only shows it as
+-- current while last_match_id is still the season's latest scanned match.
+--
+-- A door scan (a check-in for the season's latest scanned match) bumps
+-- the member's row in place -- points, matches, streak -- with a couple of
+-- indexed lookups; anything rarer (an undo, a late check-in for an older
+-- match) recomputes that one member's row. A result landing shifts points
+-- for the match's attendees, and a match becoming scanned or unscanned
+-- out of order, or moving, recomputes the season's streaks. Repair /
+-- backfill: `python3 db.py rebuild-stats [season]`
+-- (rebuild_member_season_stats).
+CREATE TABLE IF NOT EXISTS member_season_stats (
+    member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    season_id INTEGER NOT NULL REFERENCES seasons(id) ON DELETE CASCADE,
+    points INTEGER NOT NULL DEFAULT 0,
+    matches_attended INTEGER NOT NULL DEFAULT 0,
+    last_checkin_at TIMESTAMPTZ,
+    last_match_id INTEGER,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (member_id, season_id)
+);
+
+-- db.get_leaderboard's ranked half reads the season's rows in this order.
+CREATE INDEX IF NOT EXISTS member_season_stats_leaderboard
+    ON member_season_stats (season_id, points DESC, matches_attended DESC);
+
+-- The one place the points scale lives: 3 for a win, 1 for a draw, 0 for
+-- a loss or a result not known yet.
+CREATE OR REPLACE FUNCTION match_result_points(result TEXT) RETURNS INTEGER AS $$
+    SELECT CASE result WHEN 'win' THEN 3 WHEN 'draw' THEN 1 ELSE 0 END
+$$ LANGUAGE sql IMMUTABLE;
+
+-- One member's stats for one season, from scratch. Reads checkins_all so
+-- archived seasons can be rebuilt too.
+CREATE OR REPLACE FUNCTION compute_member_season_stats(p_season_id INTEGER, p_member_id INTEGER)
+RETURNS TABLE (
+    member_id INTEGER, season_id INTEGER, points INTEGER, matches_attended INTEGER,
+    last_checkin_at TIMESTAMPTZ, last_match_id INTEGER, current_streak INTEGER, longest_streak INTEGER
+) AS $$
+    WITH scanned AS (
+        SELECT mt.id, mt.result,
+               row_number() OVER (ORDER BY mt.kickoff_at, mt.id) AS seq
+        FROM matches mt
+        JOIN match_checkin_counts mcc ON mcc.match_id = mt.id AND mcc.checkin_count > 0
+        WHERE mt.season_id = p_season_id
+    ),
+    attended AS (
+        SELECT s.id AS match_id, s.result, s.seq, c.checked_in_at,
+               s.seq - row_number() OVER (ORDER BY s.seq) AS run
+        FROM checkins_all c
+        JOIN scanned s ON s.id = c.match_id
+        WHERE c.member_id = p_member_id
+    ),
+    runs AS (
+        SELECT count(*)::int AS len, max(seq) AS last_seq FROM attended GROUP BY run
+    )
+    SELECT p_member_id, p_season_id,
+           sum(match_result_points(a.result))::int,
+           count(*)::int,
+           max(a.checked_in_at),
+           (array_agg(a.match_id ORDER BY a.seq DESC))[1],
+           (SELECT r.len FROM runs r ORDER BY r.last_seq DESC LIMIT 1),
+           (SELECT max(r.len) FROM runs r)
+    FROM attended a
+    HAVING count(*) > 0
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_member_season_stats(p_member_id INTEGER, p_season_id INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO member_season_stats
+        (member_id, season_id, points, matches_attended, last_checkin_at,
+         last_match_id, current_streak, longest_streak)
+    SELECT * FROM compute_member_season_stats(p_season_id, p_member_id)
+    ON CONFLICT (member_id, season_id) DO UPDATE SET
+        points = EXCLUDED.points,
+        matches_attended = EXCLUDED.matches_attended,
+        last_checkin_at = EXCLUDED.last_checkin_at,
+        last_match_id = EXCLUDED.last_match_id,
+        current_streak = EXCLUDED.current_streak,
+        longest_streak = EXCLUDED.longest_streak,
+        updated_at = now();
+    IF NOT FOUND THEN
+        DELETE FROM member_season_stats WHERE member_id = p_member_id AND season_id = p_season_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fires after checkins_maintain_match_count (same event, and triggers run
+-- in name order), so a match's first check-in already counts as scanned.
+--
+-- The door's case -- a new check-in for the season's latest scanned match
+-- -- runs under that match's match_checkin_counts row lock, so it's kept
+-- to an increment: the streak carries on if the member's last match was
+-- the scanned match just before this one, and restarts at 1 otherwise.
+-- Everything else falls back to recomputing the member's row.
+CREATE OR REPLACE FUNCTION maintain_member_season_stats() RETURNS trigger AS $$
+DECLARE
+    match_row RECORD;
+    prev_match_id INTEGER;
+BEGIN
+    -- Archiving moves rows to checkins_archive; the stats don't change.
+    IF current_setting('olsc.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT id, season_id, kickoff_at, result INTO match_row FROM matches WHERE id = NEW.match_id;
+        IF NOT EXISTS (
+            SELECT 1 FROM matches mt
+            JOIN match_checkin_counts mcc ON mcc.match_id = mt.id AND mcc.checkin_count > 0
+            WHERE mt.season_id = match_row.season_id
+              AND (mt.kickoff_at, mt.id) > (match_row.kickoff_at, match_row.id)
+        ) THEN
+            SELECT mt.id INTO prev_match_id
+            FROM matches mt
+            JOIN match_checkin_counts mcc ON mcc.match_id = mt.id AND mcc.checkin_count > 0
+            WHERE mt.season_id = match_row.season_id
+              AND (mt.kickoff_at, mt.id) < (match_row.kickoff_at, match_row.id)
+            ORDER BY mt.kickoff_at DESC, mt.id DESC
+            LIMIT 1;
+
+            INSERT INTO member_season_stats AS mss
+                (member_id, season_id, points, matches_attended, last_checkin_at,
+                 last_match_id, current_streak, longest_streak)
+            VALUES (NEW.member_id, match_row.season_id, match_result_points(match_row.result), 1,
+                    NEW.checked_in_at, NEW.match_id, 1, 1)
+            ON CONFLICT (member_id, season_id) DO UPDATE SET
+                points = mss.points + EXCLUDED.points,
+                matches_attended = mss.matches_attended + 1,
+                last_checkin_at = greatest(mss.last_checkin_at, EXCLUDED.last_checkin_at),
+                last_match_id = EXCLUDED.last_match_id,
+                current_streak = CASE WHEN mss.last_match_id = prev_match_id
+                                      THEN mss.current_streak + 1 ELSE 1 END,
+                longest_streak = greatest(mss.longest_streak,
+                                          CASE WHEN mss.last_match_id = prev_match_id
+                                               THEN mss.current_streak + 1 ELSE 1 END),
+                updated_at = now();
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refresh_member_season_stats(
+            OLD.member_id, (SELECT season_id FROM matches WHERE id = OLD.match_id));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_member_season_stats(
+            NEW.member_id, (SELECT season_id FROM matches WHERE id = NEW.match_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS checkins_maintain_member_season_stats ON checkins;
+CREATE TRIGGER checkins_maintain_member_season_stats
+    AFTER INSERT OR DELETE OR UPDATE OF member_id, match_id ON checkins
+    FOR EACH ROW EXECUTE FUNCTION maintain_member_season_stats();
+
+-- A result landing (or being corrected) moves only that match's
+-- attendees' points -- no recompute. Streaks don't depend on the result;
+-- the match changes that do move them (scanned status, kickoff, season)
+-- have their own triggers below.
+CREATE OR REPLACE FUNCTION apply_match_result_to_stats() RETURNS trigger AS $$
+BEGIN
+    UPDATE member_season_stats mss
+    SET points = mss.points - match_result_points(OLD.result) + match_result_points(NEW.result),
+        updated_at = now()
+    FROM checkins_all c
+    WHERE c.match_id = NEW.id
+      AND mss.member_id = c.member_id
+      AND mss.season_id = NEW.season_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS matches_apply_result_to_stats ON matches;
+CREATE TRIGGER matches_apply_result_to_stats
+    AFTER UPDATE OF result ON matches
+    FOR EACH ROW WHEN (OLD.result IS DISTINCT FROM NEW.result)
+    EXECUTE FUNCTION apply_match_result_to_stats();
+
+-- Every stored streak of a season, recomputed. Streaks count scanned
+-- matches, so a match turning scanned (or unscanned) anywhere but at the
+-- end of the season shifts the runs of members who never touched it.
+-- Points, matches and last_match_id don't move -- only the streaks.
+CREATE OR REPLACE FUNCTION refresh_season_streaks(p_season_id INTEGER)
+RETURNS void AS $$
+    WITH fresh AS (
+        SELECT f.member_id, f.current_streak, f.longest_streak
+        FROM member_season_stats s,
+        LATERAL compute_member_season_stats(s.season_id, s.member_id) f
+        WHERE s.season_id = p_season_id
+    )
+    UPDATE member_season_stats mss
+    SET current_streak = fresh.current_streak,
+        longest_streak = fresh.longest_streak,
+        updated_at = now()
+    FROM fresh
+    WHERE mss.season_id = p_season_id
+      AND mss.member_id = fresh.member_id
+      AND (mss.current_streak, mss.longest_streak)
+          IS DISTINCT FROM (fresh.current_streak, fresh.longest_streak)
+$$ LANGUAGE sql;
+
+-- A match's scanned status is its check-in count crossing zero. At the end
+-- of the season -- the door's normal first scan -- nobody's stored streak
+-- changes (get_leaderboard already treats a streak that stops short of
+-- the latest scanned match as broken), so only an out-of-order change
+-- pays for the season recompute.
+CREATE OR REPLACE FUNCTION refresh_streaks_on_scanned_change() RETURNS trigger AS $$
+DECLARE
+    match_row RECORD;
+BEGIN
+    SELECT id, season_id, kickoff_at INTO match_row FROM matches WHERE id = NEW.match_id;
+    IF EXISTS (
+        SELECT 1 FROM matches mt
+        JOIN match_checkin_counts mcc ON mcc.match_id = mt.id AND mcc.checkin_count > 0
+        WHERE mt.season_id = match_row.season_id
+          AND (mt.kickoff_at, mt.id) > (match_row.kickoff_at, match_row.id)
+    ) THEN
+        PERFORM refresh_season_streaks(match_row.season_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS match_checkin_counts_first_scan_streaks ON match_checkin_counts;
+CREATE TRIGGER match_checkin_counts_first_scan_streaks
+    AFTER INSERT ON match_checkin_counts
+    FOR EACH ROW WHEN (NEW.checkin_count > 0)
+    EXECUTE FUNCTION refresh_streaks_on_scanned_change();
+
+DROP TRIGGER IF EXISTS match_checkin_counts_scanned_streaks ON match_checkin_counts;
+CREATE TRIGGER match_checkin_counts_scanned_streaks
+    AFTER UPDATE OF checkin_count ON match_checkin_counts
+    FOR EACH ROW WHEN ((OLD.checkin_count > 0) IS DISTINCT FROM (NEW.checkin_count > 0))
+    EXECUTE FUNCTION refresh_streaks_on_scanned_change();
+
+-- A scanned match moving (kickoff corrected, or filed under another
+-- season) reorders the scanned sequence itself, which can change
+-- everyone's last_match_id as well as their streaks: rebuild the affected
+-- season(s). Unscanned fixtures -- the nightly sync moving kickoffs around
+-- -- are skipped.
+CREATE OR REPLACE FUNCTION rebuild_stats_on_match_move() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM match_checkin_counts WHERE match_id = NEW.id AND checkin_count > 0) THEN
+        PERFORM rebuild_member_season_stats(OLD.season_id);
+        IF NEW.season_id <> OLD.season_id THEN
+            PERFORM rebuild_member_season_stats(NEW.season_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Full recompute, for one season or all of them. Not locked against live
+-- scans, same caveat as the check-in count recount above.
+CREATE OR REPLACE FUNCTION rebuild_member_season_stats(p_season_id INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    DELETE FROM member_season_stats
+    WHERE p_season_id IS NULL OR season_id = p_season_id;
+
+    INSERT INTO member_season_stats
+        (member_id, season_id, points, matches_attended, last_checkin_at,
+         last_match_id, current_streak, longest_streak)
+    SELECT f.*
+    FROM (
+        SELECT DISTINCT c.member_id, mt.season_id
+        FROM checkins_all c
+        JOIN matches mt ON mt.id = c.match_id
+        WHERE p_season_id IS NULL OR mt.season_id = p_season_id
+    ) pairs,
+    LATERAL compute_member_season_stats(pairs.season_id, pairs.member_id) f;
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS matches_rebuild_stats_on_move ON matches;
+CREATE TRIGGER matches_rebuild_stats_on_move
+    AFTER UPDATE OF kickoff_at, season_id ON matches
+    FOR EACH ROW WHEN (OLD.kickoff_at IS DISTINCT FROM NEW.kickoff_at
+                       OR OLD.season_id IS DISTINCT FROM NEW.season_id)
+    EXECUTE FUNCTION rebuild_stats_on_match_move();
+
+-- First deploy: backfill from existing check-ins. (Only when empty -- after
+-- that the triggers keep it current, and rebuild-stats is the repair.)
+SELECT rebuild_member_season_stats()
+WHERE NOT EXISTS (SELECT 1 FROM member_season_stats);
+
+-- Server-side roster search (db.search_season_roster). One immutable
+-- expression for "everything you can search a member by", so the index
+-- below and the query that uses it can't drift apart. Trigram matching
+-- makes it typo-tolerant ("Mcdonald" finds "MacDonald") as well as a fast
+-- substring match, both off the same GIN index.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION member_search_text(first_name TEXT, last_name TEXT, email TEXT, phone TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(first_name || ' ' || last_name || ' ' || email || ' ' || COALESCE(phone, ''))
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS members_search_trgm
+    ON members USING gin (member_search_text(first_name, last_name, email, phone) gin_trgm_ops);
+
+-- Keyset pages of the roster in name order (the default sort).
+CREATE INDEX IF NOT EXISTS members_name_order
+    ON members (lower(last_name), lower(first_name), id);
+
+-- Cross-worker freshness for db.py's in-process door index (_DoorIndex:
+-- current-season token hash -> member, plus who's already in). A new
+-- check-in tells every worker exactly who just came in, so they can mark
+-- that member without reloading. A handful of passes issued, rotated or
+-- revoked (a signup or a resend at the door mid-rush) likewise goes out
+-- as the exact tokens to drop and add, see notify_door_index_passes.
+-- Anything else that could change a scan's answer -- a member renamed, a
+-- check-in deleted, a bulk pass run -- just says "reload".
+CREATE OR REPLACE FUNCTION notify_door_index_reload() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('olsc_door_index', 'reload');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_door_index_checkin() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'olsc_door_index',
+        'checkin:' || NEW.match_id || ':' || NEW.member_id || ':' || extract(epoch FROM NEW.checked_in_at)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- {"drop": [token_hash, ...], "add": [[token_hash, member_id, season_id,
+-- first_name, last_name, email], ...]} for the passes a statement changed
+-- in a way a scan would notice (only token_hash, revoked_at, member_id
+-- and season_id count -- recording a Google Wallet object id doesn't);
+-- past 25 of them, or a payload too big for NOTIFY, plain "reload".
+CREATE OR REPLACE FUNCTION notify_door_index_passes() RETURNS trigger AS $$
+DECLARE
+    dropped JSONB := '[]';
+    added JSONB := '[]';
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT COALESCE(jsonb_agg(jsonb_build_array(
+                   n.token_hash, n.member_id, n.season_id, m.first_name, m.last_name, m.email)), '[]')
+        INTO added
+        FROM new_rows n JOIN members m ON m.id = n.member_id
+        WHERE n.revoked_at IS NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT COALESCE(jsonb_agg(o.token_hash), '[]') INTO dropped FROM old_rows o;
+    ELSE
+        WITH moved AS (
+            SELECT o.token_hash AS old_hash, n.token_hash AS new_hash,
+                   n.revoked_at, n.member_id, n.season_id
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (o.token_hash, o.revoked_at, o.member_id, o.season_id)
+                  IS DISTINCT FROM (n.token_hash, n.revoked_at, n.member_id, n.season_id)
+        )
+        SELECT COALESCE((SELECT jsonb_agg(old_hash) FROM moved), '[]'),
+               COALESCE((SELECT jsonb_agg(jsonb_build_array(
+                             mv.new_hash, mv.member_id, mv.season_id, m.first_name, m.last_name, m.email))
+                         FROM moved mv JOIN members m ON m.id = mv.member_id
+                         WHERE mv.revoked_at IS NULL), '[]')
+        INTO dropped, added;
+    END IF;
+
+    IF jsonb_array_length(dropped) = 0 AND jsonb_array_length(added) = 0 THEN
+        RETURN NULL;
+    END IF;
+    payload := jsonb_build_object('drop', dropped, 'add', added)::text;
+    IF jsonb_array_length(dropped) + jsonb_array_length(added) > 25 OR octet_length(payload) > 7500 THEN
+        payload := 'reload';
+    END IF;
+    PERFORM pg_notify('olsc_door_index', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wallet_passes_notify_door_index ON wallet_passes;
+DROP TRIGGER IF EXISTS wallet_passes_notify_door_index_insert ON wallet_passes;
+CREATE TRIGGER wallet_passes_notify_door_index_insert
+    AFTER INSERT ON wallet_passes REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_index_passes();
+DROP TRIGGER IF EXISTS wallet_passes_notify_door_index_update ON wallet_passes;
+CREATE TRIGGER wallet_passes_notify_door_index_update
+    AFTER UPDATE ON wallet_passes REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_index_passes();
+DROP TRIGGER IF EXISTS wallet_passes_notify_door_index_delete ON wallet_passes;
+CREATE TRIGGER wallet_passes_notify_door_index_delete
+    AFTER DELETE ON wallet_passes REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_index_passes();
+
+DROP TRIGGER IF EXISTS members_notify_door_index ON members;
+CREATE TRIGGER members_notify_door_index
+    AFTER DELETE OR UPDATE OF first_name, last_name, email ON members
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_index_reload();
+
+DROP TRIGGER IF EXISTS checkins_notify_door_index ON checkins;
+CREATE TRIGGER checkins_notify_door_index
+    AFTER INSERT ON checkins
+    FOR EACH ROW EXECUTE FUNCTION notify_door_index_checkin();
+
+DROP TRIGGER IF EXISTS checkins_notify_door_index_delete ON checkins;
+CREATE TRIGGER checkins_notify_door_index_delete
+    AFTER DELETE ON checkins
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_index_reload();
+
+-- Live headcount (app.py's /api/checkins/stream): every check-in added or
+-- removed NOTIFYs the match's new count, and who it was, to each worker's
+-- listener, which pushes it straight out to connected door and admin
+-- screens -- no per-screen polling. Named to fire after
+-- checkins_maintain_match_count, so the count it reads already includes
+-- this row. Archiving moves rows, it doesn't change anyone's headcount.
+CREATE OR REPLACE FUNCTION notify_headcount() RETURNS trigger AS $$
+DECLARE
+    c checkins%ROWTYPE;
+BEGIN
+    IF current_setting('olsc.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        c := OLD;
+    ELSE
+        c := NEW;
+    END IF;
+    PERFORM pg_notify('olsc_headcount', json_build_object(
+        'event', lower(TG_OP),
+        'match_id', c.match_id,
+        'count', (SELECT checkin_count FROM match_checkin_counts WHERE match_id = c.match_id),
+        'member_id', c.member_id,
+        'name', (SELECT trim(first_name || ' ' || last_name) FROM members WHERE id = c.member_id),
+        'source', c.source,
+        'checked_in_at', c.checked_in_at
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS checkins_notify_headcount ON checkins;
+CREATE TRIGGER checkins_notify_headcount
+    AFTER INSERT OR DELETE ON checkins
+    FOR EACH ROW EXECUTE FUNCTION notify_headcount();
+
+-- Roster delta sync (app.py's /api/members/roster-sync.json): one row per
+-- member whose entry in a season's roster changed -- joined, left, or was
+-- renamed. A door phone that last synced at version N only needs the
+-- members with a change after N, looked up as they are *now* (still in the
+-- season -> current name, gone -> removed), so the log itself never needs
+-- to say what changed. member_id has no foreign key: a removal has to
+-- outlive the member it removes.
+--
+-- Versions must commit in order, or a phone could sync past a change that
+-- committed late under a smaller number and never see it. So writers take
+-- one transaction-scoped advisory lock before logging; it only serializes
+-- roster changes against each other, and only until they commit.
+-- Statement-level with transition tables, so a season rollover or a CSV
+-- import logs in one INSERT ... SELECT rather than a trigger per row.
+CREATE TABLE IF NOT EXISTS roster_changes (
+    version BIGSERIAL PRIMARY KEY,
+    season_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS roster_changes_season_version
+    ON roster_changes (season_id, version);
+
+CREATE OR REPLACE FUNCTION log_roster_changes() RETURNS trigger AS $$
+DECLARE
+    changed INTEGER[][];
+BEGIN
+    IF TG_TABLE_NAME = 'members' THEN
+        SELECT array_agg(ARRAY[ms.season_id, ms.member_id]) INTO changed
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        JOIN member_seasons ms ON ms.member_id = n.id
+        WHERE (o.first_name, o.last_name) IS DISTINCT FROM (n.first_name, n.last_name);
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(ARRAY[season_id, member_id]) INTO changed FROM new_rows;
+    ELSE
+        SELECT array_agg(ARRAY[season_id, member_id]) INTO changed FROM old_rows;
+    END IF;
+    -- Most member updates (a phone number, an import re-saving the same
+    -- name) change nothing here; don't take the lock for those.
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('olsc_roster_changes'));
+    INSERT INTO roster_changes (season_id, member_id)
+    SELECT changed[i][1], changed[i][2]
+    FROM generate_subscripts(changed, 1) AS i;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS member_seasons_log_roster_insert ON member_seasons;
+CREATE TRIGGER member_seasons_log_roster_insert
+    AFTER INSERT ON member_seasons
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_roster_changes();
+
+DROP TRIGGER IF EXISTS member_seasons_log_roster_delete ON member_seasons;
+CREATE TRIGGER member_seasons_log_roster_delete
+    AFTER DELETE ON member_seasons
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_roster_changes();
+
+DROP TRIGGER IF EXISTS members_log_roster_rename ON members;
+CREATE TRIGGER members_log_roster_rename
+    AFTER UPDATE ON members
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_roster_changes();
+
+-- Cross-worker invalidation for db.py's cached door-pass checks
+-- (_DoorPassCache): a pass revoked, re-dated or deleted -- or all of them
+-- revoked by a season rollover -- must stop working on every worker at
+-- once, not when a cache entry happens to expire.
+CREATE OR REPLACE FUNCTION notify_door_passes() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('olsc_door_passes', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS door_passes_notify ON door_passes;
+CREATE TRIGGER door_passes_notify
+    AFTER DELETE OR UPDATE ON door_passes
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_door_passes();
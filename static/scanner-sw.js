@@ -0,0 +1,56 @@
+// Service worker for the door scanner (/scanner), served at /scanner-sw.js.
+//
+// Keeps the scanner usable when the pub's wifi or cell signal drops: the
+// page itself, the QR library, and the door snapshot it decides from are
+// network-first, falling back to the last good copy. Check-ins and the
+// roster are never touched here -- the page keeps those in IndexedDB
+// itself (queued check-ins flush to /api/checkins/batch once it's back
+// online; the roster delta-syncs from /api/members/roster-sync.json).
+
+const CACHE = 'olsc-scanner-v2';
+const CACHED_PATHS = ['/scanner', '/api/checkins/offline.json'];
+const QR_LIBRARY = 'https://unpkg.com/html5-qrcode';
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(cache => cache.add(QR_LIBRARY))
+            .catch(() => {})  // Offline at install: it gets cached on first use instead.
+    );
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key.startsWith('olsc-scanner-') && key !== CACHE).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+function shouldCache(request) {
+    if (request.method !== 'GET') return false;
+    if (request.url.startsWith(QR_LIBRARY)) return true;
+    const url = new URL(request.url);
+    return url.origin === self.location.origin && CACHED_PATHS.includes(url.pathname);
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (!shouldCache(request)) return;
+    event.respondWith(
+        fetch(request)
+            .then(response => {
+                // A redirect here is the login page (session expired) -- never
+                // cache that in place of the scanner.
+                if (response.ok && !response.redirected) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(cache => cache.put(request, copy));
+                }
+                return response;
+            })
+            .catch(() => caches.match(request, { ignoreSearch: true }).then(hit => hit || Response.error()))
+    );
+});
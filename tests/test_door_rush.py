@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Door-rush smoke run: a small loadtest_door_rush.py run against the
+in-process scanner app, so the harness itself can't rot and a door path
+that starts failing (or crawling) under concurrent scans shows up here.
+
+Every request in the mix has to come back as expected -- first scans
+checked in, duplicates "already", bogus tokens 404 -- and the scan p95
+has to stay under DOOR_SCAN_BUDGET_MS.
+
+Needs TEST_DATABASE_URL pointing at a scratch database:
+
+    TEST_DATABASE_URL=postgresql://localhost/olsc_test python -m pytest -s tests/test_door_rush.py
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("psycopg")
+pytest.importorskip("flask")
+
+import loadtest_door_rush as rush  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_NAME = "olsc_door_rush_test"
+DOOR_SCAN_BUDGET_MS = float(os.getenv("DOOR_SCAN_BUDGET_MS", "250"))
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (needs a scratch local Postgres)"
+)
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    member_ids, door_token = rush.seed(TEST_DATABASE_URL, SCHEMA_NAME, 500)
+    app = rush.in_process_app(rush.schema_dsn(TEST_DATABASE_URL, SCHEMA_NAME))
+    yield app, member_ids, door_token
+    import db
+
+    db.end_session(commit=False)
+    if db._pool is not None:
+        db._pool.close_all()
+    db._pool = None
+    rush.drop_schema(TEST_DATABASE_URL, SCHEMA_NAME)
+
+
+def test_door_rush_mix_is_answered_correctly_and_fast(seeded):
+    app, member_ids, door_token = seeded
+    samples, wall_seconds = rush.run(
+        lambda: rush._InProcessDevice(app), door_token, member_ids,
+        devices=8, requests_total=1000, duration=None, mix=rush.parse_mix(rush.DEFAULT_MIX), seed=7,
+    )
+    summary = rush.summarize(samples, wall_seconds)
+
+    print(
+        f"\ndoor rush: {summary['requests']} requests, {summary['throughput_rps']:.0f} req/s, "
+        f"p50 {summary['latency_ms']['p50']:.1f}ms p95 {summary['latency_ms']['p95']:.1f}ms "
+        f"p99 {summary['latency_ms']['p99']:.1f}ms"
+    )
+    assert summary["requests"] == 1000
+    assert set(summary["by_kind"]) == set(rush.KINDS)
+    assert summary["error_rate"] == 0, summary["failed_statuses"]
+    assert summary["unexpected_rate"] == 0, summary["by_kind"]
+    assert summary["latency_ms"]["p95"] < DOOR_SCAN_BUDGET_MS, (
+        f"door scan p95 {summary['latency_ms']['p95']:.1f}ms over budget ({DOOR_SCAN_BUDGET_MS:.0f}ms)"
+    )
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression tests for db.py.
+
+Seeds a throwaway schema in a LOCAL Postgres with a 50k-member club (three
+seasons of members, passes, devices, and check-ins), then runs EXPLAIN on
+the exact SQL every db.py helper sends, and fails if a lookup that should
+be index-driven has regressed to a sequential scan on one of the big
+tables. The SQL is captured by running the real db.* functions against a
+recording cursor, so a query edited in db.py is tested as edited -- no
+copy of it lives here to drift.
+
+Needs TEST_DATABASE_URL pointing at a scratch database (never production:
+everything is created in, and then dropped with, its own schema):
+
+    TEST_DATABASE_URL=postgresql://localhost/olsc_test python -m pytest tests/test_query_plans.py
+"""
+
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+from psycopg.rows import dict_row  # noqa: E402
+
+import db  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_NAME = "olsc_plan_test"
+MEMBERS = int(os.getenv("TEST_PLAN_MEMBERS", "50000"))
+MATCHES_PER_SEASON = 20
+
+# Only scans of these count as regressions -- seasons, matches,
+# match_overrides, door_passes etc. stay tiny forever, and the planner is
+# right to seq-scan a 60-row table.
+BIG_TABLES = {
+    "members", "member_seasons", "member_season_stats", "wallet_passes", "pass_devices", "checkins",
+}
+
+# Queries that legitimately read a whole season (or everything), where a
+# sequential scan of these tables IS the right plan. Each needs a reason.
+EXPECTED_FULL_SCANS = {
+    # The ranked half walks member_season_stats' leaderboard index, but
+    # the zero-check-in tail lists the whole season's roster and anti-joins
+    # it against the stats rows. Never scans check-ins.
+    "get_leaderboard": {"members", "member_seasons", "member_season_stats"},
+    # Fans out to every registered device of every live pass.
+    "all_pass_device_push_tokens": {"pass_devices", "wallet_passes"},
+    # The whole season's roster, each member joined to their stats row and
+    # live pass (hash joins over the season are the right plan here).
+    "get_season_roster": {"members", "member_seasons", "member_season_stats", "wallet_passes"},
+    # The scanner's search fallback downloads every name in the season.
+    "get_season_roster_names": {"members", "member_seasons"},
+    # The door index loads every live pass of the season (and its member)
+    # in one go, by design.
+    "_load_door_index": {"members", "wallet_passes"},
+    # Anti-join of the whole season's roster against its live passes: every
+    # member of the season has to be looked at once.
+    "get_members_without_wallet_pass": {"members", "member_seasons", "wallet_passes"},
+}
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (needs a scratch local Postgres)"
+)
+
+SEED_SQL = """
+INSERT INTO seasons (name, is_current) VALUES
+    ('2024/25', FALSE), ('2025/26', FALSE), ('2026/27', TRUE);
+
+INSERT INTO members (first_name, last_name, email, phone)
+SELECT 'First' || g, 'Last' || g, 'member' || g || '@example.com', '555' || lpad(g::text, 7, '0')
+FROM generate_series(1, %(members)s) AS g;
+
+-- Everyone is in the current season; about half were in each older one.
+INSERT INTO member_seasons (member_id, season_id)
+SELECT m.id, s.id
+FROM members m
+JOIN seasons s ON s.is_current OR (m.id + s.id) %% 2 = 0;
+
+INSERT INTO matches (season_id, opponent, is_home, kickoff_at, result, is_current)
+SELECT s.id, 'Opponent ' || g, g %% 2 = 0,
+       make_date(split_part(s.name, '/', 1)::int, 8, 1) + g * interval '7 days',
+       CASE WHEN s.is_current AND g > 10 THEN NULL
+            ELSE (ARRAY['win', 'draw', 'loss'])[1 + g %% 3] END,
+       s.is_current AND g = 10
+FROM seasons s, generate_series(1, %(matches)s) AS g;
+
+-- One apple pass per member-season; past seasons' passes are revoked.
+INSERT INTO wallet_passes (member_id, season_id, token_hash, serial_number, platform,
+                           auth_token, revoked_at, created_at)
+SELECT ms.member_id, ms.season_id,
+       encode(sha256(convert_to('tok-' || ms.member_id || '-' || ms.season_id, 'UTF8')), 'hex'),
+       'OLSC-' || ms.member_id || '-' || ms.season_id,
+       'apple', 'auth-' || ms.member_id,
+       CASE WHEN s.is_current THEN NULL ELSE now() - interval '200 days' END,
+       now() - (ms.member_id %% 365) * interval '1 day'
+FROM member_seasons ms
+JOIN seasons s ON s.id = ms.season_id;
+
+INSERT INTO pass_devices (device_library_identifier, wallet_pass_id, push_token)
+SELECT 'device-' || wp.member_id, wp.id, 'push-' || wp.id
+FROM wallet_passes wp
+WHERE wp.revoked_at IS NULL AND wp.member_id %% 5 < 3;
+
+-- ~30%% of a season's members at each of its played matches. Row triggers
+-- off for the bulk load (they'd refresh counters row by row); the
+-- counters and leaderboard stats are rebuilt set-based right after.
+ALTER TABLE checkins DISABLE TRIGGER USER;
+INSERT INTO checkins (member_id, match_id, source)
+SELECT ms.member_id, mt.id, 'scanner'
+FROM member_seasons ms
+JOIN matches mt ON mt.season_id = ms.season_id
+WHERE mt.result IS NOT NULL AND (ms.member_id * 7 + mt.id) %% 10 < 3;
+ALTER TABLE checkins ENABLE TRIGGER USER;
+INSERT INTO match_checkin_counts (match_id, checkin_count)
+SELECT match_id, COUNT(*) FROM checkins GROUP BY match_id;
+SELECT rebuild_member_season_stats();
+
+INSERT INTO door_passes (token_hash, label)
+SELECT encode(sha256(convert_to('door-' || g, 'UTF8')), 'hex'), 'Door ' || g
+FROM generate_series(1, 20) AS g;
+
+INSERT INTO match_overrides (match_date, opponent)
+SELECT current_date + g, 'Override ' || g FROM generate_series(1, 10) AS g;
+
+-- A few renames on top of the bulk load, so the roster has recent
+-- changes for a door phone to catch up on.
+UPDATE members SET last_name = last_name || '-Renamed' WHERE id %% 10000 = 0;
+"""
+
+
+def _connect():
+    # Client-side binding, as db's own cursors do -- the seed SQL is
+    # several statements in one execute().
+    return psycopg.connect(
+        TEST_DATABASE_URL, options=f"-c search_path={SCHEMA_NAME}", cursor_factory=psycopg.ClientCursor,
+    )
+
+
+@pytest.fixture(scope="module")
+def seeded_conn():
+    admin = psycopg.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA_NAME}")
+
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Path(db.SCHEMA_PATH).read_text())
+            cur.execute(SEED_SQL, {"members": MEMBERS, "matches": MATCHES_PER_SEASON})
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+        conn.autocommit = False
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE")
+        admin.close()
+
+
+class _RecordingCursor:
+    """Stands in for db.cursor()'s cursor: keeps every statement instead of
+    running it, and hands back rows that satisfy whatever the helper reads
+    off them afterwards (zeros, or `row` where a case needs real values)."""
+
+    def __init__(self, row=None):
+        self.statements = []
+        self.row = row or {}
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchone(self):
+        return defaultdict(int, self.row)
+
+    def fetchall(self):
+        return []
+
+
+def _capture(fn, *args, row=None, **kwargs):
+    recorder = _RecordingCursor(row)
+
+    @contextmanager
+    def recording_cursor(read_only=False):
+        yield recorder
+
+    original = db.cursor
+    db.cursor = recording_cursor
+    try:
+        fn(*args, **kwargs)
+    finally:
+        db.cursor = original
+    return recorder.statements
+
+
+def _seq_scanned_tables(plan):
+    found = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node.get("Node Type") == "Seq Scan":
+            found.add(node.get("Relation Name"))
+        stack.extend(node.get("Plans", []))
+    return found
+
+
+def _explain(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]["Plan"]
+    conn.rollback()
+    return plan
+
+
+def _sample(conn, sql):
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(sql)
+        row = cur.fetchone()
+    conn.rollback()
+    return row
+
+
+def _cases(conn):
+    current = _sample(conn, "SELECT id FROM seasons WHERE is_current")
+    match = _sample(conn, "SELECT id FROM matches WHERE is_current")
+    wallet_pass = _sample(
+        conn,
+        "SELECT id, member_id, season_id, serial_number FROM wallet_passes "
+        "WHERE revoked_at IS NULL ORDER BY id DESC LIMIT 1",
+    )
+    door = _sample(conn, "SELECT id FROM door_passes LIMIT 1")
+    member_id, season_id = wallet_pass["member_id"], wallet_pass["season_id"]
+    cutoff = datetime.now(timezone.utc) - timedelta(days=400)
+    # A door phone a few changes behind -- the delta it asks for should be
+    # a short range scan of roster_changes, not a diff of the whole season.
+    roster = _sample(
+        conn, f"SELECT max(version) AS latest FROM roster_changes WHERE season_id = {current['id']}"
+    )
+
+    return [
+        ("count_checkins_for_match", db.count_checkins_for_match, (match["id"],)),
+        ("get_matches_missing_result", db.get_matches_missing_result, ()),
+        ("set_match_result", db.set_match_result, (match["id"], "win", "1-0")),
+        ("get_leaderboard", db.get_leaderboard, (current["id"],)),
+        ("get_season_roster", db.get_season_roster, (current["id"],)),
+        ("search_season_roster", db.search_season_roster, (current["id"], "last1234")),
+        ("get_season_roster_names", db.get_season_roster_names, (current["id"],)),
+        ("get_roster_sync", db.get_roster_sync,
+         (current["id"], f"{current['id']}.{roster['latest'] - 3}"), {"n": roster["latest"]}),
+        ("checkin_by_token", db.checkin_by_token, (f"tok-{member_id}-{season_id}", "admin")),
+        ("_load_door_index", db._load_door_index, (current["id"], match["id"])),
+        ("checkin_member", db.checkin_member, (member_id, "admin")),
+        ("checkin_batch", db.checkin_batch, ([(f"tok-{member_id}-{season_id}", None, None), (None, member_id, None)], "admin")),
+        ("issue_wallet_token", db.issue_wallet_token, (member_id, season_id)),
+        ("set_google_wallet_object", db.set_google_wallet_object, (member_id, season_id, "obj", "cls")),
+        ("all_google_wallet_objects", db.all_google_wallet_objects, ()),
+        ("find_wallet_pass_by_serial", db.find_wallet_pass_by_serial, (wallet_pass["serial_number"],)),
+        ("register_pass_device", db.register_pass_device, (f"device-{member_id}", wallet_pass["id"], "push")),
+        ("unregister_pass_device", db.unregister_pass_device, (f"device-{member_id}", wallet_pass["id"])),
+        ("registered_serials_for_device", db.registered_serials_for_device, (f"device-{member_id}",)),
+        ("all_pass_device_push_tokens", db.all_pass_device_push_tokens, ()),
+        ("get_active_match_override_for_date", db.get_active_match_override_for_date, ("2026-10-20",)),
+        ("get_active_upcoming_match_overrides", db.get_active_upcoming_match_overrides, ("2026-10-16",)),
+        ("get_apple_passes_issued_before", db.get_apple_passes_issued_before, (cutoff,)),
+        ("get_members_without_wallet_pass", db.get_members_without_wallet_pass, (current["id"],)),
+        ("find_active_wallet_pass_by_token", db.find_active_wallet_pass_by_token, (f"tok-{member_id}-{season_id}",)),
+        ("find_door_pass_by_token", db.find_door_pass_by_token, ("door-1",)),
+        ("get_door_pass", db.get_door_pass, (door["id"],)),
+        ("revoke_door_pass", db.revoke_door_pass, (door["id"],)),
+    ]
+
+
+def test_no_sequential_scans_on_big_tables(seeded_conn, monkeypatch):
+    # checkin_by_token would otherwise answer from the in-process door
+    # index; the statement under test is the one it sends on a miss.
+    monkeypatch.setattr(db, "DOOR_INDEX_ENABLED", False)
+    failures = []
+    for name, fn, args, *row in _cases(seeded_conn):
+        statements = _capture(fn, *args, row=row[0] if row else None)
+        assert statements, f"{name} issued no SQL -- has it moved off db.cursor()?"
+        allowed = EXPECTED_FULL_SCANS.get(name, set())
+        for sql, params in statements:
+            scanned = _seq_scanned_tables(_explain(seeded_conn, sql, params)) & BIG_TABLES
+            unexpected = scanned - allowed
+            if unexpected:
+                failures.append(f"{name}: Seq Scan on {', '.join(sorted(unexpected))}")
+    assert not failures, "Query-plan regressions:\n  " + "\n  ".join(failures)
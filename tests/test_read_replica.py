@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Read-replica routing tests for db.cursor(read_only=True) / db.stream_rows.
+
+Stands up a one-table "which database is this?" probe in two local
+Postgres databases -- one playing the primary, one the replica (a plain
+second database is fine: a server that isn't in recovery reports no lag)
+-- and checks that read_only blocks go to the replica when there's a
+usable one, and fall back to the primary when it's unset, unreachable, or
+too far behind. Nothing here needs real streaming replication.
+
+Needs two scratch databases:
+
+    TEST_DATABASE_URL=postgresql://localhost/olsc_test \\
+    TEST_READ_DATABASE_URL=postgresql://localhost:5433/olsc_test \\
+        python -m pytest tests/test_read_replica.py
+"""
+
+import os
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+import db  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TEST_READ_DATABASE_URL = os.getenv("TEST_READ_DATABASE_URL")
+PROBE_TABLE = "olsc_replica_probe"
+
+pytestmark = pytest.mark.skipif(
+    not (TEST_DATABASE_URL and TEST_READ_DATABASE_URL),
+    reason="TEST_DATABASE_URL and TEST_READ_DATABASE_URL not both set (needs two scratch Postgres databases)",
+)
+
+
+def _seed_probe(url, which):
+    conn = psycopg.connect(url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {PROBE_TABLE}")
+        cur.execute(f"CREATE TABLE {PROBE_TABLE} (which TEXT NOT NULL)")
+        cur.execute(f"INSERT INTO {PROBE_TABLE} VALUES (%s)", (which,))
+    conn.close()
+
+
+def _drop_probe(url):
+    conn = psycopg.connect(url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {PROBE_TABLE}")
+    conn.close()
+
+
+def _reset_pools():
+    for pool in (db._pool, db._read_pool):
+        if pool is not None:
+            pool.close_all()
+    db._pool = db._read_pool = None
+    db._replica_state.update(checked_at=None, usable=False, lag_seconds=None, error=None)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def probes():
+    _seed_probe(TEST_DATABASE_URL, "primary")
+    _seed_probe(TEST_READ_DATABASE_URL, "replica")
+    yield
+    _drop_probe(TEST_DATABASE_URL)
+    _drop_probe(TEST_READ_DATABASE_URL)
+
+
+@pytest.fixture(autouse=True)
+def routing(monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_URL", TEST_DATABASE_URL)
+    monkeypatch.setattr(db, "DATABASE_READ_URL", TEST_READ_DATABASE_URL)
+    _reset_pools()
+    yield
+    db.end_session(commit=False)
+    _reset_pools()
+
+
+def _which(read_only):
+    with db.cursor(read_only=read_only) as cur:
+        cur.execute(f"SELECT which FROM {PROBE_TABLE}")
+        return cur.fetchone()["which"]
+
+
+def test_read_only_blocks_go_to_the_replica():
+    assert _which(read_only=True) == "replica"
+    assert _which(read_only=False) == "primary"
+    assert db.pool_stats()["replica"]["usable"] is True
+
+
+def test_replica_connections_refuse_writes():
+    with pytest.raises(psycopg.errors.ReadOnlySqlTransaction):
+        with db.cursor(read_only=True) as cur:
+            cur.execute(f"INSERT INTO {PROBE_TABLE} VALUES ('oops')")
+
+
+def test_streams_go_to_the_replica():
+    rows = list(db.stream_rows(f"SELECT which FROM {PROBE_TABLE}", read_only=True))
+    assert [r["which"] for r in rows] == ["replica"]
+
+
+def test_read_only_block_stays_off_the_request_session():
+    db.begin_session()
+    assert _which(read_only=True) == "replica"
+    # The session never needed a primary connection for that read.
+    assert db._local.session.conn is None
+    assert _which(read_only=False) == "primary"
+    assert db._local.session.conn is not None
+
+
+def test_falls_back_to_primary_when_unset(monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_READ_URL", None)
+    assert _which(read_only=True) == "primary"
+    assert "replica" not in db.pool_stats()
+
+
+def test_falls_back_to_primary_when_lagging(monkeypatch):
+    # Nothing can be less than 0s behind, so this replica counts as lagging.
+    monkeypatch.setattr(db, "READ_MAX_LAG_SECONDS", -1)
+    assert _which(read_only=True) == "primary"
+    assert db.pool_stats()["replica"]["usable"] is False
+
+
+def test_falls_back_to_primary_when_unreachable(monkeypatch):
+    monkeypatch.setattr(db, "DATABASE_READ_URL", "postgresql://127.0.0.1:1/nowhere?connect_timeout=1")
+    assert _which(read_only=True) == "primary"
+    state = db.pool_stats()["replica"]
+    assert state["usable"] is False and state["error"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Roster-page benchmark: /admin/members (db.get_season_roster) at 10k members
+and 500k check-ins has to stay under ROSTER_BUDGET_MS.
+
+Seeds its own throwaway schema (10k members, 50 scanned matches, every
+member at every match), times the exact SQL db.get_season_roster sends --
+captured the same way tests/test_query_plans.py does -- and prints the
+pre-rewrite correlated-subquery version's time alongside for comparison.
+
+Also times a fuzzy roster search (db.search_season_roster, a misspelt
+surname) against the same budget.
+
+Needs TEST_DATABASE_URL pointing at a scratch database:
+
+    TEST_DATABASE_URL=postgresql://localhost/olsc_test python -m pytest -s tests/test_roster_benchmark.py
+"""
+
+import os
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+import db  # noqa: E402
+from test_query_plans import _capture  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_NAME = "olsc_roster_bench"
+MEMBERS = int(os.getenv("TEST_BENCH_MEMBERS", "10000"))
+MATCHES = int(os.getenv("TEST_BENCH_MATCHES", "50"))  # x MEMBERS check-ins
+ROSTER_BUDGET_MS = float(os.getenv("ROSTER_BUDGET_MS", "200"))
+RUNS = 7
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set (needs a scratch local Postgres)"
+)
+
+SEED_SQL = """
+INSERT INTO seasons (name, is_current) VALUES ('2026/27', TRUE);
+
+INSERT INTO members (first_name, last_name, email, phone)
+SELECT 'First' || g, 'Last' || g, 'member' || g || '@example.com', '555' || lpad(g::text, 7, '0')
+FROM generate_series(1, %(members)s) AS g;
+
+INSERT INTO member_seasons (member_id, season_id)
+SELECT m.id, s.id FROM members m, seasons s;
+
+INSERT INTO matches (season_id, opponent, is_home, kickoff_at, result)
+SELECT s.id, 'Opponent ' || g, g %% 2 = 0, now() - (%(matches)s - g) * interval '7 days',
+       (ARRAY['win', 'draw', 'loss'])[1 + g %% 3]
+FROM seasons s, generate_series(1, %(matches)s) AS g;
+
+INSERT INTO wallet_passes (member_id, season_id, token_hash, serial_number, platform, auth_token)
+SELECT ms.member_id, ms.season_id, md5('tok-' || ms.member_id), 'OLSC-' || ms.member_id,
+       'apple', 'auth-' || ms.member_id
+FROM member_seasons ms
+WHERE ms.member_id %% 4 <> 0;
+
+-- Bulk load with row triggers off; counters and stats rebuilt set-based.
+ALTER TABLE checkins DISABLE TRIGGER USER;
+INSERT INTO checkins (member_id, match_id, source)
+SELECT m.id, mt.id, 'scanner' FROM members m, matches mt;
+ALTER TABLE checkins ENABLE TRIGGER USER;
+INSERT INTO match_checkin_counts (match_id, checkin_count)
+SELECT match_id, COUNT(*) FROM checkins GROUP BY match_id;
+SELECT rebuild_member_season_stats();
+"""
+
+# What /admin/members ran before the rewrite, kept only to print the
+# before/after comparison.
+CORRELATED_ROSTER_SQL = """
+    SELECT m.id, m.first_name, m.last_name, m.email, m.phone, m.created_at,
+           (SELECT COUNT(*) FROM checkins c
+            JOIN matches mt ON mt.id = c.match_id
+            WHERE c.member_id = m.id AND mt.season_id = %(season_id)s) AS checkins_this_season,
+           EXISTS (
+            SELECT 1 FROM wallet_passes wp
+            WHERE wp.member_id = m.id
+              AND wp.season_id = %(season_id)s
+              AND wp.platform = 'apple'
+              AND wp.revoked_at IS NULL
+           ) AS has_active_pass
+    FROM members m
+    JOIN member_seasons ms ON ms.member_id = m.id
+    WHERE ms.season_id = %(season_id)s
+    ORDER BY m.last_name, m.first_name
+"""
+
+
+@pytest.fixture(scope="module")
+def seeded_conn():
+    admin = psycopg.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA_NAME}")
+
+    conn = psycopg.connect(
+        TEST_DATABASE_URL, options=f"-c search_path={SCHEMA_NAME}", cursor_factory=psycopg.ClientCursor,
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Path(db.SCHEMA_PATH).read_text())
+            cur.execute(SEED_SQL, {"members": MEMBERS, "matches": MATCHES})
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE")
+        admin.close()
+
+
+def _median_ms(conn, sql, params):
+    timings = []
+    with conn.cursor() as cur:
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(rows)
+
+
+def test_roster_stays_under_budget(seeded_conn):
+    with seeded_conn.cursor() as cur:
+        cur.execute("SELECT id FROM seasons WHERE is_current")
+        season_id = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM checkins")
+        checkins = cur.fetchone()[0]
+
+    (sql, params), = _capture(db.get_season_roster, season_id)
+    roster_ms, rows = _median_ms(seeded_conn, sql, params)
+    correlated_ms, _ = _median_ms(seeded_conn, CORRELATED_ROSTER_SQL, {"season_id": season_id})
+
+    print(
+        f"\nroster: {rows} members, {checkins} check-ins -- "
+        f"joined {roster_ms:.1f}ms vs correlated {correlated_ms:.1f}ms (median of {RUNS})"
+    )
+    assert rows == MEMBERS
+    assert roster_ms < ROSTER_BUDGET_MS, (
+        f"get_season_roster took {roster_ms:.1f}ms at {MEMBERS} members / {checkins} check-ins "
+        f"(budget {ROSTER_BUDGET_MS:.0f}ms)"
+    )
+
+
+def test_roster_search_stays_under_budget(seeded_conn):
+    with seeded_conn.cursor() as cur:
+        cur.execute("SELECT id FROM seasons WHERE is_current")
+        season_id = cur.fetchone()[0]
+
+    # "lost4321": a one-letter typo of Last4321, found by word similarity.
+    (sql, params), = _capture(db.search_season_roster, season_id, "lost4321", sort="relevance")
+    search_ms, rows = _median_ms(seeded_conn, sql, params)
+
+    print(f"\nroster search: {rows} rows in {search_ms:.1f}ms (median of {RUNS})")
+    assert rows > 0
+    assert search_ms < ROSTER_BUDGET_MS, (
+        f"search_season_roster took {search_ms:.1f}ms at {MEMBERS} members (budget {ROSTER_BUDGET_MS:.0f}ms)"
+    )